@@ -1,8 +1,16 @@
 # pylint: disable=missing-docstring
 try:
-    import pkg_resources
-    __version__ = pkg_resources.get_distribution('koris').version
-except pkg_resources.DistributionNotFound:
+    from importlib.metadata import version, PackageNotFoundError
+except ImportError:  # Python < 3.8, pkg_resources is slow to import
+    from pkg_resources import (get_distribution,
+                               DistributionNotFound as PackageNotFoundError)
+
+    def version(name):
+        return get_distribution(name).version
+
+try:
+    __version__ = version('koris')
+except PackageNotFoundError:
     __version__ = '1.3.4'
 
 # Defining some constants
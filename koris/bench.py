@@ -0,0 +1,199 @@
+"""
+bench.py
+========
+
+Benchmark the provisioning of koris against the OpenStack simulator of
+:mod:`koris.cloud.simulator`, without using a real cloud.
+
+Each scenario runs the OpenStack part of a koris command on a fresh
+simulated project and reports the wall time, the number of API calls and
+the peak memory:
+
+- ``apply`` builds the network, security group, LoadBalancer, masters and
+  nodes of a new cluster, like ``koris apply`` does before it talks to
+  Kubernetes.
+- ``add`` adds the nodes to a cluster with one master and one node, like
+  ``koris add``.
+- ``destroy`` deletes a cluster with the nodes, like ``koris destroy``.
+
+Example::
+
+    $ koris bench --nodes 10,100 --scenarios apply,destroy
+"""
+import asyncio
+import time
+import tracemalloc
+
+from koris.util.apistats import API_STATS
+from koris.util.logger import Logger
+
+LOGGER = Logger(__name__)
+
+SCENARIOS = ("apply", "add", "destroy")
+
+SIZES = (10, 100, 500)
+
+# the key pair of the user in the simulated project
+KEYPAIR = "bench-user"
+
+# the tasks of ClusterBuilder.build_graph which only talk to OpenStack
+OPENSTACK_TASKS = ("lb_configure", "nodes")
+
+
+def bench_config(nodes, masters=3, name="bench"):
+    """return the koris configuration of a cluster of the simulator"""
+    return {
+        "cluster-name": name,
+        "master_flavor": "ECS.GP1.2-8",
+        "node_flavor": "ECS.C1.4-8",
+        "availibility-zones": ["de-nbg6-1a", "de-nbg6-1b"],
+        "n-masters": masters,
+        "n-nodes": nodes,
+        "image": "koris-2019-02-15",
+        "keypair": KEYPAIR,
+        "storage_class": "BSS-Performance-Storage",
+        "pod_subnet": "10.233.0.0/16",
+        "pod_network": "CALICO",
+        "private_net": {"name": name + "-net",
+                        "subnet": {"name": name + "-subnet",
+                                   "cidr": "10.0.0.0/16"}},
+    }
+
+
+def _connect(config):
+    # pylint: disable=import-outside-toplevel
+    from koris.cloud.openstack import (OSClusterInfo, get_clients,
+                                       get_connection)
+
+    nova, neutron, cinder = get_clients()
+    conn = get_connection()
+    info = OSClusterInfo(nova, neutron, cinder, config, conn)
+    return nova, neutron, cinder, conn, info
+
+
+def apply_cluster(config):
+    """build the OpenStack resources of a cluster"""
+    # pylint: disable=import-outside-toplevel
+    from koris.cloud.builder import ClusterBuilder
+
+    nova, neutron, cinder, conn, info = _connect(config)
+    info.prefetch()
+    info.setup_networking(config)
+    builder = ClusterBuilder(config, info, nova, neutron, cinder, conn)
+    graph = builder.build_graph(config).subgraph(*OPENSTACK_TASKS)
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    graph.run()
+
+
+def add_nodes(config, amount):
+    """add nodes to the cluster"""
+    # pylint: disable=import-outside-toplevel
+    from koris.cloud.builder import ClusterBuilder, NodeBuilder
+
+    _, _, _, _, info = _connect(config)
+    ca_bundle = ClusterBuilder.create_ca()
+    ca_info = {"ca_cert": ca_bundle.cert,
+               "discovery_hash": ClusterBuilder.calculate_discovery_hash(
+                   ca_bundle)}
+    builder = NodeBuilder(config, info)
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    tasks = builder.create_nodes_tasks(
+        "https://10.0.0.2:6443", ClusterBuilder.create_bootstrap_token(),
+        ca_info, zone=config["availibility-zones"][0], amount=amount)
+    builder.launch_new_nodes(tasks)
+
+
+def destroy_cluster(config):
+    """delete all resources of the cluster"""
+    # pylint: disable=import-outside-toplevel
+    from koris.cli import remove_cluster
+
+    nova, neutron, cinder, conn, _ = _connect(config)
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    remove_cluster(config, nova, neutron, cinder, conn)
+
+
+def _measure(func, *args):
+    API_STATS.reset()
+    tracemalloc.start()
+    start = time.monotonic()
+    try:
+        func(*args)
+    finally:
+        wall = time.monotonic() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {"wall": wall, "calls": len(API_STATS.calls),
+            "retries": sum(call["retries"] for call in API_STATS.calls),
+            "peak_memory": peak}
+
+
+def run_scenario(scenario, nodes, **simulator_args):
+    """run one scenario on a new simulated project
+
+    The resources the scenario needs, e.g. the cluster for ``destroy``, are
+    created before the measurement starts.
+
+    Args:
+        scenario (str): One of ``SCENARIOS``
+        nodes (int): The number of nodes of the cluster
+        simulator_args: Passed to :class:`koris.cloud.simulator.Simulator`
+
+    Returns:
+        dict: The scenario, the nodes, the wall time in seconds, the number
+        of API calls and retries and the peak memory in bytes
+    """
+    # pylint: disable=import-outside-toplevel
+    from koris.cloud.simulator import Simulator
+
+    if scenario not in SCENARIOS:
+        raise ValueError("Unknown scenario %s" % scenario)
+
+    sim = Simulator(**simulator_args)
+    sim.add("keypairs", id=KEYPAIR, name=KEYPAIR, public_key="ssh-rsa AAAA")
+    enabled = API_STATS.enabled
+    API_STATS.enable()
+    try:
+        with sim.installed():
+            if scenario == "apply":
+                result = _measure(apply_cluster, bench_config(nodes))
+            elif scenario == "add":
+                config = bench_config(1, masters=1)
+                apply_cluster(config)
+                result = _measure(add_nodes, config, nodes)
+            else:
+                config = bench_config(nodes)
+                apply_cluster(config)
+                result = _measure(destroy_cluster, config)
+    finally:
+        API_STATS.enabled = enabled
+        API_STATS.reset()
+
+    result.update(scenario=scenario, nodes=nodes)
+    return result
+
+
+def run(scenarios=SCENARIOS, sizes=SIZES, **simulator_args):
+    """run all scenarios at all sizes
+
+    Returns:
+        A list of the results of :func:`run_scenario`
+    """
+    results = []
+    for scenario in scenarios:
+        for nodes in sizes:
+            LOGGER.info("Running %s with %d nodes ...", scenario, nodes)
+            results.append(run_scenario(scenario, nodes, **simulator_args))
+    return results
+
+
+def format_results(results):
+    """return the results as a text table"""
+    lines = ["%-8s %6s %9s %7s %7s %10s" % (
+        "scenario", "nodes", "wall[s]", "calls", "retries", "peak[MiB]")]
+    for result in results:
+        lines.append("%-8s %6d %9.2f %7d %7d %10.1f" % (
+            result["scenario"], result["nodes"], result["wall"],
+            result["calls"], result["retries"],
+            result["peak_memory"] / 2 ** 20))
+    return "\n".join(lines)
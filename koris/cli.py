@@ -8,13 +8,17 @@ other classes.
 Don't use directly
 """
 import asyncio
+import re
 
 from cinderclient.exceptions import BadRequest, NotFound
 
-from koris.cloud.openstack import OSClusterInfo, LoadBalancer
+from koris.cloud.inventory import ClusterInventory
+from koris.cloud.openstack import LoadBalancer, delete_server
 from .util.hue import que, bold  # pylint: disable=no-name-in-module
-from .util.util import get_kubeconfig_yaml
+from .util.dag import TaskGraph
+from .util.util import get_kubeconfig_yaml, host_name_regex, run_blocking
 from .util.logger import Logger
+from .util.tracing import span
 
 
 LOGGER = Logger(__name__)
@@ -50,48 +54,70 @@ def write_kubeconfig(cluster_name, lb_ip, lb_port, ca_cert,
     return path
 
 
-# pylint: disable=too-many-locals
 def remove_cluster(config, nova, neutron, cinder, conn):
-    """Delete a cluster from OpenStack"""
-
-    cluster_info = OSClusterInfo(nova, neutron, cinder, config, conn)
-    masters = cluster_info.get_instances("node")
-    workers = cluster_info.get_instances("master")
-
-    tasks = [host.delete(neutron) for host in masters if host]
-    tasks += [host.delete(neutron) for host in workers if host]
-    if tasks:
-        LOGGER.debug("Deleting Instances ...")
-        loop = asyncio.get_event_loop()
-        loop.run_until_complete(asyncio.wait(tasks))
-        loop.close()
-
-    LoadBalancer(config, conn).delete()
-
-    sg_name = '%s-sec-group' % config['cluster-name']
-    secg = conn.list_security_groups({"name": sg_name})
-    if secg:
-        LOGGER.debug("Deleting SecurityGroup %s ...", sg_name)
-        for sg in secg:
-            for rule in sg.security_group_rules:
-                conn.delete_security_group_rule(rule['id'])
-
-            for port in conn.list_ports():
-                if sg.id in port.security_groups:
-                    conn.delete_port(port.id)
-    conn.delete_security_group(sg_name)
-
-    # This needs to be replaced with OpenStackAPI in the future
-    for vol in cinder.volumes.list():
-        try:
-            if config['cluster-name'] in vol.name and vol.status != 'in-use':
-                try:
-                    vol.delete()
-                except (BadRequest, NotFound):
-                    pass
-
-        except TypeError:
-            continue
-
-    # delete the cluster key pair
-    conn.delete_keypair(config['cluster-name'])
+    """Delete a cluster from OpenStack
+
+    The resources are removed as a graph of tasks: the servers with their
+    ports, the LoadBalancer and the key pair are deleted concurrently. The
+    security group and the remaining volumes are deleted once the servers
+    are gone. The servers and volumes are found by the tag and metadata of
+    the cluster, see :class:`koris.cloud.inventory.ClusterInventory`.
+    """
+    cluster_name = config['cluster-name']
+    names = re.compile(host_name_regex(cluster_name))
+    inventory = ClusterInventory(cluster_name, nova, cinder, conn)
+    graph = TaskGraph()
+
+    @graph.task()
+    def servers():
+        return inventory.servers()
+
+    @graph.task(requires=("servers",))
+    async def delete_servers(servers):
+        if servers:
+            LOGGER.debug("Deleting Instances ...")
+        await asyncio.gather(*[delete_server(srv, neutron) for srv in servers])
+
+    @graph.task()
+    def loadbalancer():
+        LoadBalancer(config, conn).delete()
+
+    @graph.task()
+    def keypair():
+        conn.delete_keypair(cluster_name)
+
+    @graph.task(requires=("delete_servers", "loadbalancer"))
+    async def secgroup(**_):
+        sg_name = '%s-sec-group' % cluster_name
+        for sg in await run_blocking(conn.list_security_groups,
+                                     {"name": sg_name}):
+            LOGGER.debug("Deleting SecurityGroup %s ...", sg_name)
+            # the rules are deleted with the group, but ports which are not
+            # attached to a server of the cluster may still use it
+            ports = await run_blocking(
+                lambda: list(conn.network.ports(security_group_ids=[sg.id])))
+            await asyncio.gather(*[
+                run_blocking(conn.network.delete_port, port,
+                             ignore_missing=True) for port in ports])
+            await run_blocking(conn.delete_security_group, sg.id)
+
+    @graph.task(requires=("delete_servers",))
+    async def volumes(**_):
+        found = await run_blocking(inventory.volumes)
+        # volumes which are still attached are deleted by nova
+        found = [vol for vol in found if vol.status != 'in-use']
+        found = [vol for vol in found if names.match(vol.name or '')]
+
+        async def delete(vol):
+            try:
+                await run_blocking(vol.delete)
+            except (BadRequest, NotFound):
+                pass
+
+        await asyncio.gather(*[delete(vol) for vol in found])
+
+    loop = asyncio.get_event_loop()
+    with span("destroy", cluster=cluster_name, masters=config['n-masters'],
+              nodes=config['n-nodes']):
+        graph.run(loop)
+    loop.close()
@@ -6,9 +6,9 @@ Build a kubernetes cluster on a cloud
 """
 import asyncio
 import random
+import re
 import string
 import sys
-import time
 import urllib
 
 import openstack
@@ -22,9 +22,14 @@ from koris.ssl import create_key, create_ca, CertBundle
 from koris.ssl import discovery_hash as get_discovery_hash
 from koris.deploy.dex import (create_dex, create_oauth2, DexSSL,
                               create_dex_conf, ValidationError)
+from koris.util.dag import TaskGraph
 from koris.util.logger import Logger
+from koris.util.tracing import span
+from koris.util.util import host_name_regex, set_concurrency, RETRY_STATS
 from koris.ssl import b64_cert, b64_key
-from .openstack import (Instance, OSCloudConfig, LoadBalancer, InstanceExists)
+from .discovery import find_servers
+from .openstack import (Instance, OSCloudConfig, LoadBalancer, InstanceExists,
+                        BuilderError)
 
 
 LOGGER = Logger(__name__)
@@ -34,12 +39,9 @@ def get_server_range(servers, cluster_name, role, amount):
     """
     Given a list of servers find the last server name and add N more
     """
-    servers = [s for s in servers if
-               s.name.startswith(cluster_name)]
-    servers = [s for s in servers if role in s.name]
-
-    lastname = sorted(servers, key=lambda x: x.name)[-1].name
-    idx = int(lastname.split('-')[-1])
+    names = re.compile(host_name_regex(cluster_name, role))
+    idx = max(int(s.name.split('-')[-1]) for s in servers
+              if names.match(s.name))
     return range(idx + 1, idx + amount + 1)
 
 
@@ -58,6 +60,12 @@ class NodeBuilder:
         self.config = config
         self._info = osinfo
         self.cloud_config = cloud_config
+        set_concurrency(config.get('max_concurrency'))
+
+    @property
+    def batch_boot(self):
+        """boot the worker nodes with nova's multi-create"""
+        return bool(self.config.get('batch_boot', False))
 
     def create_new_nodes(self,
                          role='node',
@@ -77,15 +85,17 @@ class NodeBuilder:
                           role,
                           {'image': self._info.image,
                            'class': self._info.storage_class},
-                          flavor
+                          flavor,
+                          poller=self._info.poller
                           ) for n in
-                 get_server_range(self._info.compute_client.servers.list(),
+                 get_server_range(find_servers(self._info.compute_client,
+                                               self.config['cluster-name'],
+                                               role),
                                   self.config['cluster-name'],
                                   role,
                                   amount)]
-        for node in nodes:
-            node.attach_port(self._info.netclient, self._info.net['id'],
-                             self._info.secgroups)
+        if not self.batch_boot:
+            self._info.attach_ports(nodes)
         return nodes
 
     # pylint: disable=too-many-arguments,too-many-locals
@@ -152,7 +162,7 @@ class NodeBuilder:
             list [openstack.Instance, openstack.Instance, ...]
         """
 
-        return list(self._info.distribute_nodes())
+        return list(self._info.distribute_nodes(with_ports=not self.batch_boot))
 
     def create_initial_nodes(self,
                              cloud_config,
@@ -187,6 +197,11 @@ class NodeBuilder:
                             pod_network="CALICO"):
         """
         Create future tasks for creating the cluster worker nodes
+
+        If ``batch_boot`` is set in the config, one task is created per
+        availability zone and flavor, which boots all nodes of that group
+        with a single request. The result of such a task is a list of
+        instances.
         """
         loop = asyncio.get_event_loop()
         tasks = []
@@ -196,6 +211,27 @@ class NodeBuilder:
                 raise InstanceExists("Node {} already exists! Skipping "
                                      "creation of the cluster.".format(node))
 
+        if self.batch_boot:
+            userdata = str(NodeInit(ca_cert, self.cloud_config, lb_ip, lb_port,
+                                    bootstrap_token,
+                                    discovery_hash,
+                                    k8s_version=k8s_version,
+                                    pod_network=pod_network,
+                                    hostname_from_metadata=True))
+            groups = {}
+            for node in nodes:
+                flavor_id = getattr(node.flavor, 'id', node.flavor)
+                groups.setdefault((node.zone, flavor_id), []).append(node)
+
+            for group in groups.values():
+                tasks.append(loop.create_task(
+                    Instance.create_batch(group, group[0].flavor,
+                                          self._info.secgroups,
+                                          self._info.keypair, userdata)
+                ))
+            return tasks
+
+        for node in nodes:
             userdata = str(NodeInit(ca_cert, self.cloud_config, lb_ip, lb_port,
                                     bootstrap_token,
                                     discovery_hash,
@@ -228,6 +264,7 @@ class ControlPlaneBuilder:  # pylint: disable=too-many-locals,too-many-arguments
         self._config = config
         self._info = osinfo
         self.cloud_config = cloud_config
+        set_concurrency(config.get('max_concurrency'))
 
     def get_masters(self):
         """
@@ -308,7 +345,9 @@ class ControlPlaneBuilder:  # pylint: disable=too-many-locals,too-many-arguments
         """
         role = 'master'
         master_number = next(iter(
-            get_server_range(self._info.compute_client.servers.list(),
+            get_server_range(find_servers(self._info.compute_client,
+                                          self._config['cluster-name'],
+                                          role),
                              self._config['cluster-name'],
                              role,
                              1)))
@@ -323,10 +362,10 @@ class ControlPlaneBuilder:  # pylint: disable=too-many-locals,too-many-arguments
                           role,
                           {'image': self._info.image,
                            'class': self._info.storage_class},
-                          flavor
+                          flavor,
+                          poller=self._info.poller
                           )
-        master.attach_port(self._info.netclient, self._info.net['id'],
-                           self._info.secgroups)
+        self._info.attach_ports([master])
         return master
 
     def add_master(
@@ -394,6 +433,7 @@ class ClusterBuilder:  # pylint: disable=too-few-public-methods
 
         self.deploy_dex = False
         self.dex_conf = None
+        self.loadbalancer = None
 
     @staticmethod
     def create_bootstrap_token():
@@ -453,18 +493,103 @@ class ClusterBuilder:  # pylint: disable=too-few-public-methods
         """Sets up networking for the cluster."""
 
         self.info.setup_networking()
-        self.info.secgroup.configure()
 
         subnet = self.info.subnet
         cloud_config = OSCloudConfig(subnet['id'])
 
         return cloud_config
 
-    def run(self, config):  # pylint: disable=too-many-locals,too-many-statements
+    def configure_secgroup(self, **_):
+        """Creates the rules of the security group of the cluster.
+
+        The results of the required tasks are ignored.
         """
-        execute the complete cluster build
+        self.info.secgroup.configure()
+
+    def create_dex_certs(self, config, lb_ip, lb_dns):
+        """Creates the Dex SSL infrastructure and configuration.
+
+        Returns:
+            The dex configuration or None, if dex is not deployed.
+        """
+        if not self.deploy_dex:
+            return None
+
+        LOGGER.info("Setting up Dex SSL infrastructure ...")
+        # Dex Issuer will be set to the Floating IP, or LoadBalancer DNS Name
+        if lb_dns == lb_ip or lb_dns is None:
+            issuer = lb_ip
+        else:
+            issuer = lb_dns
+        LOGGER.info("Dex CA Issuer set to %s", issuer)
+        cert_dir = "-".join(("certs", config["cluster-name"]))
+        dex_ssl = DexSSL(cert_dir, issuer)
+        dex_ssl.save_certs()
+
+        try:
+            self.dex_conf = create_dex_conf(config['addons']['dex'], dex_ssl)
+        except (ValidationError, TypeError, KeyError) as exc:
+            LOGGER.error(f"Unable to parse dex config: {exc}")
+            LOGGER.error("Skipping Dex deployment")
+            self.deploy_dex = False
+            self.dex_conf = None
+
+        return self.dex_conf
+
+    async def configure_dex_listeners(self, lbinst, master_ips, node_ips):
+        """Configures the LoadBalancer for Dex"""
+        LOGGER.info("Configuring the LoadBalancer for Dex ...")
+        dex_listener = self.dex_conf['ports']['listener']
+        dex_service = self.dex_conf['ports']['service']
+        client_listener = self.dex_conf['client']['ports']['listener']
+        client_service = self.dex_conf['client']['ports']['service']
+        await asyncio.gather(
+            create_dex(lbinst, listener_port=dex_listener,
+                       pool_port=dex_service, members=master_ips),
+            create_oauth2(lbinst, listener_port=client_listener,
+                          pool_port=client_service, members=node_ips))
+        LOGGER.info("Finished configuring LoadBalancer for Dex")
+
+    @staticmethod
+    def wait_for_api(k8s, lb_url, masters):
+        """Waits until the Kubernetes API server is available
+
+        The LoadBalancer and every master are probed in parallel, the time
+        when each of them became ready is logged.
+
+        Args:
+            k8s (:class:`koris.deploy.k8s.K8S`): The cluster
+            lb_url (str): The URL of the API server at the LoadBalancer
+            masters (list): The master :class:`Instance` objects
+
+        Returns:
+            dict: The seconds after which each endpoint was ready
+        """
+        LOGGER.info("Waiting for Kubernetes API Server to become available ...")
+        endpoints = {"loadbalancer": lb_url}
+        endpoints.update({master.name: "https://%s:6443" % master.ip_address
+                          for master in masters if isinstance(master, Instance)})
+        ready_at = k8s.readiness_prober(endpoints).wait(require=["loadbalancer"])
+        for name, seconds in sorted(ready_at.items(),
+                                    key=lambda item: item[1] is None):
+            if seconds is None:
+                LOGGER.debug("%s was not ready yet", name)
+            else:
+                LOGGER.debug("%s was ready after %.1fs", name, seconds)
+        LOGGER.success("Kubernetes API is ready!")
+        return ready_at
+
+    def build_graph(self, config):  # pylint: disable=too-many-locals
         """
+        Describe the cluster build as graph of tasks.
+
+        Each step of the build starts as soon as the steps it depends on are
+        done, e.g. the LoadBalancer is created while the CA and the SSH key
+        are generated and the security group is configured.
 
+        Returns:
+            A :class:`koris.util.dag.TaskGraph`
+        """
         # Extract Kubernetes version
         if 'version' in config and 'k8s' in config['version']:
             k8s_version = config['version']['k8s']
@@ -474,163 +599,203 @@ class ClusterBuilder:  # pylint: disable=too-few-public-methods
         LOGGER.info("Building Kubernetes %s cluster '%s'",
                     k8s_version, config['cluster-name'])
 
-        LOGGER.info("Setting up networking ...")
-        cloud_config = self.create_network()
-        # generate CA key pair for the cluster, that is used to authenticate
-        # the clients that can use kubeadm
-
-        LOGGER.info("Creating Kubernetes CA ...")
-        ca_bundle = self.create_ca()
-        ssh_key = self.create_ssh_keypair()
-        cert_dir = "-".join(("certs", config["cluster-name"]))
-
         # Check if dex has to be deployed
         if 'addons' in config and 'dex' in config['addons']:
             self.deploy_dex = True
             LOGGER.info("Addons: Dex will be configured")
 
-        # generate ssh key pair for first master node. It is used to connect
-        # to the other nodes so that they can join the cluster
-        ssh_key = self.create_ssh_keypair()
-
-        # create a load balancer for accessing the API server of the cluster;
-        # do not add a listener, since we created no machines yet.
-        LOGGER.info("Creating the LoadBalancer ...")
-        lbinst = LoadBalancer(config, self.conn, self.neutron)
-        lb, floatingip = lbinst.get_or_create()
+        lbinst = self.loadbalancer = LoadBalancer(config, self.conn, self.neutron)
         lb_port = "6443"
-
-        lb_dns = config.get('loadbalancer', {}).get('dnsname') or floatingip
-        lb_ip = floatingip if floatingip else lb['vip_address']
-
         # calculate information needed for joining nodes to the cluster...
         # calculate bootstrap token
         bootstrap_token = ClusterBuilder.create_bootstrap_token()
 
-        # calculate discovery hash
-        discovery_hash = self.calculate_discovery_hash(ca_bundle)
+        graph = TaskGraph()
 
-        if self.deploy_dex:
-            LOGGER.info("Setting up Dex SSL infrastructure ...")
-            # Dex Issuer will be set to the Floating IP, or LoadBalancer DNS Name
-            if lb_dns == lb_ip or lb_dns is None:
-                issuer = lb_ip
-            else:
-                issuer = lb_dns
-            LOGGER.info("Dex CA Issuer set to %s", issuer)
-            dex_ssl = DexSSL(cert_dir, issuer)
-            dex_ssl.save_certs()
-
-            try:
-                self.dex_conf = create_dex_conf(config['addons']['dex'], dex_ssl)
-            except (ValidationError, TypeError, KeyError) as exc:
-                LOGGER.error(f"Unable to parse dex config: {exc}")
-                LOGGER.error("Skipping Dex deployment")
-                self.deploy_dex = False
-                self.dex_conf = None
-
-        # create the master nodes with ssh_key (private and public key)
-        # first task in returned list is task for first master node
-        LOGGER.info("Waiting for master instances to be launched...")
-        master_tasks = self.masters_builder.create_masters_tasks(
-            ssh_key, ca_bundle, cloud_config, lb_ip, lb_port,
-            bootstrap_token, lb_dns,
-            config.get("pod_subnet", "10.233.0.0/16"),
-            config.get("pod_network", "CALICO"),
-            dex=self.dex_conf,
-            k8s_version=k8s_version)
-        loop = asyncio.get_event_loop()
-        master_results = loop.run_until_complete(asyncio.gather(*master_tasks))
-
-        master_ips = [x.ip_address for x in master_results if
-                      isinstance(x, Instance)]
-
-        # add a listener for the first master node, since this is the node we
-        # call kubeadm init on
-        LOGGER.info("Configuring the LoadBalancer ...")
-        first_master_ip = master_results[0].ip_address
-        configure_lb_task = loop.create_task(
-            lbinst.configure([first_master_ip]))
-
-        # create the worker nodes
-        LOGGER.info("Waiting for worker instances to be launched and the "
-                    "LoadBalancer to be configured...")
-        node_tasks = self.nodes_builder.create_initial_nodes(
-            cloud_config, ca_bundle, lb_ip, lb_port, bootstrap_token,
-            discovery_hash, k8s_version=k8s_version,
-            pod_network=config['pod_network']
-        )
+        @graph.task()
+        def cloud_config():
+            LOGGER.info("Setting up networking ...")
+            return self.create_network()
+
+        graph.add("secgroup", self.configure_secgroup,
+                  requires=("cloud_config",))
+
+        @graph.task()
+        def ca_bundle():
+            # generate CA key pair for the cluster, that is used to
+            # authenticate the clients that can use kubeadm
+            LOGGER.info("Creating Kubernetes CA ...")
+            return self.create_ca()
 
-        node_tasks.append(configure_lb_task)
-        node_results = loop.run_until_complete(asyncio.gather(*node_tasks))
-        LOGGER.debug("Finished node tasks")
+        @graph.task(requires=("ca_bundle",))
+        def discovery_hash(ca_bundle):
+            return self.calculate_discovery_hash(ca_bundle)
 
-        node_ips = [x.ip_address for x in node_results if isinstance(x, Instance)]
+        # generate ssh key pair for first master node. It is used to connect
+        # to the other nodes so that they can join the cluster
+        graph.add("ssh_key", self.create_ssh_keypair)
+
+        @graph.task(requires=("cloud_config", "master_instances"))
+        def loadbalancer(master_instances, **_):
+            # create a load balancer for accessing the API server of the
+            # cluster; the first master node, which is the node we call
+            # kubeadm init on, is the only member until the API is ready.
+            LOGGER.info("Creating the LoadBalancer ...")
+            lb, floatingip = lbinst.get_or_create(listeners=[
+                lbinst.master_listener_spec([master_instances[0].ip_address])])
+            lb_dns = config.get('loadbalancer', {}).get('dnsname') or floatingip
+            lb_ip = floatingip if floatingip else lb['vip_address']
+            return lb_ip, lb_dns
+
+        @graph.task(requires=("loadbalancer",))
+        def dex_conf(loadbalancer):
+            return self.create_dex_certs(config, *loadbalancer)
+
+        @graph.task(requires=("cloud_config",))
+        def master_instances(cloud_config):  # pylint: disable=unused-argument
+            return self.masters_builder.get_masters()
+
+        @graph.task(requires=("cloud_config",))
+        def node_instances(cloud_config):  # pylint: disable=unused-argument
+            return self.nodes_builder.get_nodes()
+
+        @graph.task(requires=("ssh_key", "ca_bundle", "cloud_config",
+                              "loadbalancer", "dex_conf", "secgroup",
+                              "master_instances"))
+        async def masters(ssh_key, ca_bundle, cloud_config, loadbalancer,
+                          dex_conf, **_):
+            # create the master nodes with ssh_key (private and public key)
+            # first task in returned list is task for first master node
+            LOGGER.info("Waiting for master instances to be launched...")
+            lb_ip, lb_dns = loadbalancer
+            master_tasks = self.masters_builder.create_masters_tasks(
+                ssh_key, ca_bundle, cloud_config, lb_ip, lb_port,
+                bootstrap_token, lb_dns,
+                config.get("pod_subnet", "10.233.0.0/16"),
+                config.get("pod_network", "CALICO"),
+                dex=dex_conf,
+                k8s_version=k8s_version)
+            return await asyncio.gather(*master_tasks)
+
+        @graph.task(requires=("masters", "loadbalancer"))
+        async def lb_configure(masters, **_):
+            # add a listener for the first master node, unless it was
+            # created with the LoadBalancer
+            if lbinst.populated:
+                return
+            LOGGER.info("Configuring the LoadBalancer ...")
+            await lbinst.configure([masters[0].ip_address])
+
+        @graph.task(requires=("masters", "ca_bundle", "cloud_config",
+                              "loadbalancer", "discovery_hash", "secgroup",
+                              "node_instances"))
+        async def nodes(ca_bundle, cloud_config, loadbalancer, discovery_hash,
+                        **_):
+            LOGGER.info("Waiting for worker instances to be launched ...")
+            node_tasks = self.nodes_builder.create_initial_nodes(
+                cloud_config, ca_bundle, loadbalancer[0], lb_port,
+                bootstrap_token, discovery_hash, k8s_version=k8s_version,
+                pod_network=config['pod_network'])
+            node_results = await asyncio.gather(*node_tasks)
+            LOGGER.debug("Finished node tasks")
+            # batch booted nodes are returned as list per batch
+            return [node for result in node_results for node in
+                    (result if isinstance(result, list) else [result])]
 
         if self.deploy_dex:
-            LOGGER.info("Configuring the LoadBalancer for Dex ...")
-            dex_listener = self.dex_conf['ports']['listener']
-            dex_service = self.dex_conf['ports']['service']
-            dex_members = master_ips
-            dex_task = loop.create_task(create_dex(lbinst,
-                                                   listener_port=dex_listener,
-                                                   pool_port=dex_service,
-                                                   members=dex_members))
-
-            client_listener = self.dex_conf['client']['ports']['listener']
-            client_service = self.dex_conf['client']['ports']['service']
-            client_members = node_ips
-            oauth_task = loop.create_task(create_oauth2(lbinst,
-                                                        listener_port=client_listener,
-                                                        pool_port=client_service,
-                                                        members=client_members))
-            tasks = [dex_task, oauth_task]
-            loop.run_until_complete(asyncio.gather(*tasks))
-            LOGGER.info("Finished configuring LoadBalancer for Dex")
-
-        # We should no be able to query the API server for available nodes
-        # with a valid certificate from the generated CA. Hence, generate
-        # a client certificate.
-        LOGGER.info("Talking to the API server and waiting for masters to be "
-                    "online.")
-        client_cert = CertBundle.create_signed(
-            ca_bundle, "DE", "BY", "NUE", "system:masters", "system:masters",
-            "kubernetes-admin", "", "")
-
-        # send certificates and keys to kube config
-        kubeconfig = write_kubeconfig(config["cluster-name"], lb_ip,
-                                      lb_port, b64_cert(ca_bundle.cert),
-                                      b64_cert(client_cert.cert),
-                                      b64_key(client_cert.key))
-
-        # Now connect to the the API server and query which masters are
-        # available.
-        k8s = K8S(kubeconfig)
-
-        LOGGER.logger.handlers[0].terminator = ""
-        LOGGER.info("Waiting for Kubernetes API Server to become available ...")
-        while not k8s.is_ready:
-            time.sleep(2)
-            LOGGER.info(".", color=False)
+            @graph.task(requires=("masters", "nodes", "lb_configure",
+                                  "dex_conf"))
+            async def dex_listeners(masters, nodes, dex_conf, **_):
+                if dex_conf is None:
+                    return
+                await self.configure_dex_listeners(
+                    lbinst,
+                    [x.ip_address for x in masters if isinstance(x, Instance)],
+                    [x.ip_address for x in nodes if isinstance(x, Instance)])
+
+        @graph.task(requires=("ca_bundle", "loadbalancer"))
+        def kubeconfig(ca_bundle, loadbalancer):
+            # We should no be able to query the API server for available
+            # nodes with a valid certificate from the generated CA. Hence,
+            # generate a client certificate.
+            client_cert = CertBundle.create_signed(
+                ca_bundle, "DE", "BY", "NUE", "system:masters",
+                "system:masters", "kubernetes-admin", "", "")
+
+            # send certificates and keys to kube config
+            return write_kubeconfig(config["cluster-name"], loadbalancer[0],
+                                    lb_port, b64_cert(ca_bundle.cert),
+                                    b64_cert(client_cert.cert),
+                                    b64_key(client_cert.key))
+
+        @graph.task(requires=("kubeconfig", "lb_configure", "nodes",
+                              "loadbalancer", "masters"))
+        def k8s(kubeconfig, loadbalancer, masters, **_):
+            # Now connect to the the API server and query which masters are
+            # available.
+            LOGGER.info("Talking to the API server and waiting for masters "
+                        "to be online.")
+            k8s = K8S(kubeconfig)
+            self.wait_for_api(k8s, "https://%s:%s" % (loadbalancer[0], lb_port),
+                              masters)
+            return k8s
+
+        # the dex listeners and the members are changed one after another,
+        # since the LoadBalancer is immutable while it is updated
+        @graph.task(requires=("k8s", "masters", "nodes") + (
+            ("dex_listeners",) if self.deploy_dex else ()))
+        def lb_members(k8s, masters, nodes, **_):
+            LOGGER.info("Waiting for all masters to become Ready ...")
+            lb_masters = [{"name": x.name,
+                           "address": x.ip_address,
+                           "protocol_port": 6443,
+                           "monitor_port": 6443} for x in masters if
+                          isinstance(x, Instance)]
+            lb_nodes = [{"name": x.name,
+                         "address": x.ip_address,
+                         } for x in nodes if isinstance(x, Instance)]
+            if not lbinst.bulk_update_members(lb_masters) and \
+                    not k8s.add_all_masters_to_loadbalancer(
+                        config['cluster-name'], len(masters), lbinst):
+                listener = lbinst.master_listener or {}
+                present = {x['address'] for x in
+                           listener.get('pool', {}).get('members', [])}
+                missing = [x['name'] for x in lb_masters
+                           if x['address'] not in present]
+                raise BuilderError("Masters did not join the LoadBalancer: "
+                                   "%s" % ", ".join(missing))
+            return lb_masters + lb_nodes
+
+        @graph.task(requires=("k8s", "lb_members"))
+        def addons(k8s, lb_members):
+            k8s.apply_addons(config)
+            add_ingress_listeners(k8s.nginx_ingress_ports, lbinst, lb_members)
+            LOGGER.success("Configured LoadBalancer to use all API servers")
+
+        return graph
+
+    def run(self, config):
+        """
+        execute the complete cluster build
+        """
+        graph = self.build_graph(config)
+        loop = asyncio.get_event_loop()
+        if 'version' in config and 'k8s' in config['version']:
+            k8s_version = config['version']['k8s']
+        else:
+            k8s_version = KUBERNETES_BASE_VERSION
 
-        LOGGER.logger.handlers[0].terminator = "\n"
-        LOGGER.info("", color=None)
-        LOGGER.success("Kubernetes API is ready!")
-        LOGGER.info("Waiting for all masters to become Ready ...")
-        lb_masters = [{"name": x.name,
-                       "address": x.ip_address,
-                       "protocol_port": 6443,
-                       "monitor_port": 6443} for x in master_results if
-                      isinstance(x, Instance)]
-        lb_nodes = [{"name": x.name,
-                     "address": x.ip_address,
-                     } for x in node_results if isinstance(x, Instance)]
-        if not lbinst.bulk_update_members(lb_masters):
-            k8s.add_all_masters_to_loadbalancer(config['cluster-name'],
-                                                len(master_tasks), lbinst)
-        k8s.apply_addons(config)
-        add_ingress_listeners(k8s.nginx_ingress_ports, lbinst,
-                              lb_masters + lb_nodes)
-        LOGGER.success("Configured LoadBalancer to use all API servers")
+        with span("apply", cluster=config['cluster-name'],
+                  masters=config['n-masters'], nodes=config['n-nodes'],
+                  master_flavor=config['master_flavor'],
+                  node_flavor=config['node_flavor'],
+                  zones=",".join(config['availibility-zones']),
+                  k8s_version=k8s_version):
+            graph.run(loop)
         LOGGER.success("Kubernetes cluster is ready to use !")
+        graph.report()
+        RETRY_STATS.log(LOGGER.debug)
+        for operation, waits in sorted(self.loadbalancer.wait_times.items()):
+            LOGGER.debug("Waited %.1fs for the LoadBalancer before %d x %s",
+                         sum(waits), len(waits), operation)
         loop.close()
@@ -0,0 +1,121 @@
+"""
+discovery.py
+============
+
+Find resources in OpenStack without listing the whole project.
+
+The functions here push name, ID, tag and other filters to the OpenStack
+API, fetch the results page by page only as far as they are consumed, and
+stop at the first match where one match is enough.
+"""
+import hashlib
+import re
+
+from koris.util.util import host_name_regex
+
+PAGE_SIZE = 100
+
+# Resources created by koris are tagged with the name of their cluster.
+# Volumes can't be tagged and carry this metadata key instead.
+CLUSTER_METADATA_KEY = "koris-cluster"
+
+# nova and neutron accept tags of at most 60 characters
+MAX_TAG_LENGTH = 60
+
+
+def cluster_tag(cluster_name):
+    """Return the tag of all resources of a cluster
+
+    Long cluster names are replaced by their hash, thus the tag is
+    stable and unique for every cluster name.
+    """
+    tag = "%s=%s" % (CLUSTER_METADATA_KEY, cluster_name)
+    if len(tag) > MAX_TAG_LENGTH:
+        digest = hashlib.sha256(cluster_name.encode()).hexdigest()
+        tag = "%s=%s" % (CLUSTER_METADATA_KEY,
+                         digest[:MAX_TAG_LENGTH - len(CLUSTER_METADATA_KEY) - 1])
+    return tag
+
+
+def paginate(list_func, page_size=PAGE_SIZE, **kwargs):
+    """Lazily yield the resources of a paginated list call
+
+    Args:
+        list_func (callable): A ``list`` method of a nova or cinder client
+            manager, which accepts ``limit`` and ``marker``
+        page_size (int): The number of resources fetched with one request
+        kwargs: Passed to list_func, e.g. ``search_opts``
+
+    Yields:
+        The resources, fetching the next page only when the previous one
+        is consumed.
+    """
+    marker = None
+    while True:
+        page = list_func(limit=page_size, marker=marker, **kwargs)
+        yield from page
+        if len(page) < page_size:
+            return
+        marker = page[-1].id
+
+
+def first(resources, predicate=None):
+    """Return the first resource for which predicate is True, or None
+
+    The remaining resources are not consumed, thus a lazy listing stops
+    at the page with the first match.
+    """
+    return next((res for res in resources
+                 if predicate is None or predicate(res)), None)
+
+
+def find_servers(nova, cluster_name, role=None, page_size=PAGE_SIZE):
+    """Lazily yield the servers of a cluster
+
+    Nova filters the servers by a regular expression of the host names of
+    the cluster. As not all nova backends understand every expression, the
+    names are matched again here.
+
+    Args:
+        nova: An OpenStack NOVA client
+        cluster_name (str): The name of the cluster
+        role (str): Only yield servers of this role (master or node)
+        page_size (int): The number of servers fetched with one request
+    """
+    pattern = host_name_regex(cluster_name, role)
+    names = re.compile(pattern)
+    servers = paginate(nova.servers.list, page_size,
+                       search_opts={'name': pattern})
+    return (srv for srv in servers if names.match(srv.name))
+
+
+def find_image(conn, name):
+    """Return the first image with name, or None
+
+    Args:
+        conn: An OpenStack Connection object
+        name (str): The exact name of the image
+    """
+    return first(conn.image.images(name=name))
+
+
+def find_external_network(conn, *names, autodetect=True):
+    """Return the first external network with one of names
+
+    The names are tried in order. If none of them exists, the first
+    external network is returned if autodetect is True, else None.
+
+    Args:
+        conn: An OpenStack Connection object
+        names (str): The names of the networks to look for
+        autodetect (bool): Fall back to any external network
+    """
+    for name in filter(None, names):
+        net = first(conn.network.networks(is_router_external=True,
+                                          name=name))
+        if net:
+            return net
+
+    if autodetect:
+        return first(conn.network.networks(is_router_external=True, limit=1))
+    return None
@@ -0,0 +1,137 @@
+"""
+inventory.py
+============
+
+Find all OpenStack resources of a cluster.
+
+koris tags every server, port, network, subnet, router, security group
+and LoadBalancer it creates with :func:`koris.cloud.discovery.cluster_tag`
+and sets the metadata key ``CLUSTER_METADATA_KEY`` on every volume. Thus
+most of the inventory of a cluster is found with one filtered list request
+per resource type, regardless of the size of the cluster or the project.
+Servers and volumes are also looked up by their names, with a server side
+filter, since clusters created by older versions of koris may be partly
+untagged.
+
+Example:
+    >>> inventory = ClusterInventory("koris", nova, cinder, conn)
+    >>> inventory.collect()
+    {'servers': [...], 'volumes': [...], 'ports': [...], ...}
+"""
+import re
+
+from cinderclient.exceptions import (BadRequest, NotAcceptable,
+                                     UnsupportedVersion)
+
+from koris.cloud.discovery import (CLUSTER_METADATA_KEY, cluster_tag,
+                                   find_servers, paginate)
+from koris.cloud.openstack import (TAGS_MICROVERSION, VOLUME_NAME_MICROVERSION,
+                                   get_cinder_microversion,
+                                   get_nova_microversion)
+from koris.util.logger import Logger
+from koris.util.util import get_executor, host_name_regex
+
+LOGGER = Logger(__name__)
+
+
+def _merge(*resources):
+    """return the resources of all lists, each one once"""
+    merged = {}
+    for item in (item for items in resources for item in items):
+        merged.setdefault(item.id, item)
+    return list(merged.values())
+
+
+class ClusterInventory:
+    """The OpenStack resources of a cluster
+
+    Args:
+        cluster_name (str): The name of the cluster
+        nova: An OpenStack NOVA client
+        cinder: An OpenStack CINDER client
+        conn: An OpenStack Connection object
+    """
+    kinds = ("servers", "volumes", "ports", "networks", "subnets",
+             "routers", "security_groups", "load_balancers")
+
+    def __init__(self, cluster_name, nova, cinder, conn):
+        self.cluster_name = cluster_name
+        self.nova = nova
+        self.cinder = cinder
+        self.conn = conn
+        self.tag = cluster_tag(cluster_name)
+
+    def servers(self):
+        """return all servers of the cluster
+
+        Servers which were created before koris tagged its resources, e.g.
+        the masters of a cluster which was extended later, are found by
+        their names.
+        """
+        nova = get_nova_microversion(self.nova, TAGS_MICROVERSION)
+        return _merge(paginate(nova.servers.list,
+                               search_opts={'tags': self.tag}),
+                      find_servers(self.nova, self.cluster_name))
+
+    def volumes(self):
+        """return all volumes of the cluster
+
+        Volumes without the cluster metadata are found by their names,
+        which are the names of the servers they were created for. Cinder
+        filters them by the prefix of the names. If it is too old to filter
+        by a part of the name, all volumes are listed, but only if none
+        carries the metadata, i.e. for clusters of older versions of koris.
+        """
+        tagged = list(paginate(self.cinder.volumes.list, search_opts={
+            'metadata': {CLUSTER_METADATA_KEY: self.cluster_name}}))
+        try:
+            cinder = get_cinder_microversion(self.cinder,
+                                             VOLUME_NAME_MICROVERSION)
+            named = list(paginate(cinder.volumes.list, search_opts={
+                'name~': "%s-" % self.cluster_name}))
+        except (BadRequest, NotAcceptable, UnsupportedVersion) as err:
+            LOGGER.debug("Cinder can't filter volumes by name: %s", err)
+            named = [] if tagged else list(paginate(self.cinder.volumes.list))
+
+        names = re.compile(host_name_regex(self.cluster_name))
+        return _merge(tagged, (vol for vol in named
+                               if names.match(vol.name or '')))
+
+    def ports(self):
+        """return all network ports of the cluster"""
+        return list(self.conn.network.ports(tags=self.tag))
+
+    def networks(self):
+        """return all networks of the cluster"""
+        return list(self.conn.network.networks(tags=self.tag))
+
+    def subnets(self):
+        """return all subnets of the cluster"""
+        return list(self.conn.network.subnets(tags=self.tag))
+
+    def routers(self):
+        """return all routers of the cluster"""
+        return list(self.conn.network.routers(tags=self.tag))
+
+    def security_groups(self):
+        """return all security groups of the cluster"""
+        return list(self.conn.network.security_groups(tags=self.tag))
+
+    def load_balancers(self):
+        """return all LoadBalancers of the cluster"""
+        return list(self.conn.load_balancer.load_balancers(tags=self.tag))
+
+    def collect(self, kinds=None):
+        """list the resources of all kinds concurrently
+
+        Args:
+            kinds (tuple): The kinds of resources to list, defaults to
+                :attr:`kinds`
+
+        Returns:
+            dict: The resources by kind
+        """
+        kinds = kinds or self.kinds
+        resources = get_executor().map(lambda kind: getattr(self, kind)(),
+                                       kinds)
+        return dict(zip(kinds, resources))
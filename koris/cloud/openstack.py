@@ -3,18 +3,31 @@ functions and classes to interact with openstack
 """
 # pylint: disable=too-many-lines
 import asyncio
+import atexit
 import base64
 import copy
 import json
 import os
+import socket
 import sys
 import textwrap
+import threading
+import time
 
-from functools import lru_cache
+from functools import lru_cache, wraps
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
 
 from netaddr import IPNetwork, valid_ipv4, valid_ipv6
 from novaclient import client as nvclient
-from novaclient.exceptions import (NotFound as NovaNotFound, NoUniqueMatch)  # noqa
+from novaclient.v2.flavors import Flavor
+from novaclient.v2.images import Image
+from novaclient.exceptions import (NotFound as NovaNotFound, NoUniqueMatch,
+                                   BadRequest as NovaBadRequest,
+                                   NotAcceptable as NovaNotAcceptable,
+                                   UnsupportedVersion)
 from cinderclient import client as cclient
 
 from neutronclient.v2_0 import client as ntclient
@@ -24,14 +37,22 @@ from neutronclient.common.exceptions import (Conflict as NeutronConflict,
 from octaviaclient.api.v2.octavia import OctaviaAPI
 
 from openstack.exceptions import ConflictException as OSConflict
+from openstack.exceptions import HttpException as OSHttpException
+from openstack.exceptions import raise_from_response
 from openstack.exceptions import ResourceNotFound as OSNotFound
+from openstack.network.v2.network import Network
 
 from keystoneauth1 import identity
 from keystoneauth1 import session
 
-from koris.cloud import OpenStackAPI
-from koris.util.util import (host_names, retry)
+from koris.cloud import OpenStackAPI, discovery
+from koris.cloud.discovery import CLUSTER_METADATA_KEY, cluster_tag
+from koris.util.apistats import API_STATS
+from koris.util.cache import TokenCache
+from koris.util.util import (host_names, retry, run_blocking, prefetch,
+                             LazyAttribute)
 from koris.util.logger import Logger
+from koris.util.tracing import span
 from koris import MASTER_LISTENER_NAME, MASTER_POOL_NAME
 
 
@@ -43,6 +64,66 @@ LOGGER = Logger(__name__)
 # get initialized correctly.
 NOVA, NEUTRON, CINDER, OCTAVIA = None, None, None, None
 
+# The keystoneauth session of all clients, see get_session.
+SESSION = None
+
+# The number of HTTP connections kept open per OpenStack endpoint. This
+# should not be lower than the number of concurrent requests.
+HTTP_POOL_SIZE = int(os.environ.get("KORIS_HTTP_POOL_SIZE", 20))
+
+
+class KeepAliveAdapter(HTTPAdapter):
+    """An HTTPAdapter which enables TCP keep-alive on its connections, so
+    idle connections in the pool survive firewalls and NAT"""
+
+    def init_poolmanager(self, *args, **kwargs):  # pylint: disable=arguments-differ
+        kwargs["socket_options"] = HTTPConnection.default_socket_options + [
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+        super().init_poolmanager(*args, **kwargs)
+
+
+def get_session(pool_size=None):
+    """Return the keystoneauth session shared by all OpenStack clients.
+
+    The session is authenticated with the ``OS_*`` variables of the sourced
+    RC file. If ``KORIS_TOKEN_CACHE`` is set, the token is cached encrypted
+    on disk and used by the next koris calls until it expires, see
+    :class:`koris.util.cache.TokenCache`.
+
+    Args:
+        pool_size (int): The number of HTTP connections per endpoint,
+            defaults to ``HTTP_POOL_SIZE``
+    """
+    global SESSION  # pylint: disable=global-statement
+    if SESSION is not None:
+        return SESSION
+
+    variables = read_os_auth_variables()
+    try:
+        auth = identity.Password(**variables)
+    except TypeError:
+        LOGGER.error("Did you source your OS rc file in v3?")
+        LOGGER.error("If your file has the key OS_ENDPOINT_TYPE it's the"
+                     " wrong one!")
+        sys.exit(1)
+    except KeyError:
+        LOGGER.error("Did you source your OS rc file?")
+        sys.exit(1)
+
+    http = requests.Session()
+    adapter = KeepAliveAdapter(pool_connections=pool_size or HTTP_POOL_SIZE,
+                               pool_maxsize=pool_size or HTTP_POOL_SIZE)
+    http.mount("https://", adapter)
+    http.mount("http://", adapter)
+
+    if os.environ.get("KORIS_TOKEN_CACHE") and variables.get("password"):
+        token_cache = TokenCache(auth, variables["password"])
+        token_cache.load()
+        atexit.register(token_cache.save)
+
+    SESSION = API_STATS.install(session.Session(auth=auth, session=http))
+    return SESSION
+
 
 # pylint: disable=redefined-outer-name, global-statement
 def get_clients(with_octavia=False):
@@ -54,30 +135,79 @@ def get_clients(with_octavia=False):
     global NOVA, NEUTRON, CINDER, OCTAVIA
     if(not NOVA or not NEUTRON or not CINDER):
         # at least one client has not already been initialized
-        try:
-            auth = identity.Password(**read_os_auth_variables())
-            sess = session.Session(auth=auth)
-            NOVA = nvclient.Client('2.1', session=sess)
-            NEUTRON = ntclient.Client(session=sess)
-            CINDER = cclient.Client('3.0', session=sess)
-            if with_octavia:
-                endpoint = os.environ.get("OCTAVIA_ENDPOINT",
-                                          "https://de-nbg6-1.noris.cloud:9876/v2.0/")
-                OCTAVIA = OctaviaAPI(session=sess, endpoint=endpoint)
-
-        except TypeError:
-            LOGGER.error("Did you source your OS rc file in v3?")
-            LOGGER.error("If your file has the key OS_ENDPOINT_TYPE it's the"
-                         " wrong one!")
-            sys.exit(1)
-        except KeyError:
-            LOGGER.error("Did you source your OS rc file?")
-            sys.exit(1)
+        sess = get_session()
+        NOVA = nvclient.Client('2.1', session=sess)
+        NEUTRON = ntclient.Client(session=sess)
+        CINDER = cclient.Client('3.0', session=sess)
+    if with_octavia and not OCTAVIA:
+        endpoint = os.environ.get("OCTAVIA_ENDPOINT",
+                                  "https://de-nbg6-1.noris.cloud:9876/v2.0/")
+        OCTAVIA = OctaviaAPI(session=get_session(), endpoint=endpoint)
     if with_octavia:
         return NOVA, NEUTRON, CINDER, OCTAVIA
     return NOVA, NEUTRON, CINDER
 
 
+# Compute API microversion needed for booting many servers with one request:
+# 2.67 allows to set the volume type of volumes created by nova.
+BATCH_BOOT_MICROVERSION = "2.67"
+# 2.52 allows to tag servers when they are created
+TAGS_MICROVERSION = "2.52"
+# 3.34 allows to filter volumes by a part of their name
+VOLUME_NAME_MICROVERSION = "3.34"
+
+# parts of the fault message of a bad request, if the cloud does not know
+# the listeners and pools nested in a LoadBalancer or listener
+POPULATED_UNSUPPORTED = ("unrecognized attribute", "unknown attribute")
+
+
+# the position of a server in its multi-create request, if the policy of
+# the cloud shows it
+LAUNCH_INDEX = "OS-EXT-SRV-ATTR:launch_index"
+
+
+def launch_order(server):
+    """Return a sort key for the servers of one multi-create request.
+
+    The servers are sorted by their launch index, if it is shown, else by
+    their creation time and ID. The names are not used, since the cloud may
+    name the servers with any ``multi_instance_display_name_template``.
+    """
+    index = getattr(server, LAUNCH_INDEX, None)
+    created = getattr(server, "created", None)
+    return (index if isinstance(index, int) else float("inf"),
+            created if isinstance(created, str) else "",
+            str(server.id))
+
+
+@lru_cache()
+def get_nova_microversion(nova, version):
+    """Return a nova client for a specific microversion.
+
+    The client shares the session (and thus the token) of ``nova``, so no
+    further authentication is needed.
+
+    Args:
+        nova: An OpenStack NOVA client
+        version (str): The compute API microversion, e.g. "2.67"
+    """
+    return nvclient.Client(version, session=nova.client.session)
+
+
+@lru_cache()
+def get_cinder_microversion(cinder, version):
+    """Return a cinder client for a specific microversion.
+
+    Like :func:`get_nova_microversion`, the client shares the session of
+    ``cinder``.
+
+    Args:
+        cinder: An OpenStack CINDER client
+        version (str): The block storage API microversion, e.g. "3.34"
+    """
+    return cclient.Client(version, session=cinder.client.session)
+
+
 if getattr(sys, 'frozen', False):  # pragma: nocoverage
     def monkey_patch():
         """monkey patch get available versions, because the original
@@ -94,6 +224,9 @@ if getattr(sys, 'frozen', False):  # pragma: nocoverage
 def get_connection():
     """Establishes an OpenStack connection.
 
+    The connection uses the session of the low level clients, see
+    :func:`get_session`, so koris authenticates only once.
+
     This function will exit with error code 1 in case a connection could not be
     established.
 
@@ -102,7 +235,10 @@ def get_connection():
     """
 
     try:
-        conn = OpenStackAPI.connect()
+        conn = OpenStackAPI.connection.Connection(
+            session=get_session(),
+            region_name=os.environ.get("OS_REGION_NAME"),
+            interface=os.environ.get("OS_INTERFACE", "public"))
     except OpenStackAPI.exceptions.ConfigException as exc:
         LOGGER.error("unable to establish OpenStack Cloud connection:")
         LOGGER.error("%s - have you sourced your OpenStack RC file?", exc)
@@ -152,6 +288,84 @@ class BuilderError(Exception):
     """Raise a custom error if the build fails"""
 
 
+@lru_cache()
+def neutron_extensions(netclient):
+    """Return the aliases of all extensions of neutron"""
+    return frozenset(ext['alias'] for ext in
+                     netclient.list_extensions()['extensions'])
+
+
+def tag_network_resource(conn, collection, resource_id, cluster_name):
+    """Tag a neutron resource with the tag of its cluster
+
+    Clouds without tag support only log a warning, since the resources
+    can still be found by their names.
+
+    Args:
+        conn: An OpenStack Connection object
+        collection (str): The neutron collection, e.g. ``networks``
+        resource_id (str): The ID of the resource
+        cluster_name (str): The name of the cluster
+    """
+    try:
+        response = conn.network.put(
+            '/%s/%s/tags' % (collection, resource_id),
+            json={'tags': [cluster_tag(cluster_name)]})
+        raise_from_response(response)
+    except OSHttpException as err:
+        LOGGER.warning("Could not tag %s %s: %s", collection, resource_id,
+                       err)
+
+
+# the maximal number of ports created with a single bulk request
+PORTS_BULK_SIZE = 50
+
+
+# pylint: disable=too-many-arguments
+def attach_ports(netclient, instances, net, secgroups,
+                 chunk_size=PORTS_BULK_SIZE, tags=None):
+    """create the network ports of many instances with bulk requests
+
+    Neutron creates all ports of a bulk request in one transaction, thus
+    instead of one request per instance, only one request per ``chunk_size``
+    instances is done. Instances which already exist or already have a port
+    are skipped.
+
+    Args:
+        netclient: A neutron client
+        instances (list): :class:`Instance` objects
+        net (str): The ID of the network
+        secgroups (list): The IDs of the security groups
+        chunk_size (int): The maximal number of ports per request
+        tags (list): The tags of the ports. If neutron can't tag ports in
+            the bulk request, they are tagged one by one afterwards.
+
+    Returns:
+        The list of instances which got a new port
+    """
+    instances = [inst for inst in instances
+                 if not inst.exists and not inst.ports]
+    tag_in_bulk = bool(tags) and (
+        'tag-ports-during-bulk-creation' in neutron_extensions(netclient))
+    for idx in range(0, len(instances), chunk_size):
+        chunk = instances[idx:idx + chunk_size]
+        LOGGER.debug("Creating %d network ports ...", len(chunk))
+        specs = [{"admin_state_up": True,
+                  "name": inst.name,
+                  "network_id": net,
+                  "security_groups": secgroups} for inst in chunk]
+        if tag_in_bulk:
+            for spec in specs:
+                spec["tags"] = tags
+        ports = netclient.create_port({"ports": specs})
+        for inst, port in zip(chunk, ports['ports']):
+            if tags and not tag_in_bulk:
+                netclient.replace_tag('ports', port['id'], {'tags': tags})
+            inst.ports.append({'port': port})
+
+    return instances
+
+
 class InstanceExists(Exception):
     """raise a custom error if the machine exists"""
 
@@ -160,15 +374,214 @@ class InstanceNotFound(Exception):
     """Raises a custom error if machine doesn't exist."""
 
 
+class StatusPoller:
+    """Watch the status of many volumes and servers with batched requests.
+
+    Instead of every :class:`Instance` polling its own volume and server,
+    the waiting coroutines register with a shared poller. On each tick the
+    poller issues one filtered ``volumes.list`` and one filtered
+    ``servers.list`` for all pending resources and wakes up every waiter
+    whose resource reached the desired state.
+
+    The interval between two ticks starts with ``interval`` seconds and grows
+    by ``backoff`` up to ``max_interval`` seconds as long as nothing changes.
+    As soon as any pending resource changes its state, the interval is reset.
+
+    Example:
+        >>> poller = StatusPoller(nova, cinder, cluster_name="koris")
+        >>> vol = await poller.wait_for_volume(vol.id)
+        >>> srv = await poller.wait_for_server(srv.id)
+
+    Args:
+        nova: An OpenStack NOVA client
+        cinder: An OpenStack CINDER client
+        cluster_name (str): Restricts the list requests to resources of
+            this cluster. If None, all resources of the project are listed.
+        interval (float): The shortest interval between two ticks.
+        max_interval (float): The longest interval between two ticks.
+        backoff (float): The factor by which the interval grows.
+        max_errors (int): The number of consecutive failed ticks, after which
+            all waiters are aborted.
+        max_missing (int): The number of consecutive ticks a resource may
+            be missing from the list, e.g. because it was deleted, before
+            its waiters fail.
+    """
+
+    def __init__(self, nova, cinder, cluster_name=None, interval=1,
+                 max_interval=5, backoff=1.5, max_errors=5, max_missing=10):
+        self.nova = nova
+        self.cinder = cinder
+        self.cluster_name = cluster_name
+        self.interval = interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_errors = max_errors
+        self.max_missing = max_missing
+        # kind -> resource id -> [(predicate, future), ...]
+        self._waiters = {'volume': {}, 'server': {}}
+        self._states = {}
+        # resource id -> the number of ticks it was missing in a row
+        self._missing = {}
+        self._task = None
+
+    @property
+    def volume_metadata(self):
+        """The metadata to set on created volumes, so they are listed"""
+        if not self.cluster_name:
+            return {}
+        return {CLUSTER_METADATA_KEY: self.cluster_name}
+
+    def _list(self, kind):
+        """Return all resources of kind which may be waited for"""
+        if kind == 'volume':
+            search_opts = {}
+            if self.cluster_name:
+                search_opts['metadata'] = self.volume_metadata
+            return self.cinder.volumes.list(search_opts=search_opts)
+
+        search_opts = {}
+        if self.cluster_name:
+            # nova treats the name filter as a regular expression
+            search_opts['name'] = "^%s-" % self.cluster_name
+        return self.nova.servers.list(search_opts=search_opts)
+
+    async def wait_for_volume(self, vol_id, predicate=None):
+        """Wait until a volume is available (or predicate is True).
+
+        Raises:
+            BuilderError if the volume goes into an error state.
+
+        Returns:
+            The volume as returned by the last list request.
+        """
+        if predicate is None:
+            predicate = lambda vol: vol.status == 'available'  # noqa
+        return await self._wait('volume', vol_id, predicate)
+
+    async def wait_for_server(self, server_id, predicate=None):
+        """Wait until a server has left the BUILD state (or predicate is True).
+
+        Raises:
+            BuilderError if the server goes into an error state.
+
+        Returns:
+            The server as returned by the last list request.
+        """
+        if predicate is None:
+            predicate = lambda srv: srv.status != 'BUILD'  # noqa
+        return await self._wait('server', server_id, predicate)
+
+    async def _wait(self, kind, res_id, predicate):
+        future = asyncio.get_event_loop().create_future()
+        self._waiters[kind].setdefault(res_id, []).append((predicate, future))
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        return await future
+
+    @property
+    def pending(self):
+        """The number of resources which are waited for"""
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    async def _run(self):
+        interval, errors = self.interval, 0
+        while self.pending:
+            await asyncio.sleep(interval)
+            try:
+                changed = await self._tick()
+                errors = 0
+            except Exception as exc:  # pylint: disable=broad-except
+                errors += 1
+                LOGGER.debug("Polling resource status failed: %s", exc)
+                if errors >= self.max_errors:
+                    self._abort(BuilderError(str(exc)))
+                    return
+                changed = False
+
+            if changed:
+                interval = self.interval
+            else:
+                interval = min(interval * self.backoff, self.max_interval)
+
+    async def _tick(self):
+        """Poll all pending resources once.
+
+        Returns:
+            True if the state of at least one pending resource changed.
+        """
+        changed = False
+        for kind, waiters in self._waiters.items():
+            if not waiters:
+                continue
+
+            resources = {res.id: res for res in
+                         await run_blocking(self._list, kind)}
+            for res_id in list(waiters):
+                res = resources.get(res_id)
+                if res is None:
+                    self._missing[res_id] = self._missing.get(res_id, 0) + 1
+                    if self._missing[res_id] >= self.max_missing:
+                        self._fail(kind, res_id, BuilderError(
+                            "%s %s was not found in %d polls" % (
+                                kind, res_id, self._missing[res_id])))
+                    continue
+
+                self._missing.pop(res_id, None)
+                state = (res.status, getattr(res, 'bootable', None))
+                if self._states.get(res_id) != state:
+                    self._states[res_id] = state
+                    changed = True
+
+                self._notify(kind, res_id, res)
+
+        return changed
+
+    def _notify(self, kind, res_id, res):
+        """Resolve the futures of all waiters whose predicate is fulfilled"""
+        pending = []
+        for predicate, future in self._waiters[kind].pop(res_id):
+            if future.done():
+                continue
+            if res.status.lower() == 'error':
+                future.set_exception(BuilderError(
+                    "%s %s is in state %s" % (kind, res_id, res.status)))
+            elif predicate(res):
+                future.set_result(res)
+            else:
+                pending.append((predicate, future))
+
+        if pending:
+            self._waiters[kind][res_id] = pending
+        else:
+            self._states.pop(res_id, None)
+
+    def _fail(self, kind, res_id, exc):
+        """Raise exc in all waiters of a resource"""
+        for _, future in self._waiters[kind].pop(res_id):
+            if not future.done():
+                future.set_exception(exc)
+        self._states.pop(res_id, None)
+        self._missing.pop(res_id, None)
+
+    def _abort(self, exc):
+        for waiters in self._waiters.values():
+            for res_waiters in waiters.values():
+                for _, future in res_waiters:
+                    if not future.done():
+                        future.set_exception(exc)
+            waiters.clear()
+
+
 class Instance:  # pylint: disable=too-many-arguments
     """
     Create an Openstack Server with an attached volume
     """
 
     def __init__(self, cinder, nova, name, network, zone, role,
-                 volume_config, flavor):
+                 volume_config, flavor, poller=None):
         self.cinder = cinder
         self.nova = nova
+        self.poller = poller or StatusPoller(nova, cinder)
         self.name = name
         self.network = network
         self.zone = zone
@@ -197,10 +610,12 @@ class Instance:  # pylint: disable=too-many-arguments
 
     def attach_port(self, netclient, net, secgroups):
         """associate a network port with an instance"""
-        port = netclient.create_port({"port": {"admin_state_up": True,
-                                               "network_id": net,
-                                               "security_groups": secgroups}})
-        self.ports.append(port)
+        attach_ports(netclient, [self], net, secgroups)
+
+    @property
+    def cluster_name(self):
+        """the name of the cluster, see :func:`koris.util.util.host_names`"""
+        return self.name.rsplit('-', 2)[0]
 
     async def _create_volume(self):  # pragma: no coverage
         bdm_v2 = {
@@ -210,22 +625,27 @@ class Instance:  # pylint: disable=too-many-arguments
             "destination_type": "volume",
             "delete_on_termination": True}
 
-        vol = self.cinder.volumes.create(self.volume_config.get('size', 25),
-                                         name=self.name,
-                                         imageRef=self.volume_config.get('image').id,
-                                         availability_zone=self.zone,
-                                         volume_type=self.volume_config.get('class'))
+        with span("create_volume", size=self.volume_config.get('size', 25)):
+            vol = await run_blocking(
+                self.cinder.volumes.create,
+                self.volume_config.get('size', 25),
+                name=self.name,
+                imageRef=self.volume_config.get('image').id,
+                availability_zone=self.zone,
+                volume_type=self.volume_config.get('class'),
+                metadata=self.poller.volume_metadata)
 
-        while vol.status != 'available':
-            await asyncio.sleep(1)
-            vol = self.cinder.volumes.get(vol.id)
+        with span("wait_volume"):
+            vol = await self.poller.wait_for_volume(vol.id)
 
         LOGGER.debug("created volume %s %s", vol, vol.volume_type)
 
         if vol.bootable != 'true':
-            vol.update(bootable=True)
-            # wait for mark as bootable
-            await asyncio.sleep(2)
+            with span("set_bootable"):
+                await run_blocking(self.cinder.volumes.set_bootable, vol, True)
+                # wait for mark as bootable
+                vol = await self.poller.wait_for_volume(
+                    vol.id, lambda v: v.bootable == 'true')
 
         volume_data = copy.deepcopy(bdm_v2)
         volume_data['uuid'] = vol.id
@@ -236,63 +656,215 @@ class Instance:  # pylint: disable=too-many-arguments
         """
         Boot the instance on openstack
         returns the OpenStack instance
+
+        The server is tagged with the cluster tag. If the cloud does not
+        support the microversion of server tags, it is created untagged.
         """
         if self.exists:
             return self
 
-        volume_data = await self._create_volume()
-
-        try:
-            LOGGER.info("Creating instance %s... ", self.name)
-            instance = self.nova.servers.create(
-                name=self.name,
-                availability_zone=self.zone,
-                image=None,
-                key_name=keypair.name,
-                flavor=flavor,
-                nics=self.nics, security_groups=secgroups,
-                block_device_mapping_v2=[volume_data],
-                userdata=userdata
-            )
-        except (Exception) as err:
-            LOGGER.error("Something weired happend, I so I didn't create %s" %
-                         self.name)
-            LOGGER.info("Removing cluster ...")
-            LOGGER.info(f"Exception: {err}")
-            raise BuilderError(str(err))
-
-        inst_status = instance.status
-        LOGGER.debug("Waiting 5 seconds for machine to be launched ... ")
-        await asyncio.sleep(5)
-
-        while inst_status == 'BUILD':
-            LOGGER.debug(
-                "Instance: %s is in in %s state, sleeping for 5 more seconds",
-                instance.name, inst_status)
-            await asyncio.sleep(5)
-            instance = self.nova.servers.get(instance.id)
+        with span("instance", host=self.name, role=self.role, zone=self.zone):
+            volume_data = await self._create_volume()
+
+            server = dict(name=self.name,
+                          availability_zone=self.zone,
+                          image=None,
+                          key_name=keypair.name,
+                          flavor=flavor,
+                          nics=self.nics, security_groups=secgroups,
+                          block_device_mapping_v2=[volume_data],
+                          userdata=userdata)
+            try:
+                LOGGER.info("Creating instance %s... ", self.name)
+                nova = get_nova_microversion(self.nova, TAGS_MICROVERSION)
+                with span("create_server"):
+                    try:
+                        instance = await run_blocking(
+                            nova.servers.create,
+                            tags=[cluster_tag(self.cluster_name)], **server)
+                    except (NovaBadRequest, NovaNotAcceptable,
+                            UnsupportedVersion) as err:
+                        # the cloud can't tag servers, they are found by
+                        # their names instead
+                        LOGGER.warning("Creating %s without tags: %s",
+                                       self.name, err)
+                        instance = await run_blocking(self.nova.servers.create,
+                                                      **server)
+            except (Exception) as err:
+                LOGGER.error("Something weired happend, I so I didn't create %s" %
+                             self.name)
+                LOGGER.info("Removing cluster ...")
+                LOGGER.info(f"Exception: {err}")
+                raise BuilderError(str(err))
+
+            LOGGER.debug("Waiting for instance %s to be launched ...", self.name)
+            with span("wait_server"):
+                instance = await self.poller.wait_for_server(instance.id)
             inst_status = instance.status
 
-        LOGGER.debug(f"Instance '{instance.name} is in state: {inst_status}")
+            LOGGER.debug(f"Instance '{instance.name} is in state: {inst_status}")
 
-        self._ip_address = instance.interface_list()[0].fixed_ips[0]['ip_address']
-        LOGGER.success(
-            "Instance '%s' booted successfully. Status: %s, IP: %s",
-            self.name, instance.status, self._ip_address)
+            interfaces = await run_blocking(instance.interface_list)
+            self._ip_address = interfaces[0].fixed_ips[0]['ip_address']
+            LOGGER.success(
+                "Instance '%s' booted successfully. Status: %s, IP: %s",
+                self.name, instance.status, self._ip_address)
 
-        self.exists = True
-        return self
+            self.exists = True
+            return self
+
+    @staticmethod
+    async def create_batch(instances, flavor, secgroups, keypair, userdata):
+        """Boot many instances with a single multi-create request.
+
+        All instances must share the availability zone, volume configuration
+        and network and must not have ports attached, since nova creates the
+        ports and the volumes itself. Nova names the servers after its
+        ``multi_instance_display_name_template``, so the servers are renamed
+        to the names of the instances afterwards. If the servers of the
+        reservation can't be matched to the instances, they are deleted
+        again. The userdata must not
+        depend on the name of the server, see ``hostname_from_metadata`` of
+        :class:`koris.provision.cloud_init.NodeInit`.
+
+        Args:
+            instances (list): :class:`Instance` objects to boot
+            flavor: The flavor of all instances
+            secgroups (list): The IDs of the security groups
+            keypair: An OpenStack keypair
+            userdata (str): The userdata of all instances
+
+        Returns:
+            The list of booted instances
+        """
+        instances = [inst for inst in instances if not inst.exists]
+        if not instances:
+            return []
+
+        first = instances[0]
+        nova = get_nova_microversion(first.nova, BATCH_BOOT_MICROVERSION)
+        bdm_v2 = {
+            "boot_index": 0,
+            "source_type": "image",
+            "uuid": first.volume_config.get('image').id,
+            "volume_size": str(first.volume_config.get('size', 25)),
+            "volume_type": first.volume_config.get('class'),
+            "destination_type": "volume",
+            "delete_on_termination": True}
+
+        LOGGER.info("Creating %d instances in %s ...", len(instances),
+                    first.zone)
+        with span("batch_boot", zone=first.zone, role=first.role,
+                  count=len(instances)):
+            try:
+                reservation_id = await run_blocking(
+                    nova.servers.create,
+                    name=first.name,
+                    availability_zone=first.zone,
+                    image=None,
+                    key_name=keypair.name,
+                    flavor=flavor,
+                    nics=[{'net-id': first.network['id']}],
+                    security_groups=secgroups,
+                    block_device_mapping_v2=[bdm_v2],
+                    userdata=userdata,
+                    tags=[cluster_tag(first.cluster_name)],
+                    min_count=len(instances),
+                    max_count=len(instances),
+                    reservation_id=True)
+            except (Exception) as err:
+                LOGGER.error("Failed to create instances %s ... %s",
+                             first.name, instances[-1].name)
+                LOGGER.info(f"Exception: {err}")
+                raise BuilderError(str(err))
+
+            servers = await run_blocking(
+                nova.servers.list,
+                search_opts={'reservation_id': reservation_id})
+            if len(servers) != len(instances):
+                LOGGER.error("Deleting the servers of reservation %s ...",
+                             reservation_id)
+                await asyncio.gather(*[run_blocking(server.delete)
+                                       for server in servers],
+                                     return_exceptions=True)
+                raise BuilderError(
+                    "Expected %d servers for reservation %s, got %d" % (
+                        len(instances), reservation_id, len(servers)))
+            servers = sorted(servers, key=launch_order)
+
+            # pylint: disable=protected-access
+            await asyncio.gather(*[inst._adopt(server) for inst, server in
+                                   zip(instances, servers)])
+            return instances
+
+    async def _adopt(self, server):
+        """rename a server created by a batch and wait until it is booted"""
+        with span("instance", host=self.name, role=self.role, zone=self.zone):
+            if server.name != self.name:
+                with span("rename"):
+                    await run_blocking(server.update, name=self.name)
+
+            with span("wait_server"):
+                instance = await self.poller.wait_for_server(server.id)
+            interfaces = await run_blocking(instance.interface_list)
+            self.ports.append(interfaces[0])
+            self._ip_address = self.ip_address
+            LOGGER.success(
+                "Instance '%s' booted successfully. Status: %s, IP: %s",
+                self.name, instance.status, self._ip_address)
+
+            self.exists = True
+            return self
 
     async def delete(self, netclient):
         """stop and terminate an instance"""
         try:
-            server = self.nova.servers.find(name=self.name)
-            nics = list(server.interface_list())
-            server.delete()
-            list(netclient.delete_port(nic.id) for nic in nics)
-            LOGGER.success("Instance '%s' deleted successfully", server.name)
+            server = await run_blocking(self.nova.servers.find, name=self.name)
         except NovaNotFound:
-            pass
+            return
+        await delete_server(server, netclient)
+
+
+async def delete_server(server, netclient):
+    """delete a server and its network ports
+
+    Args:
+        server: A nova server
+        netclient: An OpenStack NEUTRON client
+    """
+    with span("delete_server", host=server.name):
+        try:
+            nics = await run_blocking(server.interface_list)
+            await run_blocking(server.delete)
+        except NovaNotFound:
+            return
+
+        async def delete_port(port_id):
+            try:
+                await run_blocking(netclient.delete_port, port_id)
+            except NotFound:
+                pass
+
+        await asyncio.gather(*[delete_port(nic.id) for nic in nics])
+    LOGGER.success("Instance '%s' deleted successfully", server.name)
+
+
+def mutates(operation):
+    """Decorate a method which changes a :class:`LoadBalancer`.
+
+    Before the change, wait until the LoadBalancer is ACTIVE. After the
+    change, the topology snapshot of the LoadBalancer is outdated.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            self.wait_for_active(operation)
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                self.invalidate()
+        return wrapper
+    return decorator
 
 
 class LoadBalancer:
@@ -321,6 +893,12 @@ class LoadBalancer:
         self._data = None
         self._existing_floating_ip = None
         self.conn = conn
+        # True if the listeners were created together with the LoadBalancer
+        self.populated = False
+        # seconds waited for the LoadBalancer to become ACTIVE per operation
+        self.wait_times = {}
+        # snapshot of listeners, pools and members, see topology
+        self._topology = None
 
         self.floatingip = config.get('loadbalancer', {}).get('floatingip', None)
 
@@ -394,7 +972,48 @@ class LoadBalancer:
 
         return out
 
-    def _get_master_listener(self):  # pylint: disable=too-many-return-statements
+    def topology(self, refresh=False):
+        """Return a snapshot of the listeners, pools and members of the LB.
+
+        The listeners and pools are fetched with one list request each, the
+        members of a pool on first access with :meth:`pool_members`. The
+        snapshot is kept until :meth:`invalidate` is called, which happens
+        after every change of the LoadBalancer, or ``refresh`` is set.
+
+        Returns:
+            A dict of the following structure::
+
+                {
+                    'listeners': {'<listener.id>': <listener>, ...},
+                    'pools': {'<pool.id>': <pool>, ...},
+                    'members': {'<pool.id>': [<member>, ...], ...},
+                }
+
+            The health monitor of a pool is referenced by its
+            ``healthmonitor_id``.
+        """
+        if self._topology is None or refresh:
+            listeners = self.conn.load_balancer.listeners(
+                load_balancer_id=self._id)
+            pools = self.conn.load_balancer.pools(loadbalancer_id=self._id)
+            self._topology = {
+                'listeners': {listener.id: listener for listener in listeners},
+                'pools': {pool.id: pool for pool in pools},
+                'members': {}}
+        return self._topology
+
+    def pool_members(self, pool_id):
+        """Return the members of a pool from the topology snapshot"""
+        members = self.topology()['members']
+        if pool_id not in members:
+            members[pool_id] = list(self.conn.load_balancer.members(pool_id))
+        return members[pool_id]
+
+    def invalidate(self):
+        """Forget the topology snapshot, e.g. after changing the LB"""
+        self._topology = None
+
+    def _get_master_listener(self):
         """Returns the Listener with name MASTER_LISTENER_NAME associated to the LB."""
 
         # LB isn't configured yet
@@ -402,36 +1021,16 @@ class LoadBalancer:
             LOGGER.error("LoadBalancer not configured yet")
             return None
 
-        # Get our LB from OpenStack
-        lb = self.conn.load_balancer.find_load_balancer(self._id)
-        if not lb:
-            LOGGER.error("Unable to find LoadBalancer '%s' (%s)", self.name, self._id)
-            return None
-
+        listeners = self.topology()['listeners']
         # Check if LB has listeners
-        if not lb.listeners:
+        if not listeners:
             LOGGER.error("LoadBalancer '%s' (%s) has no listeners", self.name, self._id)
             return None
 
-        # Iterate over Listeners associated with LB...
-        master_listeners = []
         listener_name = '-'.join((MASTER_LISTENER_NAME,
                                   self.config['cluster-name']))
-        for li in lb.listeners:
-            # Check if single Listener has name MASTER_LISTENER_NAME
-            try:
-                listener = self.conn.load_balancer.find_listener(li['id'])
-            except (TypeError, KeyError) as exc:
-                LOGGER.error("Unable to access LoadBalancer.listeners: %s", exc)
-                return None
-
-            # Not this one, check next
-            if not listener:
-                continue
-
-            # This one is good, append to list
-            if listener.name == listener_name:
-                master_listeners.append(listener)
+        master_listeners = [listener for listener in listeners.values()
+                            if listener.name == listener_name]
 
         if not master_listeners:
             LOGGER.error("Unable to find Listener with name '%s'",
@@ -449,8 +1048,7 @@ class LoadBalancer:
         """A list with Pool Information of a Listener.
 
         Args:
-            listener (:class:`OpenStackAPI.network.Listener`): An OpenStack Listener
-                Object
+            pool_id (str): The ID of the pool
 
         Returns:
             A dict which is of the following structure:
@@ -469,27 +1067,15 @@ class LoadBalancer:
                 }
         """
 
-        pool = self.conn.load_balancer.find_pool(pool_id)
+        pool = self.topology()['pools'].get(pool_id)
         if not pool:
             LOGGER.debug("Unable to find pool '%s'", pool_id)
             return None
 
-        # Get information about every member in the pool
-        members = []
-        for mem in pool.members:
-            mem_id = mem['id']
-
-            member = self.conn.load_balancer.find_member(mem_id, pool)
-            if not member:
-                LOGGER.debug("Unable to find member '%s' in pool '%s' (%s)",
-                             mem_id, pool.name, pool_id)
-                continue
-
-            members.append({
-                'id': mem_id,
-                'name': member.name,
-                'address': member.address
-            })
+        members = [{'id': member.id,
+                    'name': member.name,
+                    'address': member.address}
+                   for member in self.pool_members(pool_id)]
 
         pool = {
             'name': pool.name,
@@ -502,21 +1088,25 @@ class LoadBalancer:
     async def configure(self, master_ips):
         """Configure a load balancer created in earlier step
 
+        All calls to OpenStack, including the waits between retries, run in
+        the thread pool, so the instances are created meanwhile.
+
         Args:
             master_ips (list): A list of the master IP addresses
         """
 
-        # If not present, add listener
+        # If not present, add listener with pool, members and monitor
         if not self._data.listeners:
-            listener = self.add_listener(
-                name='-'.join((MASTER_LISTENER_NAME, self.config['cluster-name'])))  # noqa
-            listener_id = listener.id
-        else:
-            LOGGER.debug("Reusing listener %s", self._data.listeners[0].id)
-            listener_id = self._data.listeners[0].id
+            await run_blocking(self.add_listeners,
+                               [self.master_listener_spec(master_ips)])
+            return
+
+        LOGGER.debug("Reusing listener %s", self._data.listeners[0].id)
+        listener_id = self._data.listeners[0].id
 
         if not self._data.pools:
-            pool = self.add_pool(
+            pool = await run_blocking(
+                self.add_pool,
                 listener_id,
                 name='-'.join((MASTER_POOL_NAME, self.config['cluster-name'])))
         else:
@@ -524,17 +1114,18 @@ class LoadBalancer:
             # (aknipping) This should be handled differently. If there are multiple
             # pools present, we want to specify which it should be added too. Maybe with a
             # default pool name that is independent of the cluster name?
-            pool = self.conn.network.find_pool(self._data.pools[0]['id'])
+            pool = await run_blocking(self.conn.network.find_pool,
+                                      self._data.pools[0]['id'])
             for member_id in [list(x.values())[0] for x in pool.members]:
-                self.del_member(member_id, pool.id)
+                await run_blocking(self.del_member, member_id, pool.id)
 
         for member in master_ips:
             LOGGER.debug("Adding member %s ...", member)
-            self.add_member(pool.id, member)
+            await run_blocking(self.add_member, pool.id, member)
         if pool.get('healthmonitor_id'):
             LOGGER.debug("Reusing existing health monitor")
         else:
-            self.add_health_monitor(pool.id)
+            await run_blocking(self.add_health_monitor, pool.id)
 
     def get(self):
         """Retrieve LoadBalancer information"""
@@ -547,13 +1138,67 @@ class LoadBalancer:
 
         return lb
 
-    def get_or_create(self):
-        """Retrieve or create a LoadBalancer"""
+    # pylint: disable=too-many-arguments
+    def wait_for_active(self, operation="wait", timeout=900, interval=0.5,
+                        max_interval=10, backoff=1.5, accept_error=False):
+        """Wait until the LoadBalancer can be changed.
+
+        While OpenStack applies a change, the LoadBalancer is immutable
+        (``PENDING_CREATE``, ``PENDING_UPDATE``). Instead of sending requests
+        which fail with a conflict, the provisioning status is polled, first
+        often, then less, and returns as soon as the LoadBalancer is
+        ``ACTIVE``.
+
+        Args:
+            operation (str): The name under which the time waited is added
+                to ``wait_times``
+            timeout (int): Maximal seconds to wait
+            interval (float): Initial seconds between polls
+            max_interval (float): Maximal seconds between polls
+            backoff (float): Multiplier of the interval after each poll
+            accept_error (bool): Return if the LoadBalancer is in ERROR state,
+                e.g. to delete it
+
+        Raises:
+            BuilderError if the LoadBalancer is in ERROR state or not ACTIVE
+            after ``timeout`` seconds.
+        """
+        if not self._id:
+            return
+
+        start = time.monotonic()
+        while True:
+            lb = self.conn.load_balancer.get_load_balancer(self._id)
+            status = lb.provisioning_status
+            waited = time.monotonic() - start
+            if status == "ACTIVE" or (status == "ERROR" and accept_error):
+                break
+            if status == "ERROR":
+                raise BuilderError("LoadBalancer %s is in ERROR state" % self.name)
+            if waited > timeout:
+                raise BuilderError("LoadBalancer %s still %s after %ds" % (
+                    self.name, status, timeout))
+            LOGGER.debug("LoadBalancer %s is %s, waiting %.1fs before %s ...",
+                         self.name, status, interval, operation)
+            time.sleep(interval)
+            interval = min(interval * backoff, max_interval)
+
+        self.wait_times.setdefault(operation, []).append(waited)
+        self._data = lb
+
+    def get_or_create(self, listeners=None):
+        """Retrieve or create a LoadBalancer
+
+        Args:
+            listeners (list): Listeners declared with :meth:`listener_spec`
+                which are created with a new LoadBalancer. They are not added
+                to an existing LoadBalancer.
+        """
 
         lb = self.get()
 
         if not lb or 'DELETE' in lb['provisioning_status']:
-            lb, fip_addr = self.create()
+            lb, fip_addr = self.create(listeners)
         else:
             LOGGER.debug("Reusing existing LoadBalancer ...")
             self._existing_floating_ip = None
@@ -603,8 +1248,16 @@ class LoadBalancer:
                 fip_addr = None
         return fip_addr
 
-    def create(self):
-        """Provision a minimally configured LoadBalancer in OpenStack
+    def create(self, listeners=None):
+        """Provision a LoadBalancer in OpenStack
+
+        If listeners are given, the LoadBalancer is created with all its
+        listeners, pools, members and health monitors in a single request.
+        If the cloud does not support this, the LoadBalancer is created
+        first and the listeners are added one after another.
+
+        Args:
+            listeners (list): Listeners declared with :meth:`listener_spec`
 
         Return:
             tuple (dict, str) - the dict is the load balancer information, if
@@ -622,15 +1275,25 @@ class LoadBalancer:
             subnets = list(self.conn.network.subnets(network_id=network.id))
             subnet_id = subnets[0].id
 
-        lb = self.conn.load_balancer.create_load_balancer(
-            vip_subnet_id=subnet_id,
-            name=f"{self.name}"
-        )
+        self._subnet_id = subnet_id
+        lb = None
+        if listeners:
+            lb = self._create_populated(listeners)
+
+        if lb is None:
+            lb = self.conn.load_balancer.create_load_balancer(
+                vip_subnet_id=subnet_id,
+                name=f"{self.name}",
+                tags=[cluster_tag(self.config['cluster-name'])]
+            )
 
         self._id = lb.id
-        self._subnet_id = subnet_id
         self._data = lb
 
+        if listeners and not self.populated:
+            self.add_listeners(listeners)
+            self.populated = True
+
         LOGGER.success("LoadBalancer '%s' (%s) created successfully",
                        self.name, self._id)
 
@@ -642,6 +1305,181 @@ class LoadBalancer:
             fip_addr = self.associate_floating_ip(lb)
         return lb, fip_addr
 
+    # pylint: disable=too-many-arguments
+    @staticmethod
+    def listener_spec(name, protocol_port, members, protocol="HTTPS",
+                      member_port=None, pool_protocol=None, pool_name=None,
+                      lb_algorithm="SOURCE_IP", health_monitor=True):
+        """Declare a listener with its pool, members and health monitor.
+
+        Example:
+            >>> spec = LoadBalancer.listener_spec("master-listener", 6443,
+            ...                                   ["10.0.0.4"])
+            >>> lb.add_listeners([spec])
+
+        Args:
+            name (str): The name of the listener
+            protocol_port (int): The port the listener listens on
+            members (list): IP addresses or dicts with ``address`` and
+                optionally ``name``, ``protocol_port`` and ``monitor_port``
+            protocol (str): The protocol of the listener
+            member_port (int): The port of the members, defaults to
+                ``protocol_port``
+            pool_protocol (str): The protocol of the pool, defaults to
+                ``protocol``
+            pool_name (str): The name of the pool, defaults to ``name``
+            lb_algorithm (str): The algorithm of the pool
+            health_monitor (bool): Whether to add a TCP health monitor
+
+        Return:
+            dict - the listener in the format of the Octavia API
+        """
+        member_port = member_port or protocol_port
+        pool_name = pool_name or name
+        pool = {"name": pool_name,
+                "protocol": pool_protocol or protocol,
+                "lb_algorithm": lb_algorithm,
+                "members": []}
+        for member in members:
+            if isinstance(member, str):
+                member = {"address": member}
+            member = {key: val for key, val in member.items()
+                      if key in ("address", "name", "protocol_port",
+                                 "monitor_port")}
+            member.setdefault("protocol_port", member_port)
+            pool["members"].append(member)
+
+        if health_monitor:
+            pool["healthmonitor"] = {"name": f"{pool_name}-health",
+                                     "type": "TCP",
+                                     "delay": 5,
+                                     "timeout": 3,
+                                     "max_retries": 4}
+
+        return {"name": name,
+                "protocol": protocol,
+                "protocol_port": protocol_port,
+                "admin_state_up": True,
+                "default_pool": pool}
+
+    def master_listener_spec(self, master_ips):
+        """Declare the listener and pool of the Kubernetes API servers"""
+        cluster_name = self.config['cluster-name']
+        return self.listener_spec(
+            '-'.join((MASTER_LISTENER_NAME, cluster_name)), 6443, master_ips,
+            pool_name='-'.join((MASTER_POOL_NAME, cluster_name)))
+
+    def _with_subnet(self, listener):
+        listener = copy.deepcopy(listener)
+        for member in listener["default_pool"]["members"]:
+            member.setdefault("subnet_id", self._subnet_id)
+        return listener
+
+    @staticmethod
+    def _populated_unsupported(err):
+        """return True, if err shows the cloud can't create fully populated
+        LoadBalancers or listeners
+
+        Such clouds don't know the path, the method, or reject the nested
+        listeners and pools as unknown attributes. Any other bad request,
+        e.g. a wrong subnet or protocol, is a real error.
+        """
+        if err.status_code in (404, 405, 501):
+            return True
+        message = " ".join(str(text) for text in (err.details, err) if text)
+        return err.status_code == 400 and any(
+            text in message.lower() for text in POPULATED_UNSUPPORTED)
+
+    def _create_populated(self, listeners):
+        """create the LoadBalancer with all listeners in a single request
+
+        Return:
+            The LoadBalancer or None, if the cloud does not support fully
+            populated LoadBalancers.
+        """
+        body = {"loadbalancer": {
+            "name": self.name,
+            "vip_subnet_id": self._subnet_id,
+            "tags": [cluster_tag(self.config['cluster-name'])],
+            "listeners": [self._with_subnet(listener)
+                          for listener in listeners]}}
+        try:
+            response = self.conn.load_balancer.post(
+                '/lbaas/loadbalancers', json=body)
+            raise_from_response(response)
+        except OSHttpException as err:
+            if not self._populated_unsupported(err):
+                raise
+            LOGGER.debug("Creating a fully populated LoadBalancer failed: %s",
+                         err)
+            return None
+
+        self.populated = True
+        return self.conn.load_balancer.get_load_balancer(
+            response.json()['loadbalancer']['id'])
+
+    @retry(exceptions=(StateInvalidClient, OSConflict), tries=10, delay=2,
+           backoff=1.5, max_delay=30, jitter=0.1, logger=LOGGER.debug)
+    @mutates("add_listeners")
+    def _create_populated_listener(self, listener):
+        """create a listener with pool, members and monitor in one request
+
+        Return:
+            The ID of the listener or None, if the cloud does not support
+            fully populated listeners.
+        """
+        body = {"listener": dict(self._with_subnet(listener),
+                                 loadbalancer_id=self._id)}
+        try:
+            response = self.conn.load_balancer.post(
+                '/lbaas/listeners', json=body)
+            raise_from_response(response)
+        except OSHttpException as err:
+            if not self._populated_unsupported(err):
+                raise
+            LOGGER.debug("Creating a fully populated listener failed: %s", err)
+            return None
+
+        return response.json()['listener']['id']
+
+    def _create_listener_incremental(self, listener):
+        pool_spec = listener["default_pool"]
+        created = self.add_listener(name=listener["name"],
+                                    protocol=listener["protocol"],
+                                    protocol_port=listener["protocol_port"])
+        pool = self.add_pool(created.id,
+                             lb_algorithm=pool_spec["lb_algorithm"],
+                             protocol=pool_spec["protocol"],
+                             name=pool_spec["name"])
+        for member in pool_spec["members"]:
+            self.add_member(pool.id, member["address"],
+                            protocol_port=member["protocol_port"])
+        if "healthmonitor" in pool_spec:
+            self.add_health_monitor(pool.id,
+                                    name=pool_spec["healthmonitor"]["name"])
+        return created.id
+
+    def add_listeners(self, listeners):
+        """Add listeners declared with :meth:`listener_spec`
+
+        Each listener is created with its pool, members and health monitor
+        in a single request. If the cloud does not support this, they are
+        created one after another.
+
+        Return:
+            list - the IDs of the listeners
+        """
+        ids = []
+        for listener in listeners:
+            listener_id = self._create_populated_listener(listener)
+            if listener_id is None:
+                listener_id = self._create_listener_incremental(listener)
+            LOGGER.debug("Added listener '%s' (%s) on port %i to LB %s",
+                         listener["name"], listener_id,
+                         listener["protocol_port"], self._id)
+            ids.append(listener_id)
+        return ids
+
     @retry(exceptions=(NeutronConflict, NotFound, BadRequest, OSConflict), backoff=1,
            tries=10, logger=LOGGER.debug)
     def delete(self):
@@ -689,8 +1527,9 @@ class LoadBalancer:
 
         return fip.floating_ip_address
 
-    @retry(exceptions=(StateInvalidClient, OSConflict), tries=20, delay=30,
-           backoff=1, logger=LOGGER.debug)
+    @retry(exceptions=(StateInvalidClient, OSConflict), tries=10, delay=2,
+           backoff=1.5, max_delay=30, jitter=0.1, logger=LOGGER.debug)
+    @mutates("add_listener")
     def add_listener(self, name=None, protocol="HTTPS",
                      protocol_port=6443):
         """Adds a custom listener to the LoadBalancer"""
@@ -713,8 +1552,9 @@ class LoadBalancer:
                      protocol, name, listener.id, protocol_port, self._id)
         return listener
 
-    @retry(exceptions=(StateInvalidClient, OSConflict), tries=30, delay=5, backoff=1,
-           logger=LOGGER.debug)
+    @retry(exceptions=(StateInvalidClient, OSConflict), tries=10, delay=2,
+           backoff=1.5, max_delay=30, jitter=0.1, logger=LOGGER.debug)
+    @mutates("add_pool")
     def add_pool(self, listener_id, lb_algorithm="SOURCE_IP", protocol="HTTPS",
                  name=None):
         """Adds a pool to a listener"""
@@ -736,8 +1576,9 @@ class LoadBalancer:
                      protocol, name, pool.id, lb_algorithm, listener_id)
         return pool
 
-    @retry(exceptions=(StateInvalidClient, OSConflict), tries=24, delay=10,
-           backoff=0.8, logger=LOGGER.debug)
+    @retry(exceptions=(StateInvalidClient, OSConflict), tries=10, delay=2,
+           backoff=1.5, max_delay=30, jitter=0.1, logger=LOGGER.debug)
+    @mutates("add_health_monitor")
     def add_health_monitor(self, pool_id, name=None):
         """Adds a Healthmonitor to a Pool"""
 
@@ -760,8 +1601,9 @@ class LoadBalancer:
                      pool_id)
         return hm
 
-    @retry(exceptions=(StateInvalidClient, OSConflict, BadRequest), tries=24,
-           delay=5, backoff=1, logger=LOGGER.debug)
+    @retry(exceptions=(StateInvalidClient, OSConflict, BadRequest), tries=10, delay=2,
+           backoff=1.5, max_delay=30, jitter=0.1, logger=LOGGER.debug)
+    @mutates("add_member")
     def add_member(self, pool_id, ip_addr, protocol_port=6443):
         """Adds a Listener to a Pool."""
 
@@ -784,6 +1626,8 @@ class LoadBalancer:
            tries=25, delay=15, backoff=0.8, logger=LOGGER.debug)
     def _del_loadbalancer(self):
         try:
+            self.wait_for_active("delete", accept_error=True)
+            self.invalidate()
             self.conn.load_balancer.delete_load_balancer(
                 self._id,
                 ignore_missing=False,
@@ -793,8 +1637,9 @@ class LoadBalancer:
         except OSNotFound:
             LOGGER.debug("Could not find  LoadBalancer %s", self._id)
 
-    @retry(exceptions=(StateInvalidClient, OSConflict), backoff=1, tries=5, delay=5,
-           logger=LOGGER.debug)
+    @retry(exceptions=(StateInvalidClient, OSConflict), tries=10, delay=2,
+           backoff=1.5, max_delay=30, jitter=0.1, logger=LOGGER.debug)
+    @mutates("del_member")
     def del_member(self, member_id, pool_id):  # pylint: disable=no-self-use
         """Deletes a member from the LoadBalancer.
 
@@ -809,8 +1654,9 @@ class LoadBalancer:
         except OSNotFound:
             LOGGER.debug("Member %s not found in pool %s", member_id, pool_id)
 
-    @retry(exceptions=(OSConflict), backoff=1, tries=5, delay=5,
-           logger=LOGGER.debug)
+    @retry(exceptions=(OSConflict), tries=10, delay=2,
+           backoff=1.5, max_delay=30, jitter=0.1, logger=LOGGER.debug)
+    @mutates("bulk_update_members")
     def bulk_update_members(self, members, pool_id=None):
         """bulk update members of a listener
 
@@ -845,19 +1691,62 @@ class LoadBalancer:
         return self.conn.load_balancer.find_load_balancer(self.name).pools[0]['id']
 
 
+# placeholder for the CIDR of the cluster subnet in SecurityGroup.rules
+SUBNET_CIDR = "subnet-cidr"
+
+
 class SecurityGroup:
     """A class to create and configure a security group in OpenStack.
 
     This class behaves differently as the OSNetwork, OSSubnet and OSRouter
     classes as we need to additional functions on it, such as ``configure``.
 
+    The rules of the security group are declared in ``rules``. A
+    ``remote_ip_prefix`` of ``SUBNET_CIDR`` is replaced with the CIDR of the
+    cluster subnet.
+
     Args:
         name (str): The name of the Security Group
         conn: An OpenStack Connection object
         subnet: An OpenStack Subnet object
     """
+    rules = (
+        # allow communication to the API server from within the cluster
+        # on port 80
+        dict(direction='ingress', protocol='TCP',
+             port_range_max=80, port_range_min=80,
+             remote_ip_prefix=SUBNET_CIDR),
+        # Allow all incoming TCP/UDP inside the cluster range
+        dict(direction='ingress', protocol='UDP',
+             remote_ip_prefix=SUBNET_CIDR),
+        dict(direction='ingress', protocol='TCP',
+             remote_ip_prefix=SUBNET_CIDR),
+        # allow all outgoing
+        # we are behind a physical firewall anyway
+        dict(direction='egress', protocol='UDP'),
+        dict(direction='egress', protocol='TCP'),
+        # Allow IPIP communication
+        dict(direction='egress', protocol=4, remote_ip_prefix=SUBNET_CIDR),
+        dict(direction='ingress', protocol=4, remote_ip_prefix=SUBNET_CIDR),
+        # allow accessing the API server
+        dict(direction='ingress', protocol='TCP',
+             port_range_max=6443, port_range_min=6443),
+        # allow node ports
+        # OpenStack load balancer talks to these too
+        dict(direction='egress', protocol='TCP',
+             port_range_max=32767, port_range_min=30000),
+        dict(direction='ingress', protocol='TCP',
+             port_range_max=32767, port_range_min=30000),
+        # allow SSH
+        dict(direction='egress', protocol='TCP',
+             port_range_max=22, port_range_min=22,
+             remote_ip_prefix=SUBNET_CIDR),
+        dict(direction='ingress', protocol='TCP',
+             port_range_max=22, port_range_min=22),
+    )
 
     def __init__(self, name, conn, subnet):
+        self.cluster_name = name
         self.name = f"{name}-sec-group"
         self.conn = conn
         self.subnet = subnet
@@ -877,6 +1766,82 @@ class SecurityGroup:
         """Deletes a security rule."""
         self.conn.delete_security_group_rule(self.id)
 
+    @staticmethod
+    def rule_key(rule):
+        """return a hashable and normalized representation of a rule
+
+        Neutron returns protocols in lower case, port ranges as integers and
+        numeric protocols as strings, thus all are normalized in order to
+        compare the desired rules with the existing ones.
+
+        Args:
+            rule: A dict or an OpenStack SecurityGroupRule object
+
+        Returns:
+            A tuple
+        """
+        def get(attr, default=None):
+            try:
+                value = rule.get(attr, default)
+            except AttributeError:
+                value = getattr(rule, attr, default)
+            return default if value is None else value
+
+        protocol = get('protocol')
+        port_min, port_max = get('port_range_min'), get('port_range_max')
+        return (get('direction'),
+                get('ethertype', 'IPv4'),
+                str(protocol).lower() if protocol is not None else None,
+                int(port_min) if port_min is not None else None,
+                int(port_max) if port_max is not None else None,
+                get('remote_ip_prefix'),
+                get('remote_group_id'))
+
+    def desired_rules(self):
+        """return the rules of the security group for this cluster"""
+        cidr = self.subnet['cidr']
+        rules = []
+        for rule in self.rules:
+            rule = dict(rule)
+            if rule.get('remote_ip_prefix') == SUBNET_CIDR:
+                rule['remote_ip_prefix'] = cidr
+            rules.append(rule)
+        return rules
+
+    def missing_rules(self):
+        """return the desired rules which do not exist in OpenStack yet"""
+        existing = {self.rule_key(rule) for rule in
+                    self.conn.network.security_group_rules(
+                        security_group_id=self.id)}
+        missing = []
+        for rule in self.desired_rules():
+            key = self.rule_key(rule)
+            if key not in existing:
+                existing.add(key)
+                missing.append(rule)
+        return missing
+
+    def add_sec_rules(self, rules):
+        """Adds many security group rules with a single bulk request.
+
+        If a rule was created concurrently, the bulk request fails as a whole
+        and the rules are added one by one.
+        """
+        if not rules:
+            return
+
+        body = [dict(rule, security_group_id=self.id) for rule in rules]
+        LOGGER.debug("Adding %d rules ...", len(body))
+        try:
+            response = self.conn.network.post(
+                '/security-group-rules',
+                json={'security_group_rules': body})
+            raise_from_response(response)
+        except OSConflict:
+            LOGGER.debug("Some rules already exist, adding rules one by one")
+            for rule in rules:
+                self.add_sec_rule(**rule)
+
     @property
     def exists(self):
         """Checks if this SecurityGroup has been created in OpenStack."""
@@ -909,48 +1874,20 @@ class SecurityGroup:
         else:
             LOGGER.info(f"Creating SecurityGroup [{self.name}] ...")
             secgroup = self.conn.network.create_security_group(name=self.name)
+            tag_network_resource(self.conn, 'security-groups', secgroup.id,
+                                 self.cluster_name)
 
         self.id = secgroup.id
         LOGGER.debug("Created SecurityGroup: %s", secgroup)
         return secgroup
 
     def configure(self):
-        """Configures the SecurityGroup for cluster usage."""
-        cidr = self.subnet['cidr']
+        """Configures the SecurityGroup for cluster usage.
 
+        Only the rules which do not exist yet are created.
+        """
         LOGGER.debug("Configuring Security Group ...")
-        # allow communication to the API server from within the cluster
-        # on port 80
-        self.add_sec_rule(direction='ingress', protocol='TCP',
-                          port_range_max=80, port_range_min=80,
-                          remote_ip_prefix=cidr)
-        # Allow all incoming TCP/UDP inside the cluster range
-        self.add_sec_rule(direction='ingress', protocol='UDP',
-                          remote_ip_prefix=cidr)
-        self.add_sec_rule(direction='ingress', protocol='TCP',
-                          remote_ip_prefix=cidr)
-        # allow all outgoing
-        # we are behind a physical firewall anyway
-        self.add_sec_rule(direction='egress', protocol='UDP')
-        self.add_sec_rule(direction='egress', protocol='TCP')
-        # Allow IPIP communication
-        self.add_sec_rule(direction='egress', protocol=4, remote_ip_prefix=cidr)
-        self.add_sec_rule(direction='ingress', protocol=4, remote_ip_prefix=cidr)
-        # allow accessing the API server
-        self.add_sec_rule(direction='ingress', protocol='TCP',
-                          port_range_max=6443, port_range_min=6443)
-        # allow node ports
-        # OpenStack load balancer talks to these too
-        self.add_sec_rule(direction='egress', protocol='TCP',
-                          port_range_max=32767, port_range_min=30000)
-        self.add_sec_rule(direction='ingress', protocol='TCP',
-                          port_range_max=32767, port_range_min=30000)
-        # allow SSH
-        self.add_sec_rule(direction='egress', protocol='TCP',
-                          port_range_max=22, port_range_min=22,
-                          remote_ip_prefix=cidr)
-        self.add_sec_rule(direction='ingress', protocol='TCP',
-                          port_range_max=22, port_range_min=22)
+        self.add_sec_rules(self.missing_rules())
 
 
 def read_os_auth_variables(trim=True):
@@ -1012,6 +1949,8 @@ class OSNetwork:  # pylint: disable=too-few-public-methods
             LOGGER.info("Creating network [%s] ... " % self.name)
             network = self.conn.create_network(name=self.name,
                                                admin_state_up=True)
+            tag_network_resource(self.conn, 'networks', network.id,
+                                 self.config['cluster-name'])
 
         if 'private_net' in self.config:
             self.config['private_net'].update(network)
@@ -1021,14 +1960,13 @@ class OSNetwork:  # pylint: disable=too-few-public-methods
         LOGGER.debug("Network: %s", network)
         return network
 
-    # pylint: disable=inconsistent-return-statements
     @staticmethod
     def find_external_network(conn, default="ext02", fallback='bgp-noris',
                               autodetect=True):
         """Finds and returns an external network in OpenStack.
 
-        This function will look for all external networks, then try to find the
-        one with name passed as the "default" parameter. In case this can't be
+        This function will look for the external network with the name passed
+        as the "default" parameter. In case this can't be
         found, it will try to return the external network with the "fallback"
         parameter. In case this can't be found, it will return the first
         external network it finds.
@@ -1045,16 +1983,8 @@ class OSNetwork:  # pylint: disable=too-few-public-methods
             An :class:`OpenStackAPI.network.v2.network` object or None if no external
                 network can be found.
         """
-
-        # Retrieve all external networks as list
-
-        ext_networks = list(conn.network.networks(is_router_external=True))
-
-        nets = [x for x in ext_networks if x.name in [default, fallback]]
-        if nets:
-            return nets[0]
-        if autodetect and ext_networks:
-            return ext_networks[0]
+        return discovery.find_external_network(conn, default, fallback,
+                                               autodetect=autodetect)
 
 
 class OSSubnet:  # pylint: disable=too-few-public-methods
@@ -1134,6 +2064,8 @@ class OSSubnet:  # pylint: disable=too-few-public-methods
             network_id=subnet['network_id'],
             cidr=subnet['cidr']
         )
+        tag_network_resource(self.conn, 'subnets', out.id,
+                             self.config['cluster-name'])
 
         self.config['private_net']['subnet'] = subnet
         LOGGER.debug("Subnet: %s", out)
@@ -1148,14 +2080,17 @@ class OSRouter:  # pylint: disable=too-few-public-methods
         subnet: An OpenStack Subnetwork Object.
         config (dcit): A dictionary containing koris config parameters.
         conn: An OpenStack Connection Object.
+        cache (:class:`koris.util.cache.DiskCache`): Look up the external
+            network there first.
     """
-    def __init__(self, network_id, subnet, config, conn):
+    # pylint: disable=too-many-arguments
+    def __init__(self, network_id, subnet, config, conn, cache=None):
         self.net_id = network_id
         self.subnet = subnet
         self.config = config
         self.conn = conn
+        self.cache = cache
         self.name = self._name()
-        self.ext_net = self._get_ext_net()
 
     def _name(self):
         """Returns the name of the default Router."""
@@ -1169,8 +2104,11 @@ class OSRouter:  # pylint: disable=too-few-public-methods
 
         return router_name
 
-    def _get_ext_net(self):
-        """Sets the external network on the Router.
+    @LazyAttribute
+    def ext_net(self):
+        """The external network of the Router.
+
+        It is only looked up when a new Router is created.
 
         Raises:
             RuntimeError if external network doesn't exist.
@@ -1182,8 +2120,20 @@ class OSRouter:  # pylint: disable=too-few-public-methods
                                    {}).get('subnet',
                                            {}).get('router', {}).get('name')
 
-        ext_net = OSNetwork.find_external_network(
-            self.conn, fallback=fallback)
+        def find():
+            return OSNetwork.find_external_network(self.conn,
+                                                   fallback=fallback)
+
+        def find_dict():
+            net = find()
+            return net.to_dict() if net else None
+
+        if self.cache is None:
+            ext_net = find()
+        else:
+            data = self.cache.get_or_set("external_network", str(fallback),
+                                         find_dict)
+            ext_net = Network.existing(**data) if data else None
         if not ext_net:
             msg = (f"Could not find any external network "
                    "({fallback} specified for router isn't found either.)")
@@ -1214,6 +2164,8 @@ class OSRouter:  # pylint: disable=too-few-public-methods
             LOGGER.debug("Setting up Router ...")
             router = self.conn.network.create_router(name=self.name,
                                                      admin_state_up=True)
+            tag_network_resource(self.conn, 'routers', router.id,
+                                 self.config['cluster-name'])
             LOGGER.debug(router)
 
             LOGGER.debug("Creating new Port for Router ...")
@@ -1318,6 +2270,9 @@ class OSClusterInfo:  # pylint: disable=too-many-instance-attributes
     set to ``None``. The function :meth:`.setup_networking` can initialize
     all resources.
 
+    All resources are retrieved lazily on first access. A command resolves
+    the ones it needs concurrently with :meth:`prefetch`.
+
     It is the responsibility of the client to check if the resources are
     available and set them up, if necessary.
 
@@ -1327,52 +2282,115 @@ class OSClusterInfo:  # pylint: disable=too-many-instance-attributes
         cinder_client: An OpenStack CINDER Client
         config (dict): A dictionary containing koris config parameters.
         conn: An OpenStack Connection Object.
+        cache (:class:`koris.util.cache.DiskCache`): Look up flavors, the
+            image and the external network there first.
     """
+    # the attributes which need requests to OpenStack
+    resources = ("keypair", "node_flavor", "master_flavor", "net", "subnet",
+                 "router", "secgroups", "image")
+
     def __init__(self, nova_client, neutron_client,
                  cinder_client,
                  config,
-                 conn):
+                 conn,
+                 cache=None):
 
         self.conn = conn
-        self.keypair = nova_client.keypairs.get(config['keypair'])
-        self.node_flavor = nova_client.flavors.find(name=config['node_flavor'])
-        self.master_flavor = nova_client.flavors.find(
-            name=config['master_flavor'])
-
-        try:
-            self.net = OSNetwork(config, self.conn).get()
-            self.subnet = OSSubnet(self.net['id'],
-                                   config,
-                                   self.conn).get()
-            self.router = OSRouter(self.net['id'],
-                                   self.subnet,
-                                   config,
-                                   self.conn).get()
-            self.subnet_id = self.subnet['id']
-            self.secgroup = SecurityGroup(config['cluster-name'],
-                                          self.conn,
-                                          subnet=self.subnet)
-            sg = self.secgroup.get()
-            self.secgroups = [sg.id]
-        except (TypeError, KeyError, AttributeError):
-            self.net = None
-            self.subnet = None
-            self.router = None
-            self.subnet_id = None
-            self.secgroup = None
-            self.secgroups = []
-
+        self.cache = cache
         self.name = config['cluster-name']
         self.n_nodes = config['n-nodes']
         self.n_masters = config['n-masters']
         self.azones = config['availibility-zones']
         self.storage_class = config['storage_class']
         self._image_name = config['image']
-        self._image = None
         self._nova = nova_client
         self._neutron = neutron_client
         self._cinder = cinder_client
         self.config = config
+        self.poller = StatusPoller(nova_client, cinder_client,
+                                   cluster_name=self.name)
+        # novaclient switches the service type of its HTTP client to image
+        # while it talks to glance, thus the prefetched lookups must not
+        # use the nova client at the same time
+        self._nova_lock = threading.Lock()
+
+    def prefetch(self, names=None):
+        """Retrieve the resources a command needs concurrently.
+
+        Args:
+            names (tuple): The names of the attributes, defaults to
+                :attr:`resources`
+
+        Returns:
+            self
+        """
+        return prefetch(self, names or self.resources)
+
+    @LazyAttribute
+    def keypair(self):
+        """the SSH keypair of the cluster"""
+        with self._nova_lock:
+            return self._nova.keypairs.get(self.config['keypair'])
+
+    def _get_flavor(self, name):
+        with self._nova_lock:
+            return self._nova.flavors.find(name=name)
+
+    def _find_flavor(self, name):
+        if self.cache is None:
+            return self._get_flavor(name)
+
+        info = self.cache.get_or_set(
+            "flavor", name, lambda: self._get_flavor(name).to_dict())
+        return Flavor(self._nova.flavors, info, loaded=True)
+
+    @LazyAttribute
+    def node_flavor(self):
+        """the flavor of the worker nodes"""
+        return self._find_flavor(self.config['node_flavor'])
+
+    @LazyAttribute
+    def master_flavor(self):
+        """the flavor of the masters"""
+        return self._find_flavor(self.config['master_flavor'])
+
+    @LazyAttribute
+    def net(self):
+        """the network of the cluster or None"""
+        return OSNetwork(self.config, self.conn).get()
+
+    @LazyAttribute
+    def subnet(self):
+        """the subnet of the cluster or None"""
+        if not self.net:
+            return None
+        return OSSubnet(self.net['id'], self.config, self.conn).get()
+
+    @LazyAttribute
+    def subnet_id(self):
+        """the ID of the subnet of the cluster or None"""
+        return self.subnet['id'] if self.subnet else None
+
+    @LazyAttribute
+    def router(self):
+        """the router of the cluster or None"""
+        if not self.subnet:
+            return None
+        return OSRouter(self.net['id'], self.subnet, self.config,
+                        self.conn, cache=self.cache).get()
+
+    @LazyAttribute
+    def secgroup(self):
+        """the :class:`SecurityGroup` of the cluster or None"""
+        if not self.subnet:
+            return None
+        return SecurityGroup(self.name, self.conn, subnet=self.subnet)
+
+    @LazyAttribute
+    def secgroups(self):
+        """the IDs of the security groups of the instances"""
+        sg = self.secgroup.get() if self.secgroup else None
+        return [sg.id] if sg else []
 
     def setup_networking(self, config=None):
         """Creates Network, Subnet, Router and Security Group if necessary.
@@ -1403,7 +2421,8 @@ class OSClusterInfo:  # pylint: disable=too-many-instance-attributes
             self.router = OSRouter(self.net['id'],
                                    self.subnet,
                                    config,
-                                   self.conn).get_or_create()
+                                   self.conn,
+                                   cache=self.cache).get_or_create()
         else:
             LOGGER.debug(f"Using existing Router [{self.router.name}] ...")
 
@@ -1412,7 +2431,8 @@ class OSClusterInfo:  # pylint: disable=too-many-instance-attributes
                                           conn=self.conn,
                                           subnet=self.subnet)
 
-        if not self.secgroup.exists:
+        # the ID is known once the group was looked up
+        if self.secgroup.id is None and not self.secgroup.exists:
             sg = self.secgroup.get_or_create()
         else:
             LOGGER.debug(f"Using existing SecurityGroup [{self.secgroup.name}] ...")
@@ -1421,35 +2441,48 @@ class OSClusterInfo:  # pylint: disable=too-many-instance-attributes
             sg = self.secgroup.get_or_create()
             self.secgroups = [sg.id]
 
-    @property
+    @LazyAttribute
     def image(self):
-        """Find the koris image in OpenStack
+        """the koris image in OpenStack, or '' if it is not found"""
+        if self.cache is None:
+            return self._find_image()
 
-        We use self._image in order to save us doing multiple calls to OpenStack
-        every time the property is called.
-        """
-        if self._image is None:
-            try:
-                self._image = self._nova.glance.find_image(self._image_name)
-                LOGGER.info("Found image %s", self._image_name)
-            except (NoUniqueMatch, NovaNotFound):
-                _id = [l.id for l in self.conn.list_images()
-                       if l.name == self._image_name]
-                if _id:
-                    self._image = self._nova.glance.find_image(_id[0])
-                else:
-                    LOGGER.warning("Image %s was not found", self._image_name)
-                    self._image = ''
-
-        return self._image
+        info = self.cache.get_or_set("image", self._image_name,
+                                     self._find_image_info)
+        return Image(self._nova.glance, info, loaded=True) if info else ''
+
+    def _find_glance_image(self, name_or_id):
+        with self._nova_lock:
+            return self._nova.glance.find_image(name_or_id)
+
+    def _find_image(self):
+        try:
+            image = self._find_glance_image(self._image_name)
+            LOGGER.info("Found image %s", self._image_name)
+            return image
+        except (NoUniqueMatch, NovaNotFound):
+            image = discovery.find_image(self.conn, self._image_name)
+            if image:
+                return self._find_glance_image(image.id)
+            LOGGER.warning("Image %s was not found", self._image_name)
+            return ''
+
+    def _find_image_info(self):
+        image = self._find_image()
+        return image.to_dict() if image else ''
 
     def _get(self, hostname, zone, role):
-        """Retrieves an Instance from OpenStack."""
+        """Retrieves an Instance from OpenStack.
+
+        The volume of an existing instance is never created again, thus the
+        image is not looked up.
+        """
 
-        volume_config = {'image': self._image, 'class': self.storage_class}
+        volume_config = {'class': self.storage_class}
         inst = None
         try:
-            _server = self._nova.servers.find(name=hostname)
+            with self._nova_lock:
+                _server = self._nova.servers.find(name=hostname)
             LOGGER.debug("Found instance %s", hostname)
             inst = Instance(self._cinder,
                             self._nova,
@@ -1458,7 +2491,8 @@ class OSClusterInfo:  # pylint: disable=too-many-instance-attributes
                             zone,
                             role,
                             volume_config,
-                            _server.flavor)
+                            _server.flavor,
+                            poller=self.poller)
             try:
                 inst.ports.append(_server.interface_list()[0])
             except IndexError:
@@ -1475,15 +2509,16 @@ class OSClusterInfo:  # pylint: disable=too-many-instance-attributes
         """Find if a instance exists Openstack.
 
         If instance is found return Instance instance with the info.
-        If not found create a NIC and assign it to an Instance instance.
+        If not found create an Instance instance without NIC, see
+        :meth:`attach_ports`.
         """
-        volume_config = {'image': self.image, 'class': self.storage_class}
-
         inst = self._get(hostname, zone, role)
         if inst:
             LOGGER.debug("Found instance %s", hostname)
             return inst
 
+        volume_config = {'image': self.image, 'class': self.storage_class}
+
         LOGGER.debug("Creatig new instance %s", hostname)
         self.setup_networking()
         inst = Instance(self._cinder,
@@ -1493,13 +2528,20 @@ class OSClusterInfo:  # pylint: disable=too-many-instance-attributes
                         zone,
                         role,
                         volume_config,
-                        flavor)
-        inst.attach_port(self._neutron,
-                         self.net['id'],
-                         self.secgroups)
+                        flavor,
+                        poller=self.poller)
 
         return inst
 
+    def attach_ports(self, instances):
+        """create the network ports of all new instances in bulk"""
+        instances = list(instances)
+        if any(not inst.exists and not inst.ports for inst in instances):
+            self.setup_networking()
+            attach_ports(self._neutron, instances, self.net['id'],
+                         self.secgroups, tags=[cluster_tag(self.name)])
+        return instances
+
     @property
     def netclient(self):
         """return the current network client"""
@@ -1530,18 +2572,24 @@ class OSClusterInfo:  # pylint: disable=too-many-instance-attributes
         distribute control plane nodes in the different availability zones
         """
         mz = list(distribute_host_zones(self.management_names, self.azones))
-        for hosts, zone in mz:
-            for host in hosts:
-                yield self._get_or_create(host, zone, 'master', self.master_flavor.id)
+        masters = [self._get_or_create(host, zone, 'master', self.master_flavor.id)
+                   for hosts, zone in mz for host in hosts]
+        yield from self.attach_ports(masters)
 
-    def distribute_nodes(self):
+    def distribute_nodes(self, with_ports=True):
         """
         distribute worker nodes in the different availability zones
+
+        Args:
+            with_ports (bool): create network ports for new nodes. Nodes
+                which are booted as batch get their ports from nova.
         """
         hz = list(distribute_host_zones(self.nodes_names, self.azones))
-        for hosts, zone in hz:
-            for host in hosts:
-                yield self._get_or_create(host, zone, 'node', self.node_flavor.id)
+        nodes = [self._get_or_create(host, zone, 'node', self.node_flavor.id)
+                 for hosts, zone in hz for host in hosts]
+        if with_ports:
+            nodes = self.attach_ports(nodes)
+        yield from nodes
 
     def get_instances(self, role="node"):
         """Retrieve all nodes as Instances"""
@@ -0,0 +1,1231 @@
+"""
+simulator.py
+============
+
+An in-process stand-in for the OpenStack APIs koris uses: Keystone, Nova,
+Cinder, Neutron, Octavia and Glance.
+
+The simulator is a transport adapter of ``requests``. It is mounted on the
+keystoneauth session of :func:`koris.cloud.openstack.get_session`, thus
+novaclient, cinderclient, neutronclient and the openstacksdk connection
+send their real HTTP requests to it, and they get JSON responses like the
+real APIs would send them, after a configurable latency.
+
+The resources change their state like in a real cloud: servers go from
+BUILD to ACTIVE, volumes from creating to available, LoadBalancers from
+PENDING_CREATE or PENDING_UPDATE to ACTIVE. Changing a LoadBalancer while it
+is pending fails with 409 Conflict. Random failures of single endpoints can
+be injected.
+
+Example::
+
+    sim = Simulator(latency=LatencyModel(median=0.05), time_scale=0.01,
+                    failures={"POST /compute/v2.1/servers": 0.1})
+    with sim.installed():
+        nova, neutron, cinder = get_clients()
+        ...
+    sim.requests    # the number of requests the simulator answered
+"""
+import ast
+import copy
+import ipaddress
+import itertools
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import uuid
+
+from contextlib import contextmanager
+from io import BytesIO
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from keystoneauth1 import identity, session
+from requests.adapters import BaseAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+from koris.cloud import openstack
+from koris.util.apistats import url_template
+from koris.util.logger import Logger
+
+LOGGER = Logger(__name__)
+
+SIMULATOR_URL = "http://openstack.sim"
+
+PROJECT_ID = "5f3c6d1f2e4a4b0f9c8d7e6a5b4c3d2e"
+
+# the simulated seconds until a resource reaches its final state
+DELAYS = {
+    "server": 45,
+    "volume": 10,
+    "loadbalancer": 60,
+    "loadbalancer_update": 5,
+}
+
+FLAVORS = ("ECS.C1.4-8", "ECS.GP1.2-8", "ECS.UC1.4-4")
+
+IMAGES = ("koris-2019-02-15", "koris-base")
+
+ZONES = ("de-nbg6-1a", "de-nbg6-1b")
+
+EXTERNAL_NETWORK = "ext02"
+
+# the endpoints of the catalog by service type
+ENDPOINTS = {
+    "identity": "/identity/v3",
+    "compute": "/compute/v2.1",
+    "volumev3": "/volume/v3/" + PROJECT_ID,
+    "block-storage": "/volume/v3/" + PROJECT_ID,
+    "network": "/network",
+    "load-balancer": "/load-balancer",
+    "image": "/image",
+}
+
+# the versions documents returned by the roots of the services
+VERSIONS = {
+    "compute": [("v2.1", "/compute/v2.1/", "2.1", "2.79")],
+    "volume": [("v3.0", "/volume/v3/", "3.0", "3.59")],
+    "network": [("v2.0", "/network/v2.0/", "", "")],
+    "load-balancer": [("v2.0", "/load-balancer/v2/", "", "")],
+    "image": [("v2.0", "/image/v2/", "", "")],
+}
+
+# query parameters which are not filters
+NOT_FILTERS = {"limit", "marker", "fields", "sort_key", "sort_dir", "sort",
+               "all_tenants", "detail", "is_public", "page_reverse"}
+
+
+class SimulatorError(Exception):
+    """raised by a handler to answer with an error"""
+
+    def __init__(self, status, message=""):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class LatencyModel:
+    """A log-normal distribution of the latency of API requests
+
+    Args:
+        median (float): The median latency in seconds
+        sigma (float): The spread of the distribution, 0 for a constant
+            latency
+        per_service (dict): The median latency of single services, e.g.
+            ``{"compute": 0.2}``
+    """
+
+    def __init__(self, median=0.03, sigma=0.4, per_service=None):
+        self.median = median
+        self.sigma = sigma
+        self.per_service = per_service or {}
+
+    def sample(self, rnd, service):
+        """return the latency of a request to service in seconds"""
+        median = self.per_service.get(service, self.median)
+        return median * math.exp(rnd.gauss(0, self.sigma))
+
+
+class SimRequest:  # pylint: disable=too-few-public-methods
+    """A request as seen by the handlers of the :class:`Simulator`"""
+
+    def __init__(self, method, service, path, query, body, headers):
+        self.method = method
+        self.service = service
+        self.path = path
+        self.query = query
+        self.body = body
+        self.headers = headers
+
+    def arg(self, name, default=None):
+        """return the last value of a query parameter"""
+        values = self.query.get(name)
+        return values[-1] if values else default
+
+
+def _now():
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+def _new_id():
+    return str(uuid.uuid4())
+
+
+class Simulator:  # pylint: disable=too-many-instance-attributes,too-many-public-methods
+    """Simulates an OpenStack project in memory
+
+    Args:
+        latency (LatencyModel): The latency of each request, defaults to no
+            latency
+        delays (dict): The simulated seconds until servers, volumes and
+            LoadBalancers reach their final state, see ``DELAYS``
+        time_scale (float): Real seconds per simulated second, e.g. 0.01 to
+            run 100 times faster than a real cloud
+        failures (dict): The probability that a request fails, by
+            ``"<METHOD> <URL template>"``, see
+            :func:`koris.util.apistats.url_template`. The value is the
+            probability, or a tuple of the probability and the HTTP status,
+            which defaults to 500.
+        seed (int): Seed of the random numbers, to repeat a simulation
+    """
+
+    def __init__(self, latency=None, delays=None, time_scale=1.0,
+                 failures=None, seed=None):
+        self.latency = latency
+        self.delays = dict(DELAYS, **(delays or {}))
+        self.time_scale = time_scale
+        self.failures = failures or {}
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.log = []
+        self._lock = threading.RLock()
+        self._ips = itertools.count(10)
+        self._routes = []
+        self.state = {kind: {} for kind in (
+            "servers", "volumes", "flavors", "images", "keypairs",
+            "networks", "subnets", "routers", "ports", "security_groups",
+            "security_group_rules", "floatingips", "loadbalancers",
+            "listeners", "pools", "members", "healthmonitors")}
+        self._seed_project()
+        self._add_routes()
+
+    # setup
+
+    def _seed_project(self):
+        for idx, name in enumerate(FLAVORS):
+            vcpus, ram = (int(x) for x in name.rsplit(".", 1)[-1].split("-"))
+            self.state["flavors"][str(idx + 1)] = {
+                "id": str(idx + 1), "name": name, "vcpus": vcpus,
+                "ram": ram * 1024, "disk": 0, "swap": "",
+                "OS-FLV-EXT-DATA:ephemeral": 0, "rxtx_factor": 1.0,
+                "os-flavor-access:is_public": True, "links": []}
+        for name in IMAGES:
+            image_id = _new_id()
+            self.state["images"][image_id] = {
+                "id": image_id, "name": name, "status": "active",
+                "visibility": "public", "min_disk": 0, "min_ram": 0,
+                "size": 2 ** 30, "disk_format": "qcow2",
+                "container_format": "bare", "tags": [],
+                "created_at": _now(), "updated_at": _now()}
+        self.add("networks", name=EXTERNAL_NETWORK,
+                 **{"router:external": True})
+        net = self.find("networks", name=EXTERNAL_NETWORK)
+        self.add("subnets", name=EXTERNAL_NETWORK + "-subnet",
+                 network_id=net["id"], cidr="213.95.155.0/24",
+                 ip_version=4)
+
+    def add(self, kind, **fields):
+        """add a resource with default fields and return it"""
+        defaults = getattr(self, "_new_" + kind.rstrip("s"), None)
+        res = defaults(fields) if defaults else {}
+        res.update(fields)
+        res.setdefault("id", _new_id())
+        with self._lock:
+            self.state[kind][res["id"]] = res
+        return res
+
+    def find(self, kind, **filters):
+        """return the first resource of kind with the field values"""
+        return next((res for res in self.state[kind].values()
+                     if all(res.get(k) == v for k, v in filters.items())),
+                    None)
+
+    def _new_network(self, fields):
+        return {"name": "", "status": "ACTIVE", "admin_state_up": True,
+                "subnets": [], "tags": [], "shared": False,
+                "router:external": False, "project_id": PROJECT_ID,
+                "tenant_id": PROJECT_ID, "mtu": 1500,
+                "availability_zones": list(ZONES), "description": "",
+                "port_security_enabled": True}
+
+    def _new_subnet(self, fields):
+        net = ipaddress.ip_network(fields.get("cidr", "10.0.0.0/24"),
+                                   strict=False)
+        return {"name": "", "ip_version": 4, "enable_dhcp": True,
+                "gateway_ip": str(net.network_address + 1), "tags": [],
+                "allocation_pools": [{"start": str(net.network_address + 2),
+                                      "end": str(net.broadcast_address - 1)}],
+                "dns_nameservers": [], "host_routes": [],
+                "project_id": PROJECT_ID, "tenant_id": PROJECT_ID,
+                "description": ""}
+
+    def _new_router(self, fields):
+        return {"name": "", "status": "ACTIVE", "admin_state_up": True,
+                "external_gateway_info": None, "tags": [], "routes": [],
+                "project_id": PROJECT_ID, "tenant_id": PROJECT_ID,
+                "availability_zones": list(ZONES), "description": ""}
+
+    def _new_port(self, fields):
+        subnet = next((sub for sub in self.state["subnets"].values()
+                       if sub["network_id"] == fields.get("network_id")),
+                      None)
+        fixed_ips = []
+        if subnet:
+            net = ipaddress.ip_network(subnet["cidr"], strict=False)
+            address = net.network_address + 2 + next(self._ips) % (
+                net.num_addresses - 3)
+            fixed_ips = [{"subnet_id": subnet["id"],
+                          "ip_address": str(address)}]
+        return {"name": "", "status": "ACTIVE", "admin_state_up": True,
+                "device_id": "", "device_owner": "", "fixed_ips": fixed_ips,
+                "mac_address": "fa:16:3e:%02x:%02x:%02x" % tuple(
+                    self.random.randrange(256) for _ in range(3)),
+                "security_groups": [], "tags": [], "binding:vnic_type":
+                "normal", "project_id": PROJECT_ID, "tenant_id": PROJECT_ID,
+                "allowed_address_pairs": [], "description": ""}
+
+    def _new_security_group(self, fields):
+        return {"name": "", "description": "", "security_group_rules": [],
+                "tags": [], "project_id": PROJECT_ID,
+                "tenant_id": PROJECT_ID}
+
+    def _new_security_group_rule(self, fields):
+        return {"direction": "ingress", "ethertype": "IPv4",
+                "protocol": None, "port_range_min": None,
+                "port_range_max": None, "remote_ip_prefix": None,
+                "remote_group_id": None, "project_id": PROJECT_ID,
+                "tenant_id": PROJECT_ID, "description": ""}
+
+    def _new_floatingip(self, fields):
+        address = "213.95.155.%d" % (next(self._ips) % 250 + 2)
+        return {"floating_ip_address": address, "fixed_ip_address": None,
+                "port_id": None, "router_id": None, "status": "DOWN",
+                "project_id": PROJECT_ID, "tenant_id": PROJECT_ID,
+                "tags": [], "description": ""}
+
+    # transport
+
+    def send(self, request):
+        """answer a :class:`requests.PreparedRequest`
+
+        Returns:
+            A :class:`requests.Response`
+        """
+        url = urlparse(request.url)
+        parts = url.path.lstrip("/").split("/", 1)
+        service, path = parts[0], "/" + (parts[1] if len(parts) > 1 else "")
+        body = request.body
+        if isinstance(body, bytes):
+            body = body.decode()
+        try:
+            body = json.loads(body) if body else None
+        except ValueError:
+            body = None
+        req = SimRequest(request.method, service, path,
+                         parse_qs(url.query, keep_blank_values=True), body,
+                         request.headers)
+
+        if self.latency:
+            time.sleep(self.latency.sample(self.random, service))
+
+        status, payload, headers = self.handle(req)
+        with self._lock:
+            self.requests += 1
+            self.log.append((req.method, url.path, status))
+
+        resp = Response()
+        resp.status_code = status
+        resp.headers = CaseInsensitiveDict(headers)
+        resp.headers.setdefault("Content-Type", "application/json")
+        resp.headers.setdefault("x-openstack-request-id",
+                                "req-" + _new_id())
+        content = json.dumps(payload).encode() if payload is not None else b""
+        resp.raw = BytesIO(content)
+        resp._content = content  # pylint: disable=protected-access
+        resp.encoding = "utf-8"
+        resp.url = request.url
+        resp.request = request
+        resp.reason = "SIMULATED"
+        return resp
+
+    def handle(self, req):
+        """dispatch a request to its handler
+
+        Returns:
+            A tuple of the status, the JSON payload and the headers
+        """
+        fault = self.failures.get("%s %s" % (
+            req.method, url_template("/" + req.service + req.path)))
+        if fault:
+            rate, status = fault if isinstance(fault, tuple) else (fault, 500)
+            if self.random.random() < rate:
+                return status, {"message": "injected failure"}, {}
+
+        for method, service, regex, handler in self._routes:
+            if method != req.method or service != req.service:
+                continue
+            match = regex.match(req.path)
+            if not match:
+                continue
+            try:
+                with self._lock:
+                    result = handler(req, *match.groups())
+            except SimulatorError as err:
+                error = {"type": "SimulatorError", "message": err.message}
+                return err.status, {"NeutronError": error,
+                                    "message": err.message,
+                                    "faultstring": err.message}, {}
+            if len(result) == 2:
+                return result + ({},)
+            return result
+
+        LOGGER.debug("Simulator: no route for %s %s%s", req.method,
+                     req.service, req.path)
+        return 404, {"message": "not simulated"}, {}
+
+    def route(self, method, service, pattern):
+        """register a handler for requests to service matching pattern"""
+        def decorator(func):
+            self._routes.append((method, service,
+                                 re.compile("^%s/?$" % pattern), func))
+            return func
+        return decorator
+
+    @contextmanager
+    def installed(self):
+        """let all OpenStack clients of koris use the simulator
+
+        The OpenStack environment variables are set, the shared session of
+        :mod:`koris.cloud.openstack` is replaced by one which sends its
+        requests to the simulator, and the cached clients are dropped.
+        Everything is restored afterwards.
+        """
+        env = {"OS_AUTH_URL": SIMULATOR_URL + ENDPOINTS["identity"],
+               "OS_USERNAME": "koris", "OS_PASSWORD": "koris",
+               "OS_PROJECT_ID": PROJECT_ID, "OS_PROJECT_NAME": "koris",
+               "OS_USER_DOMAIN_NAME": "Default",
+               "OS_REGION_NAME": "RegionOne", "OS_INTERFACE": "public",
+               "OS_IDENTITY_API_VERSION": "3"}
+
+        http = requests.Session()
+        http.mount(SIMULATOR_URL, SimulatorAdapter(self))
+        auth = identity.Password(
+            auth_url=env["OS_AUTH_URL"], username="koris", password="koris",
+            project_id=PROJECT_ID, user_domain_name="Default")
+        sess = openstack.API_STATS.install(
+            session.Session(auth=auth, session=http))
+
+        saved_env = {key: os.environ.get(key) for key in env}
+        clients = {"SESSION": sess, "NOVA": None, "NEUTRON": None,
+                   "CINDER": None}
+        saved_clients = {name: getattr(openstack, name) for name in clients}
+
+        os.environ.update(env)
+        for name, value in clients.items():
+            setattr(openstack, name, value)
+        openstack.get_nova_microversion.cache_clear()
+        openstack.get_cinder_microversion.cache_clear()
+        openstack.neutron_extensions.cache_clear()
+        try:
+            yield self
+        finally:
+            for key, value in saved_env.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+            for name, value in saved_clients.items():
+                setattr(openstack, name, value)
+            openstack.get_nova_microversion.cache_clear()
+            openstack.get_cinder_microversion.cache_clear()
+            openstack.neutron_extensions.cache_clear()
+
+    # state transitions
+
+    def _deadline(self, delay):
+        return time.monotonic() + self.delays[delay] * self.time_scale
+
+    def _refresh(self, kind, res):
+        """move a resource to its final state, once its deadline passed"""
+        ready_at = res.get("_ready_at")
+        if ready_at is None or time.monotonic() < ready_at:
+            return res
+        del res["_ready_at"]
+        if kind == "servers":
+            res["status"] = "ACTIVE"
+            res["OS-EXT-STS:vm_state"] = "active"
+            res["OS-EXT-STS:task_state"] = None
+        elif kind == "volumes":
+            res["status"] = "in-use" if res["attachments"] else "available"
+        elif kind == "loadbalancers":
+            res["provisioning_status"] = "ACTIVE"
+            res["operating_status"] = "ONLINE"
+        return res
+
+    def _view(self, kind, res):
+        """return a resource without internal fields"""
+        self._refresh(kind, res)
+        return {k: v for k, v in res.items() if not k.startswith("_")}
+
+    def _get(self, kind, res_id):
+        res = self.state[kind].get(res_id)
+        if res is None:
+            raise SimulatorError(404, "%s %s not found" % (kind, res_id))
+        return res
+
+    @staticmethod
+    def _matches(res, key, values):  # pylint: disable=too-many-return-statements
+        if key in ("tags", "tags-any"):
+            tags = set(res.get("tags", []))
+            wanted = {tag for value in values for tag in value.split(",")}
+            return wanted <= tags if key == "tags" else bool(wanted & tags)
+        if key in ("security_groups", "security_group_ids"):
+            return set(values) <= set(res.get("security_groups", []))
+        if key == "fixed_ips":
+            return any(value.split("=", 1)[-1] in json.dumps(
+                res.get("fixed_ips")) for value in values)
+        if key not in res:
+            return True
+        value = res[key]
+        if isinstance(value, bool):
+            return str(value).lower() in [v.lower() for v in values]
+        return str(value) in values
+
+    def _list(self, kind, req, key_filters=None):
+        """list the resources of kind filtered by the query parameters"""
+        items = [self._refresh(kind, res) for res in self.state[kind].values()]
+        for key, values in req.query.items():
+            if key in NOT_FILTERS:
+                continue
+            if key_filters and key in key_filters:
+                items = [res for res in items
+                         if key_filters[key](res, values)]
+                continue
+            items = [res for res in items if self._matches(res, key, values)]
+
+        marker = req.arg("marker")
+        if marker:
+            ids = [res["id"] for res in items]
+            items = items[ids.index(marker) + 1:] if marker in ids else []
+        limit = req.arg("limit")
+        if limit:
+            items = items[:int(limit)]
+        return [self._view(kind, res) for res in items]
+
+    # pylint: disable=unused-argument,unused-variable,too-many-locals
+    # pylint: disable=too-many-statements
+    def _add_routes(self):
+        route = self.route
+        sim = self
+
+        def versions(service):
+            def handler(req):
+                return 200, {"versions": [{
+                    "id": vid, "status": "CURRENT",
+                    "version": maximum, "min_version": minimum,
+                    "updated": "2019-01-01T00:00:00Z",
+                    "links": [{"rel": "self", "href": SIMULATOR_URL + href}],
+                } for vid, href, minimum, maximum in VERSIONS[service]]}
+            return handler
+
+        def version(service):
+            def handler(req, *_):
+                vid, href, minimum, maximum = VERSIONS[service][0]
+                return 200, {"version": {
+                    "id": vid, "status": "CURRENT", "version": maximum,
+                    "min_version": minimum, "updated": "2019-01-01T00:00:00Z",
+                    "links": [{"rel": "self", "href": SIMULATOR_URL + href}]}}
+            return handler
+
+        for service in VERSIONS:
+            route("GET", service, "")(versions(service))
+        route("GET", "compute", "/v2.1")(version("compute"))
+        route("GET", "volume", "/v3(/[0-9a-f]+)?")(version("volume"))
+        route("GET", "network", "/v2.0")(version("network"))
+        route("GET", "load-balancer", "/v2(.0)?")(version("load-balancer"))
+        route("GET", "image", "/v2")(version("image"))
+
+        # keystone
+
+        @route("GET", "identity", "/v3")
+        def identity_version(req):
+            return 200, {"version": {
+                "id": "v3.10", "status": "stable",
+                "updated": "2018-02-28T00:00:00Z",
+                "media-types": [{"base": "application/json",
+                                 "type": "application/vnd.openstack."
+                                         "identity-v3+json"}],
+                "links": [{"rel": "self",
+                           "href": SIMULATOR_URL + "/identity/v3/"}]}}
+
+        @route("GET", "identity", "")
+        def identity_versions(req):
+            return 300, {"versions": {"values": [
+                identity_version(req)[1]["version"]]}}
+
+        @route("POST", "identity", "/v3/auth/tokens")
+        def token(req):
+            catalog = [{
+                "type": service_type, "name": service_type,
+                "id": uuid.uuid4().hex,
+                "endpoints": [{"id": uuid.uuid4().hex, "interface": iface,
+                               "region": "RegionOne",
+                               "region_id": "RegionOne",
+                               "url": SIMULATOR_URL + path}
+                              for iface in ("public", "internal")]}
+                       for service_type, path in ENDPOINTS.items()]
+            expires = time.strftime("%Y-%m-%dT%H:%M:%S.000000Z",
+                                    time.gmtime(time.time() + 3600))
+            body = {"token": {
+                "methods": ["password"], "expires_at": expires,
+                "issued_at": _now(), "audit_ids": [uuid.uuid4().hex],
+                "user": {"id": uuid.uuid4().hex, "name": "koris",
+                         "domain": {"id": "default", "name": "Default"}},
+                "project": {"id": PROJECT_ID, "name": "koris",
+                            "domain": {"id": "default", "name": "Default"}},
+                "roles": [{"id": uuid.uuid4().hex, "name": "member"}],
+                "catalog": catalog}}
+            return 201, body, {"X-Subject-Token": uuid.uuid4().hex}
+
+        # nova
+
+        def server_view(res):
+            srv = sim._view("servers", res)
+            srv["addresses"] = {}
+            for port in sim.state["ports"].values():
+                if port["device_id"] == res["id"]:
+                    net = sim.state["networks"].get(port["network_id"], {})
+                    srv["addresses"].setdefault(net.get("name", ""), []).extend(
+                        {"addr": ip["ip_address"], "version": 4,
+                         "OS-EXT-IPS:type": "fixed",
+                         "OS-EXT-IPS-MAC:mac_addr": port["mac_address"]}
+                        for ip in port["fixed_ips"])
+            return srv
+
+        def name_filter(res, values):
+            return all(re.search(value, res["name"]) for value in values)
+
+        def tags_filter(res, values):
+            return self._matches(res, "tags", values)
+
+        @route("GET", "compute", r"/v2.1/servers(/detail)?")
+        def list_servers(req, detail):
+            items = sim._list("servers", req, {"name": name_filter,
+                                               "tags": tags_filter})
+            items = [server_view(sim.state["servers"][srv["id"]])
+                     for srv in items]
+            if not detail:
+                items = [{"id": srv["id"], "name": srv["name"],
+                          "links": []} for srv in items]
+            return 200, {"servers": items}
+
+        @route("POST", "compute", r"/v2.1/servers")
+        def create_server(req):
+            spec = req.body["server"]
+            count = int(spec.get("max_count", spec.get("min_count", 1)))
+            reservation_id = "r-" + uuid.uuid4().hex[:8]
+            created = []
+            for idx in range(count):
+                name = spec["name"]
+                if count > 1:
+                    name = "%s-%d" % (spec["name"], idx + 1)
+                created.append(sim._boot(spec, name, reservation_id))
+            if spec.get("return_reservation_id"):
+                return 202, {"reservation_id": reservation_id}
+            return 202, {"server": {"id": created[0]["id"], "links": [],
+                                    "adminPass": "secret",
+                                    "security_groups": []}}
+
+        @route("GET", "compute", r"/v2.1/servers/([^/]+)")
+        def get_server(req, server_id):
+            return 200, {"server": server_view(sim._get("servers", server_id))}
+
+        @route("PUT", "compute", r"/v2.1/servers/([^/]+)")
+        def update_server(req, server_id):
+            res = sim._get("servers", server_id)
+            res.update(req.body["server"])
+            return 200, {"server": server_view(res)}
+
+        @route("DELETE", "compute", r"/v2.1/servers/([^/]+)")
+        def delete_server(req, server_id):
+            res = sim._get("servers", server_id)
+            for port in list(sim.state["ports"].values()):
+                if port["device_id"] == server_id:
+                    if port.get("_nova_created"):
+                        del sim.state["ports"][port["id"]]
+                    else:
+                        port["device_id"] = ""
+                        port["device_owner"] = ""
+            for vol_id in res["_volumes"]:
+                vol = sim.state["volumes"].get(vol_id)
+                if vol:
+                    if vol.get("_delete_on_termination"):
+                        del sim.state["volumes"][vol_id]
+                    else:
+                        vol["attachments"] = []
+                        vol["status"] = "available"
+            del sim.state["servers"][server_id]
+            return 204, None
+
+        @route("GET", "compute", r"/v2.1/servers/([^/]+)/os-interface")
+        def interfaces(req, server_id):
+            sim._get("servers", server_id)
+            return 200, {"interfaceAttachments": [{
+                "port_id": port["id"], "net_id": port["network_id"],
+                "mac_addr": port["mac_address"], "port_state": "ACTIVE",
+                "fixed_ips": port["fixed_ips"]}
+                for port in sim.state["ports"].values()
+                if port["device_id"] == server_id]}
+
+        @route("GET", "compute", r"/v2.1/servers/([^/]+)/ips")
+        def server_ips(req, server_id):
+            return 200, {"addresses": server_view(
+                sim._get("servers", server_id))["addresses"]}
+
+        @route("GET", "compute", r"/v2.1/flavors(/detail)?")
+        def list_flavors(req, detail):
+            return 200, {"flavors": sim._list("flavors", req)}
+
+        @route("GET", "compute", r"/v2.1/flavors/([^/]+)")
+        def get_flavor(req, flavor_id):
+            return 200, {"flavor": sim._view("flavors",
+                                             sim._get("flavors", flavor_id))}
+
+        @route("GET", "compute", r"/v2.1/flavors/([^/]+)/os-extra_specs")
+        def flavor_specs(req, flavor_id):
+            return 200, {"extra_specs": {}}
+
+        @route("GET", "compute", r"/v2.1/os-availability-zone(/detail)?")
+        def zones(req, detail):
+            return 200, {"availabilityZoneInfo": [
+                {"zoneName": zone, "zoneState": {"available": True},
+                 "hosts": None} for zone in ZONES]}
+
+        def keypair_view(res):
+            return {"keypair": dict(res, fingerprint="aa:bb", type="ssh",
+                                    user_id="koris")}
+
+        @route("GET", "compute", r"/v2.1/os-keypairs")
+        def list_keypairs(req):
+            return 200, {"keypairs": [keypair_view(res) for res in
+                                      sim.state["keypairs"].values()]}
+
+        @route("GET", "compute", r"/v2.1/os-keypairs/([^/]+)")
+        def get_keypair(req, name):
+            return 200, keypair_view(sim._get("keypairs", name))
+
+        @route("POST", "compute", r"/v2.1/os-keypairs")
+        def create_keypair(req):
+            spec = req.body["keypair"]
+            if spec["name"] in sim.state["keypairs"]:
+                raise SimulatorError(409, "Key pair %s already exists" %
+                                     spec["name"])
+            res = {"id": spec["name"], "name": spec["name"],
+                   "public_key": spec.get("public_key", "ssh-rsa AAAA")}
+            sim.state["keypairs"][spec["name"]] = res
+            return 200, keypair_view(res)
+
+        @route("DELETE", "compute", r"/v2.1/os-keypairs/([^/]+)")
+        def delete_keypair(req, name):
+            sim._get("keypairs", name)
+            del sim.state["keypairs"][name]
+            return 202, None
+
+        # glance
+
+        @route("GET", "image", r"/v2/images")
+        def list_images(req):
+            return 200, {"images": sim._list("images", req)}
+
+        @route("GET", "image", r"/v2/images/([^/]+)")
+        def get_image(req, image_id):
+            return 200, sim._view("images", sim._get("images", image_id))
+
+        # cinder
+
+        def metadata_filter(res, values):
+            for value in values:
+                try:
+                    wanted = json.loads(value)
+                except ValueError:
+                    wanted = ast.literal_eval(value)
+                if any(res["metadata"].get(k) != v for k, v in wanted.items()):
+                    return False
+            return True
+
+        volume_path = r"/v3/[0-9a-f]+/volumes"
+
+        def inexact_name_filter(res, values):
+            return all(value in (res["name"] or "") for value in values)
+
+        @route("GET", "volume", volume_path + r"(/detail)?")
+        def list_volumes(req, detail):
+            return 200, {"volumes": sim._list(
+                "volumes", req, {"metadata": metadata_filter,
+                                 "name~": inexact_name_filter})}
+
+        @route("POST", "volume", volume_path)
+        def create_volume(req):
+            spec = req.body["volume"]
+            res = sim._new_volume_resource(
+                spec.get("name"), spec["size"], spec.get("availability_zone"),
+                spec.get("volume_type"), spec.get("metadata") or {},
+                spec.get("imageRef"))
+            return 202, {"volume": sim._view("volumes", res)}
+
+        @route("GET", "volume", volume_path + r"/([^/]+)")
+        def get_volume(req, vol_id):
+            return 200, {"volume": sim._view("volumes",
+                                             sim._get("volumes", vol_id))}
+
+        @route("POST", "volume", volume_path + r"/([^/]+)/action")
+        def volume_action(req, vol_id):
+            res = sim._get("volumes", vol_id)
+            if "os-set_bootable" in req.body:
+                res["bootable"] = str(
+                    req.body["os-set_bootable"]["bootable"]).lower()
+            return 200, None
+
+        @route("DELETE", "volume", volume_path + r"/([^/]+)")
+        def delete_volume(req, vol_id):
+            res = sim._get("volumes", vol_id)
+            if res["status"] == "in-use":
+                raise SimulatorError(400, "Volume %s is in use" % vol_id)
+            del sim.state["volumes"][vol_id]
+            return 202, None
+
+        # neutron
+
+        collections = {"networks": "network", "subnets": "subnet",
+                       "routers": "router", "ports": "port",
+                       "security-groups": "security_group",
+                       "security-group-rules": "security_group_rule",
+                       "floatingips": "floatingip"}
+
+        @route("GET", "network", r"/v2.0/extensions")
+        def extensions(req):
+            return 200, {"extensions": [
+                {"alias": alias, "name": alias, "description": "",
+                 "updated": "2019-01-01T00:00:00Z", "links": []}
+                for alias in ("standard-attr-tag", "router", "security-group",
+                              "tag-ports-during-bulk-creation",
+                              "external-net", "extraroute")]}
+
+        def neutron_routes(path, singular):
+            kind = singular + "s"
+
+            def list_resources(req):
+                return 200, {path.replace("-", "_"): sim._list(kind, req)}
+
+            def create_resources(req):
+                if path.replace("-", "_") in req.body:
+                    specs = req.body[path.replace("-", "_")]
+                    created = [sim._create_network_resource(kind, spec)
+                               for spec in specs]
+                    return 201, {path.replace("-", "_"): created}
+                return 201, {singular: sim._create_network_resource(
+                    kind, req.body[singular])}
+
+            def get_resource(req, res_id):
+                return 200, {singular: sim._view(kind, sim._get(kind, res_id))}
+
+            def update_resource(req, res_id):
+                res = sim._get(kind, res_id)
+                res.update(req.body[singular])
+                return 200, {singular: sim._view(kind, res)}
+
+            def delete_resource(req, res_id):
+                sim._delete_network_resource(kind, res_id)
+                return 204, None
+
+            def replace_tags(req, res_id):
+                res = sim._get(kind, res_id)
+                res["tags"] = list(req.body["tags"])
+                return 200, {"tags": res["tags"]}
+
+            def add_tag(req, res_id, tag):
+                res = sim._get(kind, res_id)
+                if tag not in res["tags"]:
+                    res["tags"].append(tag)
+                return 201, None
+
+            prefix = r"/v2.0/" + path
+            route("GET", "network", prefix)(list_resources)
+            route("POST", "network", prefix)(create_resources)
+            route("GET", "network", prefix + r"/([^/]+)")(get_resource)
+            route("PUT", "network", prefix + r"/([^/]+)")(update_resource)
+            route("DELETE", "network", prefix + r"/([^/]+)")(delete_resource)
+            route("PUT", "network", prefix + r"/([^/]+)/tags")(replace_tags)
+            route("PUT", "network", prefix + r"/([^/]+)/tags/([^/]+)")(add_tag)
+
+        for path, singular in collections.items():
+            neutron_routes(path, singular)
+
+        @route("PUT", "network", r"/v2.0/routers/([^/]+)/add_router_interface")
+        def add_router_interface(req, router_id):
+            router = sim._get("routers", router_id)
+            if req.body.get("subnet_id"):
+                subnet = sim._get("subnets", req.body["subnet_id"])
+                port = sim.add("ports", network_id=subnet["network_id"],
+                               device_id=router_id,
+                               device_owner="network:router_interface")
+                port["fixed_ips"] = [{"subnet_id": subnet["id"],
+                                      "ip_address": subnet["gateway_ip"]}]
+            else:
+                port = sim._get("ports", req.body["port_id"])
+                port["device_id"] = router_id
+                port["device_owner"] = "network:router_interface"
+            return 200, {"id": router["id"], "port_id": port["id"],
+                         "subnet_id": port["fixed_ips"][0]["subnet_id"],
+                         "subnet_ids": [port["fixed_ips"][0]["subnet_id"]],
+                         "tenant_id": PROJECT_ID, "project_id": PROJECT_ID}
+
+        @route("PUT", "network",
+               r"/v2.0/routers/([^/]+)/remove_router_interface")
+        def remove_router_interface(req, router_id):
+            for port in list(sim.state["ports"].values()):
+                if port["device_id"] != router_id:
+                    continue
+                subnet_id = port["fixed_ips"][0]["subnet_id"]
+                if req.body.get("port_id") in (port["id"], None) and \
+                        req.body.get("subnet_id") in (subnet_id, None):
+                    del sim.state["ports"][port["id"]]
+            return 200, {"id": router_id}
+
+        # octavia, also reachable with the paths of neutron-lbaas
+
+        for service, prefix in (("load-balancer", r"/v2(?:\.0)?/lbaas"),
+                                ("network", r"/v2\.0/lbaas")):
+            sim._add_lbaas_routes(service, prefix)
+
+    def _add_lbaas_routes(self, service, prefix):  # pylint: disable=too-many-locals
+        route = self.route
+        sim = self
+
+        @route("GET", service, prefix + r"/loadbalancers")
+        def list_lbs(req):
+            return 200, {"loadbalancers": sim._list("loadbalancers", req)}
+
+        @route("POST", service, prefix + r"/loadbalancers")
+        def create_lb(req):
+            return 201, {"loadbalancer": sim._view(
+                "loadbalancers",
+                sim._create_lb(dict(req.body["loadbalancer"])))}
+
+        @route("GET", service, prefix + r"/loadbalancers/([^/]+)")
+        def get_lb(req, lb_id):
+            return 200, {"loadbalancer": sim._view(
+                "loadbalancers", sim._get("loadbalancers", lb_id))}
+
+        @route("GET", service, prefix + r"/loadbalancers/([^/]+)/status")
+        def lb_status(req, lb_id):
+            lb = sim._view("loadbalancers", sim._get("loadbalancers", lb_id))
+            return 200, {"statuses": {"loadbalancer": lb}}
+
+        @route("DELETE", service, prefix + r"/loadbalancers/([^/]+)")
+        def delete_lb(req, lb_id):
+            lb = sim._get("loadbalancers", lb_id)
+            sim._check_mutable(lb)
+            for kind in ("listeners", "pools", "members", "healthmonitors"):
+                for res in list(sim.state[kind].values()):
+                    if res.get("_lb") == lb_id:
+                        del sim.state[kind][res["id"]]
+            port = sim.state["ports"].get(lb["vip_port_id"])
+            if port:
+                del sim.state["ports"][port["id"]]
+            del sim.state["loadbalancers"][lb_id]
+            return 204, None
+
+        def child_routes(path, kind, singular, parent=None):
+            list_path = prefix + "/" + path
+            if parent:
+                list_path = prefix + r"/pools/([^/]+)/members"
+
+            def list_children(req, *parent_id):
+                items = sim._list(kind, req)
+                if parent_id:
+                    items = [res for res in items
+                             if res["pool_id"] == parent_id[0]]
+                return 200, {path: items}
+
+            def create_child(req, *parent_id):
+                spec = dict(req.body[singular])
+                if parent_id:
+                    spec["pool_id"] = parent_id[0]
+                res = sim._create_lb_child(kind, spec)
+                return 201, {singular: sim._view(kind, res)}
+
+            def replace_children(req, pool_id):
+                pool = sim._get("pools", pool_id)
+                lb = sim._get("loadbalancers", pool["_lb"])
+                sim._check_mutable(lb)
+                wanted = {(m["address"], m["protocol_port"]): m
+                          for m in req.body["members"]}
+                for res in list(sim.state["members"].values()):
+                    if res["pool_id"] == pool_id and (
+                            res["address"], res["protocol_port"]) not in wanted:
+                        del sim.state["members"][res["id"]]
+                existing = {(res["address"], res["protocol_port"])
+                            for res in sim.state["members"].values()
+                            if res["pool_id"] == pool_id}
+                for key, spec in wanted.items():
+                    if key not in existing:
+                        sim._add_lb_child("members", dict(spec, pool_id=pool_id),
+                                          lb)
+                sim._pending_update(lb)
+                return 202, None
+
+            def get_child(req, *ids):
+                return 200, {singular: sim._view(kind, sim._get(kind, ids[-1]))}
+
+            def update_child(req, *ids):
+                res = sim._get(kind, ids[-1])
+                lb = sim._get("loadbalancers", res["_lb"])
+                sim._check_mutable(lb)
+                res.update(req.body[singular])
+                sim._pending_update(lb)
+                return 200, {singular: sim._view(kind, res)}
+
+            def delete_child(req, *ids):
+                res = sim._get(kind, ids[-1])
+                lb = sim._get("loadbalancers", res["_lb"])
+                sim._check_mutable(lb)
+                del sim.state[kind][res["id"]]
+                sim._pending_update(lb)
+                return 204, None
+
+            route("GET", service, list_path)(list_children)
+            route("POST", service, list_path)(create_child)
+            if parent:
+                route("PUT", service, list_path)(replace_children)
+            route("GET", service, list_path + r"/([^/]+)")(get_child)
+            route("PUT", service, list_path + r"/([^/]+)")(update_child)
+            route("DELETE", service, list_path + r"/([^/]+)")(delete_child)
+
+        child_routes("listeners", "listeners", "listener")
+        child_routes("pools", "pools", "pool")
+        child_routes("healthmonitors", "healthmonitors", "healthmonitor")
+        child_routes("members", "members", "member", parent="pools")
+
+    # resource creation
+
+    def _boot(self, spec, name, reservation_id):
+        server_id = _new_id()
+        zone = spec.get("availability_zone")
+        volumes = []
+        for bdm in spec.get("block_device_mapping_v2", []):
+            if bdm.get("source_type") == "volume":
+                vol = self._get("volumes", bdm["uuid"])
+            else:
+                vol = self._new_volume_resource(
+                    "", int(bdm.get("volume_size", 25)), zone,
+                    bdm.get("volume_type"), {}, bdm.get("uuid"))
+                vol["_delete_on_termination"] = bdm.get(
+                    "delete_on_termination", False)
+            vol["attachments"] = [{"server_id": server_id,
+                                   "device": "/dev/vda"}]
+            vol["status"] = "in-use"
+            volumes.append(vol["id"])
+
+        networks = spec.get("networks")
+        if not isinstance(networks, list):
+            networks = []
+        for nic in networks:
+            if nic.get("port"):
+                port = self._get("ports", nic["port"])
+            else:
+                port = self.add("ports", network_id=nic["uuid"],
+                                _nova_created=True)
+            port["device_id"] = server_id
+            port["device_owner"] = "compute:" + (zone or "nova")
+
+        res = {
+            "id": server_id, "name": name, "status": "BUILD",
+            "OS-EXT-STS:vm_state": "building",
+            "OS-EXT-STS:task_state": "spawning",
+            "OS-EXT-AZ:availability_zone": zone,
+            "flavor": {"id": spec.get("flavorRef")},
+            "image": "", "key_name": spec.get("key_name"),
+            "metadata": spec.get("metadata", {}),
+            "tags": list(spec.get("tags", [])),
+            "reservation_id": reservation_id,
+            "security_groups": [{"name": group["name"]} for group in
+                                spec.get("security_groups", [])],
+            "tenant_id": PROJECT_ID, "user_id": "koris",
+            "created": _now(), "updated": _now(), "hostId": "",
+            "links": [], "addresses": {},
+            "os-extended-volumes:volumes_attached": [
+                {"id": vol_id} for vol_id in volumes],
+            "_volumes": volumes,
+            "_ready_at": self._deadline("server"),
+        }
+        self.state["servers"][server_id] = res
+        return res
+
+    def _new_volume_resource(self, name, size, zone, volume_type, metadata,
+                             image_id):
+        # pylint: disable=too-many-arguments
+        vol_id = _new_id()
+        res = {"id": vol_id, "name": name, "size": int(size),
+               "status": "creating", "availability_zone": zone,
+               "volume_type": volume_type, "metadata": dict(metadata),
+               "bootable": "true" if image_id else "false",
+               "attachments": [], "created_at": _now(),
+               "os-vol-tenant-attr:tenant_id": PROJECT_ID,
+               "links": [], "multiattach": False, "encrypted": False,
+               "description": None, "snapshot_id": None,
+               "source_volid": None, "user_id": "koris",
+               "_ready_at": self._deadline("volume")}
+        self.state["volumes"][vol_id] = res
+        return res
+
+    def _create_network_resource(self, kind, spec):
+        spec = dict(spec)
+        if kind == "floatingips":
+            spec.pop("floating_network_id", None)
+        res = self.add(kind, **spec)
+        if kind == "subnets":
+            net = self._get("networks", res["network_id"])
+            net["subnets"].append(res["id"])
+        if kind == "security_group_rules":
+            group = self._get("security_groups", res["security_group_id"])
+            group["security_group_rules"].append(copy.deepcopy(res))
+        if kind == "security_groups":
+            for ethertype in ("IPv4", "IPv6"):
+                rule = self.add("security_group_rules", direction="egress",
+                                ethertype=ethertype,
+                                security_group_id=res["id"])
+                res["security_group_rules"].append(copy.deepcopy(rule))
+        if kind == "floatingips" and res.get("port_id"):
+            port = self._get("ports", res["port_id"])
+            res["fixed_ip_address"] = port["fixed_ips"][0]["ip_address"]
+            res["status"] = "ACTIVE"
+        return self._view(kind, res)
+
+    def _delete_network_resource(self, kind, res_id):
+        res = self._get(kind, res_id)
+        if kind == "security_groups":
+            if any(res_id in port["security_groups"]
+                   for port in self.state["ports"].values()):
+                raise SimulatorError(409, "Security group %s in use" % res_id)
+            for rule in list(self.state["security_group_rules"].values()):
+                if rule["security_group_id"] == res_id:
+                    del self.state["security_group_rules"][rule["id"]]
+        if kind == "security_group_rules":
+            group = self.state["security_groups"].get(res["security_group_id"])
+            if group:
+                group["security_group_rules"] = [
+                    rule for rule in group["security_group_rules"]
+                    if rule["id"] != res_id]
+        if kind == "networks" and any(
+                port["network_id"] == res_id and port["device_id"]
+                for port in self.state["ports"].values()):
+            raise SimulatorError(409, "Network %s in use" % res_id)
+        del self.state[kind][res_id]
+
+    def _check_mutable(self, lb):
+        self._refresh("loadbalancers", lb)
+        if lb["provisioning_status"] != "ACTIVE":
+            raise SimulatorError(409, "Invalid state %s of loadbalancer "
+                                 "resource %s" % (lb["provisioning_status"],
+                                                  lb["id"]))
+
+    def _pending_update(self, lb):
+        lb["provisioning_status"] = "PENDING_UPDATE"
+        lb["_ready_at"] = self._deadline("loadbalancer_update")
+
+    def _create_lb(self, spec):
+        listeners = spec.pop("listeners", [])
+        subnet = self._get("subnets", spec["vip_subnet_id"])
+        port = self.add("ports", network_id=subnet["network_id"],
+                        device_owner="Octavia", name="octavia-lb-vrrp")
+        lb = self.add("loadbalancers", **dict(
+            {"name": "", "description": "", "admin_state_up": True,
+             "provider": "octavia", "listeners": [], "pools": [],
+             "flavor_id": None, "tags": [],
+             "project_id": PROJECT_ID, "tenant_id": PROJECT_ID,
+             "vip_address": port["fixed_ips"][0]["ip_address"],
+             "vip_port_id": port["id"],
+             "vip_network_id": subnet["network_id"],
+             "provisioning_status": "PENDING_CREATE",
+             "operating_status": "OFFLINE",
+             "_ready_at": self._deadline("loadbalancer")}, **spec))
+
+        for listener_spec in listeners:
+            listener_spec = dict(listener_spec)
+            pool_spec = listener_spec.pop("default_pool", None)
+            listener = self._add_lb_child("listeners", listener_spec, lb)
+            if pool_spec:
+                pool_spec = dict(pool_spec, listener_id=listener["id"])
+                members = pool_spec.pop("members", [])
+                monitor = pool_spec.pop("healthmonitor", None)
+                pool = self._add_lb_child("pools", pool_spec, lb)
+                for member in members:
+                    self._add_lb_child("members",
+                                       dict(member, pool_id=pool["id"]), lb)
+                if monitor:
+                    self._add_lb_child("healthmonitors",
+                                       dict(monitor, pool_id=pool["id"]), lb)
+        return lb
+
+    def _lb_of(self, kind, spec):
+        if kind == "listeners":
+            return self._get("loadbalancers", spec["loadbalancer_id"])
+        if kind == "pools" and spec.get("loadbalancer_id"):
+            return self._get("loadbalancers", spec["loadbalancer_id"])
+        if kind == "pools":
+            listener = self._get("listeners", spec["listener_id"])
+            return self._get("loadbalancers", listener["_lb"])
+        pool = self._get("pools", spec["pool_id"])
+        return self._get("loadbalancers", pool["_lb"])
+
+    def _create_lb_child(self, kind, spec):
+        lb = self._lb_of(kind, spec)
+        self._check_mutable(lb)
+        res = self._add_lb_child(kind, spec, lb)
+        self._pending_update(lb)
+        return res
+
+    def _add_lb_child(self, kind, spec, lb):
+        spec = {k: v for k, v in spec.items() if k != "loadbalancer_id"}
+        res = self.add(kind, **dict(
+            {"name": "", "description": "", "admin_state_up": True,
+             "provisioning_status": "ACTIVE", "operating_status": "ONLINE",
+             "project_id": PROJECT_ID, "tenant_id": PROJECT_ID, "tags": [],
+             "_lb": lb["id"]}, **spec))
+        res["loadbalancers"] = [{"id": lb["id"]}]
+        if kind == "listeners":
+            res.setdefault("default_pool_id", None)
+            lb["listeners"].append({"id": res["id"]})
+        elif kind == "pools":
+            res.setdefault("members", [])
+            res.setdefault("healthmonitor_id", None)
+            res["listeners"] = []
+            lb["pools"].append({"id": res["id"]})
+            if spec.get("listener_id"):
+                listener = self.state["listeners"][spec["listener_id"]]
+                listener["default_pool_id"] = res["id"]
+                res["listeners"] = [{"id": listener["id"]}]
+        elif kind == "members":
+            res.setdefault("weight", 1)
+            res.setdefault("subnet_id", None)
+            res.setdefault("monitor_port", None)
+            res.setdefault("monitor_address", None)
+            self.state["pools"][spec["pool_id"]]["members"].append(
+                {"id": res["id"]})
+        elif kind == "healthmonitors":
+            self.state["pools"][spec["pool_id"]]["healthmonitor_id"] = res["id"]
+            res["pools"] = [{"id": spec["pool_id"]}]
+        return res
+
+
+class SimulatorAdapter(BaseAdapter):
+    """A transport adapter of requests which sends everything to a
+    :class:`Simulator`"""
+
+    def __init__(self, simulator):
+        super().__init__()
+        self.simulator = simulator
+
+    def send(self, request, stream=False, timeout=None, verify=True,
+             cert=None, proxies=None):
+        # pylint: disable=too-many-arguments
+        return self.simulator.send(request)
+
+    def close(self):
+        pass
@@ -44,6 +44,7 @@ from netaddr import valid_ipv4, valid_ipv6
 
 from koris.cloud.openstack import LoadBalancer
 from koris.ssl import create_key, create_ca, CertBundle
+from koris.util.util import run_blocking
 
 
 def is_port(port):
@@ -315,6 +316,21 @@ class Listener:
         self.create()
         self.create_pool()
 
+    def spec(self):
+        """Declares the Listener with its Pool, Members and Health monitor.
+
+        Returns:
+            A dictionary for :meth:`LoadBalancer.add_listeners`.
+        """
+        self.verify()
+        self.pool.verify()
+        return LoadBalancer.listener_spec(self.name, self.port, self.pool.members,
+                                          protocol=self.protocol,
+                                          member_port=self.pool.port,
+                                          pool_protocol=self.pool.protocol,
+                                          pool_name=self.pool.name,
+                                          lb_algorithm=self.pool.algorithm)
+
 
 class DexSSL:
     """Class managing the dex TLS infrastrucutre.
@@ -430,7 +446,8 @@ async def create_dex(lb: LoadBalancer, name="dex",
     This will take an existing LoadBalancer in OpenStack and adds a new Listener
     with Pool and members to it, so Dex can be reached inside the cluster.
 
-    Will first create a :class:`.Pool`, then a :class:`.Listener` from that pool.
+    The :class:`.Listener` is created together with its :class:`.Pool`, members and
+    health monitor, see :meth:`LoadBalancer.add_listeners`.
 
     Args:
         lb (LoadBalancer): The used LoadBalancer.
@@ -444,7 +461,7 @@ async def create_dex(lb: LoadBalancer, name="dex",
 
     pool = Pool(f"{name}-pool", protocol, pool_port, algo, members)
     listener = Listener(lb, f"{name}-listener", listener_port, pool)
-    listener.all()
+    await run_blocking(lb.add_listeners, [listener.spec()])
 
 
 async def create_oauth2(lb: LoadBalancer, name="oauth2",
@@ -469,7 +486,7 @@ async def create_oauth2(lb: LoadBalancer, name="oauth2",
 
     pool = Pool(f"{name}-pool", protocol, pool_port, algo, members)
     listener = Listener(lb, f"{name}-listener", listener_port, pool)
-    listener.all()
+    await run_blocking(lb.add_listeners, [listener.spec()])
 
 
 # pylint: disable=too-many-branches
@@ -12,12 +12,16 @@ import socket
 import string
 import subprocess as sp
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import urllib3
 
 from pkg_resources import resource_filename, Requirement
 from netaddr import valid_ipv4
 
 from kubernetes import client as k8sclient
+from kubernetes import watch
 from kubernetes.stream import stream
 from kubernetes.client import api_client
 from kubernetes.client.configuration import Configuration
@@ -27,6 +31,7 @@ from kubernetes.utils import create_from_yaml
 
 import yaml
 
+from koris.cloud.discovery import first
 from koris.ssl import read_cert
 from koris.ssl import discovery_hash as ssl_discovery_hash
 from koris.util.util import retry
@@ -43,6 +48,8 @@ else:
 
 LOGGER = Logger(__name__)
 
+MASTER_ROLE_LABEL = 'node-role.kubernetes.io/master'
+
 
 ETCDCTL_BASE = ("ETCDCTL_API=3 etcdctl "
                 "--key /etc/kubernetes/pki/etcd/server.key "
@@ -119,6 +126,108 @@ def parse_etcd_response(resp):
     return out
 
 
+class ReadinessProber:
+    """Probe API servers until they are ready.
+
+    Each endpoint is probed at ``/readyz``, or at ``/healthz`` if the API
+    server is older, with short timeouts and without retries. All endpoints
+    are probed in parallel; the interval between probes grows while the
+    endpoints are not ready.
+
+    Example:
+        >>> prober = ReadinessProber({"loadbalancer": "https://10.0.0.5:6443",
+        ...                           "master-1": "https://10.0.0.10:6443"},
+        ...                          ca_certs="ca.pem")
+        >>> prober.wait(require=["loadbalancer"])
+        {'loadbalancer': 42.1, 'master-1': 38.5}
+
+    Args:
+        endpoints (dict): The names and URLs of the API servers
+        ca_certs (str): Path of the cluster CA
+        cert_file (str): Path of a client certificate
+        key_file (str): Path of the key of the client certificate
+        timeout (float): Connect and read timeout of a single probe
+    """
+    paths = ('/readyz', '/healthz')
+
+    def __init__(self, endpoints, ca_certs=None, cert_file=None, key_file=None,
+                 timeout=2):
+        self.endpoints = dict(endpoints)
+        self.timeout = urllib3.Timeout(connect=timeout, read=timeout)
+        self.http = urllib3.PoolManager(
+            cert_reqs='CERT_REQUIRED' if ca_certs else 'CERT_NONE',
+            ca_certs=ca_certs, cert_file=cert_file, key_file=key_file,
+            # the API server certificates are checked against the CA, but
+            # they are not issued for the addresses of the masters
+            assert_hostname=False)
+        # seconds since the start of wait when an endpoint became ready
+        self.ready_at = {}
+        self._path = {}
+
+    def probe(self, name):
+        """Probe an endpoint once.
+
+        Returns:
+            bool: True if the endpoint is ready.
+        """
+        url = self.endpoints[name]
+        paths = [self._path[name]] if name in self._path else self.paths
+        for path in paths:
+            try:
+                response = self.http.request('GET', url + path,
+                                             timeout=self.timeout,
+                                             retries=False)
+            except urllib3.exceptions.HTTPError:
+                return False
+            if response.status == 404:
+                continue
+            self._path[name] = path
+            return response.status == 200
+        return False
+
+    # pylint: disable=too-many-arguments
+    def wait(self, require=None, timeout=900, interval=0.5, max_interval=5,
+             backoff=1.5):
+        """Probe all endpoints until the required ones are ready.
+
+        Args:
+            require (list): The names of the endpoints which must be ready,
+                defaults to all endpoints
+            timeout (int): Maximal seconds to wait
+            interval (float): Initial seconds between probes
+            max_interval (float): Maximal seconds between probes
+            backoff (float): Multiplier of the interval after each probe
+
+        Returns:
+            dict: The seconds after which each endpoint was ready, or
+            ``None`` if it was not ready when the required ones were.
+
+        Raises:
+            TimeoutError if the required endpoints are not ready in time.
+        """
+        require = set(self.endpoints if require is None else require)
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=len(self.endpoints)) as pool:
+            while not require <= set(self.ready_at):
+                pending = [name for name in self.endpoints
+                           if name not in self.ready_at]
+                for name, ready in zip(pending, pool.map(self.probe, pending)):
+                    if ready:
+                        self.ready_at[name] = time.monotonic() - start
+                        LOGGER.debug("%s is ready after %.1fs", name,
+                                     self.ready_at[name])
+
+                if require <= set(self.ready_at):
+                    break
+                if time.monotonic() - start > timeout:
+                    raise TimeoutError("API servers %s not ready after %ds" % (
+                        sorted(require - set(self.ready_at)), timeout))
+                time.sleep(interval)
+                interval = min(interval * backoff, max_interval)
+
+        return {name: self.ready_at.get(name) for name in self.endpoints}
+
+
 class K8SConfigurator:  # pylint: disable=no-member
     """apply plugins and post install setup"""
 
@@ -200,6 +309,20 @@ class K8SConfigurator:  # pylint: disable=no-member
             logging.getLogger("urllib3").setLevel(logging.WARNING)
             return False
 
+    def readiness_prober(self, endpoints, timeout=2):
+        """Return a :class:`ReadinessProber` for endpoints of this cluster.
+
+        The prober uses the CA and the client certificate of the kubeconfig.
+
+        Args:
+            endpoints (dict): The names and URLs of the API servers
+        """
+        config = self.api.api_client.configuration
+        return ReadinessProber(endpoints, ca_certs=config.ssl_ca_cert,
+                               cert_file=config.cert_file,
+                               key_file=config.key_file,
+                               timeout=timeout)
+
     def get_random_master(self):
         """Returns a name and IP of a random master server in the cluster.
 
@@ -265,20 +388,28 @@ class K8SConfigurator:  # pylint: disable=no-member
 
         return etcd_cluster
 
-    def add_all_masters_to_loadbalancer(self, cluster_name, n_masters, lb_inst):
+    def add_all_masters_to_loadbalancer(self, cluster_name, n_masters, lb_inst,
+                                        timeout=1800):
         """Adds all master nodes to the LoadBalancer listener.
 
         If the number of members in the master listener pool of the LoadBalancer
         is less than expected number of masters this function will add them to
         the pool as soon as they have node status "Ready".
 
+        The master nodes are watched, thus each master is added once, when
+        it becomes ready. The members of the pool are read only once. If the
+        watch breaks, the masters are listed once and watched again.
+
         Args:
             cluster_name (string): the name of the cluster
             n_master (int): Number of desired master nodes.
             lb_inst (:class:`.cloud.openstack.LoadBalancer`):
                 A configured LoadBalancer instance.
+            timeout (int): Maximal seconds to wait for the masters.
+
+        Returns:
+            bool: False if not all masters were added before the timeout.
         """
-        cond = {'Ready': 'True'}
         master_listener = lb_inst.master_listener
         listener_name = '-'.join((MASTER_LISTENER_NAME,
                                   cluster_name))
@@ -288,24 +419,66 @@ class K8SConfigurator:  # pylint: disable=no-member
 
         try:
             listener_name = master_listener['name']
-            mem = master_listener['pool']['members']  # noqa #  pylint: disable=unused-variable
+            present = {x['address'] for x in master_listener['pool']['members']}
             pool_id = master_listener['pool']['id']
         except KeyError as exc:
             LOGGER.error(f"Unable to extract info of {listener_name}: {exc}")
             sys.exit(1)
 
-        while len(lb_inst.master_listener['pool']['members']) < n_masters:
-            for item in self.api.list_node(pretty=True).items:
-                if cond in [{c.type: c.status} for c in item.status.conditions]:
-                    if 'master' in item.metadata.name:
-                        addr_to_add = item.status.addresses[0].address
-                        addr_present = [x['address'] for x in
-                                        lb_inst.master_listener['pool']['members']]
-                        if addr_to_add not in addr_present:
-                            LOGGER.debug("Adding %s to pool '%s' (%s) ...", addr_to_add,
-                                         listener_name, pool_id)
-                            lb_inst.add_member(pool_id,
-                                               addr_to_add)
+        start = time.monotonic()
+
+        def add_if_ready(node):
+            conditions = node.status.conditions or []
+            if not any(c.type == 'Ready' and c.status == 'True'
+                       for c in conditions):
+                return
+
+            addr_to_add = _get_node_addr(node.status.addresses, "InternalIP")
+            if addr_to_add in present:
+                return
+
+            LOGGER.debug("Adding %s to pool '%s' (%s) ...", addr_to_add,
+                         listener_name, pool_id)
+            lb_inst.add_member(pool_id, addr_to_add)
+            present.add(addr_to_add)
+            LOGGER.info("Master %s is ready [%d/%d masters in the "
+                        "LoadBalancer, %ds]", node.metadata.name,
+                        len(present), n_masters, time.monotonic() - start)
+
+        watcher = watch.Watch()
+        while len(present) < n_masters:
+            remaining = timeout - (time.monotonic() - start)
+            if remaining <= 0:
+                LOGGER.error("Timeout: only %d of %d masters were added to "
+                             "pool '%s'", len(present), n_masters, listener_name)
+                return False
+
+            try:
+                for event in watcher.stream(
+                        self.api.list_node, label_selector=MASTER_ROLE_LABEL,
+                        timeout_seconds=int(min(remaining, 300)) or 1):
+                    add_if_ready(event['object'])
+                    if len(present) >= n_masters:
+                        watcher.stop()
+                        break
+            except (ApiException, urllib3.exceptions.HTTPError,
+                    ConnectionError) as exc:
+                # the watch broke, e.g. the API server restarted or the
+                # resource version expired, list the masters instead and
+                # watch again
+                LOGGER.warning("Watching the masters failed: %s", exc)
+                try:
+                    for node in self.api.list_node(
+                            label_selector=MASTER_ROLE_LABEL).items:
+                        add_if_ready(node)
+                except (ApiException, urllib3.exceptions.HTTPError,
+                        ConnectionError) as exc:
+                    LOGGER.warning("Listing the masters failed: %s", exc)
+                if len(present) < n_masters:
+                    time.sleep(min(5, max(remaining, 0)))
+                watcher = watch.Watch()
+
+        return True
 
     def apply_addons(self, koris_config, apply_func=create_from_yaml):
         """apply all addons to the cluster
@@ -335,7 +508,7 @@ class K8SConfigurator:  # pylint: disable=no-member
         is also the cloud context we are using.
 
         This retrieves the project ID of the Kubernetes LoadBalancer,
-        then checks if it finds the same ID in any LoadBalancer of the
+        then asks for a LoadBalancer with the same project ID in the
         currently sourced OpenStack project.
 
         In case the IP is not a Floating IP but only a Virtual IP, both
@@ -352,16 +525,14 @@ class K8SConfigurator:  # pylint: disable=no-member
 
         if lb_ip:
             # We have a Floating IP
-            for item in conn.load_balancer.load_balancers():
-                if item.project_id == lb_ip.project_id:
-                    return True
+            lbs = conn.load_balancer.load_balancers(
+                project_id=lb_ip.project_id, limit=1)
         else:
             # We have a Virtual IP
-            for item in conn.load_balancer.load_balancers():
-                if item.vip_address == raw_ip:
-                    return True
+            lbs = conn.load_balancer.load_balancers(vip_address=raw_ip,
+                                                    limit=1)
 
-        return False
+        return first(lbs) is not None
 
 
 class K8SScaler:  # pylint: disable=no-member
@@ -627,6 +798,9 @@ def add_ingress_listeners(nginx_ingress_ports, lbinst, lb_masters):
     Reconfigure the Openstack LoadBalancer - add an HTTP and HTTPS listener
     for nginx ingress controller
 
+    Each listener is created together with its pool and members, see
+    :meth:`.cloud.openstack.LoadBalancer.add_listeners`.
+
     Args:
         lbinst (:class:`.cloud.openstack.LoadBalancer`): A configured
             LoadBalancer instance.
@@ -635,24 +809,16 @@ def add_ingress_listeners(nginx_ingress_ports, lbinst, lb_masters):
     # [{"name": "foo", "address": "10.0.0.38", "protocol_port": "6443"},
     #  {"name": "bar", "address": "10.0.0.29", "protocol_port": "6443"},
     # ]
-
+    listeners = []
     for key, port in {'Ingress-HTTP': 80, 'Ingress-HTTPS': 443}.items():
         protocol = key.split("-")[-1]
         name = '-'.join((key, lbinst.config['cluster-name']))
-        listener = lbinst.add_listener(
-            name=name,
-            protocol=protocol,
-            protocol_port=port)
-
-        pool = lbinst.add_pool(listener.id, protocol=protocol, name=name)
-        updated_masters = lb_masters.copy()
-
-        for master in updated_masters:
-            master['protocol_port'] = nginx_ingress_ports[protocol].node_port
-            master["monitor_port"] = nginx_ingress_ports[protocol].node_port
-
-        if not lbinst.bulk_update_members(updated_masters, pool['id']):
-            LOGGER.debug("Bulk update failed, falling back to serial update")
-            for master in lb_masters:
-                lbinst.add_member(pool.id, master['address'],
-                                  protocol_port=nginx_ingress_ports[protocol].node_port)  # noqa
+        node_port = nginx_ingress_ports[protocol].node_port
+        members = [{"name": master["name"], "address": master["address"],
+                    "protocol_port": node_port, "monitor_port": node_port}
+                   for master in lb_masters]
+        listeners.append(lbinst.listener_spec(name, port, members,
+                                              protocol=protocol,
+                                              health_monitor=False))
+
+    lbinst.add_listeners(listeners)
@@ -6,29 +6,29 @@ The main entry point for the kubernetes cluster build.
 Don't use it directly, instead install the package with setup.py.
 It automatically creates an executable in your path.
 
+The OpenStack and Kubernetes clients take a long time to import, thus they
+are imported only by the commands which use them. ``koris --help`` and
+other quick commands don't pay for them.
 """
 import argparse
+import atexit
 import os
 import shutil
 import ssl
 import sys
 import urllib
-from urllib.request import urlopen
-from urllib.error import URLError, HTTPError
 import yaml
 
 from mach import mach1
 
-from koris.util.util import KorisVersionCheck
+from koris.util.apistats import API_STATS
+from koris.util.cache import get_cache
+from koris.util.perfstore import PERF_RECORDER
+from koris.util.tracing import TRACER, span
+from koris.util.util import check_version
 
 from . import __version__, KUBERNETES_BASE_VERSION
-from .cli import remove_cluster, confirm
-from .deploy.k8s import K8S
 from .util.logger import Logger
-from .cloud.builder import ClusterBuilder, NodeBuilder, ControlPlaneBuilder
-from .cloud.openstack import (OSCloudConfig, BuilderError, InstanceExists,
-                              delete_instance, OSClusterInfo, get_connection,
-                              LoadBalancer, get_clients, InstanceNotFound)
 
 # pylint: disable=protected-access
 ssl._create_default_https_context = ssl._create_unverified_context
@@ -76,6 +76,8 @@ def add_node(cloud_config,
         config_dict (dict): the koris configuration yaml as ``dict``
 
     """
+    from .cloud.builder import NodeBuilder
+
     node_builder = NodeBuilder(
         config_dict,
         os_cluster_info,
@@ -87,15 +89,22 @@ def add_node(cloud_config,
         k8s_version = KUBERNETES_BASE_VERSION
         config_dict.update({"version": {"k8s": k8s_version}})
 
-    tasks = node_builder.create_nodes_tasks(k8s.host,
-                                            k8s.get_bootstrap_token(),
-                                            k8s.ca_info,
-                                            role=role,
-                                            zone=zone,
-                                            flavor=flavor,
-                                            amount=amount,
-                                            k8s_version=k8s_version)
-    node_builder.launch_new_nodes(tasks)
+    with span("add_node", cluster=config_dict['cluster-name'], role=role,
+              zone=zone, amount=amount,
+              flavor=flavor or config_dict['node_flavor'],
+              masters=config_dict['n-masters'], nodes=config_dict['n-nodes'],
+              k8s_version=k8s_version):
+        with span("prepare_nodes"):
+            tasks = node_builder.create_nodes_tasks(k8s.host,
+                                                    k8s.get_bootstrap_token(),
+                                                    k8s.ca_info,
+                                                    role=role,
+                                                    zone=zone,
+                                                    flavor=flavor,
+                                                    amount=amount,
+                                                    k8s_version=k8s_version)
+        with span("launch_nodes"):
+            node_builder.launch_new_nodes(tasks)
 
 
 def add_master(builder,
@@ -121,6 +130,8 @@ def add_master(builder,
         k8s (:class:`.deploy.K8S`): A K8S instance.
     """
 
+    from .cloud.openstack import LoadBalancer, get_connection
+
     if 'version' in config_dict and 'k8s' in config_dict['version']:
         k8s_version = config_dict['version']['k8s']
     else:
@@ -129,29 +140,38 @@ def add_master(builder,
 
     uri = urllib.parse.urlparse(k8s.host)
     loc, port = uri.netloc.split(":")
-    master = builder.add_master(
-        zone, flavor, k8s_version=k8s_version, k8s_conf=k8s.config,
-        koris_env={'bootstrap_token': k8s.get_bootstrap_token(),
-                   'lb_dns': loc,
-                   'lb_ip': loc,
-                   'lb_port': port,
-                   'current_cluster': k8s.etcd_cluster_status(),
-                   'auto_join': 1})
-    update_config(config_dict, config, 1, role='masters')
-
-    # Adding master to LB
-    conn = get_connection()
-    lb = LoadBalancer(config_dict, conn)
-    if not lb.get():
-        LOGGER.error("No LoadBalancer found")
-        sys.exit(1)
-    try:
-        master_pool = lb.master_listener['pool']['id']
-    except KeyError as exc:
-        LOGGER.error(f"Unable to obtain master-pool: {exc}")
-        sys.exit(1)
-    LOGGER.info("Adding new master to LoadBalancer ...")
-    lb.add_member(master_pool, master.ip_address)
+    with span("add_master", cluster=config_dict['cluster-name'],
+              role="master", zone=zone,
+              flavor=flavor or config_dict['master_flavor'],
+              masters=config_dict['n-masters'], nodes=config_dict['n-nodes'],
+              amount=1, k8s_version=k8s_version):
+        with span("etcd_status"):
+            current_cluster = k8s.etcd_cluster_status()
+        with span("boot_master"):
+            master = builder.add_master(
+                zone, flavor, k8s_version=k8s_version, k8s_conf=k8s.config,
+                koris_env={'bootstrap_token': k8s.get_bootstrap_token(),
+                           'lb_dns': loc,
+                           'lb_ip': loc,
+                           'lb_port': port,
+                           'current_cluster': current_cluster,
+                           'auto_join': 1})
+        update_config(config_dict, config, 1, role='masters')
+
+        # Adding master to LB
+        with span("lb_add_member", host=master.name):
+            conn = get_connection()
+            lb = LoadBalancer(config_dict, conn)
+            if not lb.get():
+                LOGGER.error("No LoadBalancer found")
+                sys.exit(1)
+            try:
+                master_pool = lb.master_listener['pool']['id']
+            except KeyError as exc:
+                LOGGER.error(f"Unable to obtain master-pool: {exc}")
+                sys.exit(1)
+            LOGGER.info("Adding new master to LoadBalancer ...")
+            lb.add_member(master_pool, master.ip_address)
 
 
 # pylint: disable=no-member
@@ -172,52 +192,61 @@ def delete_node(config_dict, name):
     if not name or name is None:
         raise ValueError("name can't be empty")
 
-    conn = get_connection()
-
-    # Get our LoadBalancer
-    lb = LoadBalancer(config_dict, conn)
-    lbinst = lb.get()
-    if not lbinst:
-        raise ValueError("no LoadBalancer found")
-
-    k8s = K8S(os.getenv("KUBECONFIG"))
-
-    # Verify we are in the project of our target cluster
-    if not k8s.validate_context(conn):
-        raise ValueError("cluster not part of your sourced OpenStack tenant")
-
-    # Drain the node first
-    k8s.drain_node(name)
-
-    # If master, remove member from etcd cluster and LoadBalancer
-    if 'master' in name:
-        k8s.remove_from_etcd(name)
-
-        # Get IP of node to be deleted
-        srv = conn.compute.find_server(name)
-        if not srv:
-            raise ValueError(f"instance '{name}' not found")
-        ip = list(conn.compute.server_ips(srv))
-        if not ip:
-            raise ValueError(f"instance '{name}' has no IP")
-
-        # Get member ID of node to be ledeted
-        mems = lb.master_listener['pool']['members']
-        mem_id = [x['id'] for x in mems if x['address'] == ip[0].address]
-        if mem_id:
-            # Delete member from LoadBalancer master pool
-            pool_id = lb.master_listener['pool']['id']
-            lb.del_member(mem_id[0], pool_id)
-            LOGGER.success("Removed instance '%s' from LoadBalancer '%s'", name,
-                           lb.name)
-        else:
-            LOGGER.debug("Members: %s", mems)
-            LOGGER.error("instance '%s' not part of LoadBalancer", name)
-    # Delete the node from Kubernetes
-    k8s.delete_node(name)
+    from .cloud.openstack import LoadBalancer, delete_instance, get_connection
+    from .deploy.k8s import K8S
+
+    with span("delete_node", cluster=config_dict['cluster-name'], host=name):
+        conn = get_connection()
+
+        # Get our LoadBalancer
+        lb = LoadBalancer(config_dict, conn)
+        lbinst = lb.get()
+        if not lbinst:
+            raise ValueError("no LoadBalancer found")
+
+        k8s = K8S(os.getenv("KUBECONFIG"))
 
-    # Delete the instance from OpenStack
-    delete_instance(name, conn, ignore_not_found=False)
+        # Verify we are in the project of our target cluster
+        if not k8s.validate_context(conn):
+            raise ValueError("cluster not part of your sourced OpenStack tenant")
+
+        # Drain the node first
+        with span("drain"):
+            k8s.drain_node(name)
+
+        # If master, remove member from etcd cluster and LoadBalancer
+        if 'master' in name:
+            with span("remove_from_etcd"):
+                k8s.remove_from_etcd(name)
+
+            # Get IP of node to be deleted
+            srv = conn.compute.find_server(name)
+            if not srv:
+                raise ValueError(f"instance '{name}' not found")
+            ip = list(conn.compute.server_ips(srv))
+            if not ip:
+                raise ValueError(f"instance '{name}' has no IP")
+
+            # Get member ID of node to be ledeted
+            mems = lb.master_listener['pool']['members']
+            mem_id = [x['id'] for x in mems if x['address'] == ip[0].address]
+            if mem_id:
+                # Delete member from LoadBalancer master pool
+                pool_id = lb.master_listener['pool']['id']
+                with span("lb_del_member"):
+                    lb.del_member(mem_id[0], pool_id)
+                LOGGER.success("Removed instance '%s' from LoadBalancer '%s'", name,
+                               lb.name)
+            else:
+                LOGGER.debug("Members: %s", mems)
+                LOGGER.error("instance '%s' not part of LoadBalancer", name)
+        # Delete the node from Kubernetes
+        with span("delete_k8s_node"):
+            k8s.delete_node(name)
+
+        # Delete the instance from OpenStack
+        with span("delete_instance"):
+            delete_instance(name, conn, ignore_not_found=False)
 
 
 @mach1()
@@ -247,12 +276,35 @@ class Koris:  # pylint: disable=no-self-use,too-many-locals
                                  type=str,
                                  default=3)
 
-        try:
-            html_string = str(urlopen(KORIS_DOC_URL, timeout=1.5).read())
-        except (HTTPError, URLError):
-            html_string = ""
+        self.parser.add_argument(  # pylint: disable=no-member
+            "--refresh", action="store_true",
+            help="look up flavors, images and networks again instead of "
+                 "using the cached ones")
+
+        self.parser.add_argument(  # pylint: disable=no-member
+            "--api-stats", nargs="?", const=True, metavar="FILE",
+            help="print statistics of the OpenStack API calls on exit, "
+                 "and write the raw calls as JSON to FILE if given")
 
-        KorisVersionCheck(html_string).check_is_latest(__version__)
+        self.parser.add_argument(  # pylint: disable=no-member
+            "--trace", metavar="FILE",
+            help="write the timeline of the operation to FILE as Chrome "
+                 "trace JSON, see https://ui.perfetto.dev")
+
+        self.parser.add_argument(  # pylint: disable=no-member
+            "--trace-otlp", metavar="FILE",
+            help="write the timeline of the operation to FILE as "
+                 "OpenTelemetry (OTLP) JSON")
+
+        self.parser.add_argument(  # pylint: disable=no-member
+            "--no-perf-store", action="store_true",
+            help="don't record the durations of apply, add, delete and "
+                 "destroy in the performance history, see koris perf. This "
+                 "also turns off the tracing and API statistics which are "
+                 "collected for it, unless --trace or --api-stats is given")
+
+        self.perf_store = True
+        check_version(__version__, KORIS_DOC_URL)
 
     def _get_version(self):
         print("%s version: %s" % (self.__class__.__name__, __version__))
@@ -260,18 +312,58 @@ class Koris:  # pylint: disable=no-self-use,too-many-locals
     def _get_verbosity(self):
         pass
 
+    def _set_refresh(self, refresh):  # pylint: disable=unused-argument
+        cache = get_cache()
+        if cache:
+            cache.invalidate()
+
+    def _set_api_stats(self, path):
+        API_STATS.enable()
+
+        def report():
+            API_STATS.print_summary()
+            if isinstance(path, str):
+                API_STATS.write_json(path)
+
+        atexit.register(report)
+
+    def _set_no_perf_store(self, _):
+        self.perf_store = False
+
+    def _record_operation(self):
+        """record the operation in the performance history on exit"""
+        if self.perf_store:
+            PERF_RECORDER.start(__version__)
+
+    def _set_trace(self, path):
+        TRACER.enable()
+        atexit.register(TRACER.write_chrome_trace, path)
+
+    def _set_trace_otlp(self, path):
+        TRACER.enable()
+        atexit.register(TRACER.write_otlp, path)
+
     def apply(self, config):
         """
         Bootstrap a Kubernetes cluster
 
         config - configuration file
         """
+        from .cli import remove_cluster
+        from .cloud.builder import ClusterBuilder
+        from .cloud.openstack import (BuilderError, InstanceExists,
+                                      OSClusterInfo, get_clients,
+                                      get_connection)
+
+        self._record_operation()
         with open(config, 'r') as stream:
             config = yaml.safe_load(stream)
 
         nova, neutron, cinder = get_clients()
         conn = get_connection()
-        oscinfo = OSClusterInfo(nova, neutron, cinder, config, conn)
+        oscinfo = OSClusterInfo(nova, neutron, cinder, config, conn,
+                                cache=get_cache())
+        oscinfo.prefetch()
         oscinfo.setup_networking(config)
         builder = ClusterBuilder(config, oscinfo, nova, neutron, cinder, conn)
 
@@ -287,6 +379,10 @@ class Koris:  # pylint: disable=no-self-use,too-many-locals
         """
         Delete the complete cluster stack
         """
+        from .cli import confirm, remove_cluster
+        from .cloud.openstack import get_clients, get_connection
+
+        self._record_operation()
         with open(config, 'r') as stream:
             config = yaml.safe_load(stream)
 
@@ -324,7 +420,10 @@ class Koris:  # pylint: disable=no-self-use,too-many-locals
         name - the name of the resource to delete.
         force - Force deletion of resource.
         """
+        from .cli import confirm
+        from .cloud.openstack import InstanceNotFound
 
+        self._record_operation()
         with open(config, 'r') as stream:
             config_dict = yaml.safe_load(stream)
 
@@ -384,6 +483,12 @@ class Koris:  # pylint: disable=no-self-use,too-many-locals
         it to the cluster without trying to create the host in the cloud first.
         """
 
+        from .cloud.builder import ControlPlaneBuilder
+        from .cloud.openstack import (OSCloudConfig, OSClusterInfo,
+                                      get_clients, get_connection)
+        from .deploy.k8s import K8S
+
+        self._record_operation()
         with open(config, 'r') as stream:
             config_dict = yaml.safe_load(stream)
 
@@ -392,7 +497,10 @@ class Koris:  # pylint: disable=no-self-use,too-many-locals
 
         k8s = K8S(os.getenv("KUBECONFIG"))
         os_cluster_info = OSClusterInfo(nova, neutron, cinder,
-                                        config_dict, conn)
+                                        config_dict, conn, cache=get_cache())
+        os_cluster_info.prefetch((
+            "keypair", "net", "secgroups", "image",
+            "master_flavor" if role == "master" else "node_flavor"))
 
         if not k8s.validate_context(os_cluster_info.conn):
             LOGGER.error(("Error: cluster not part of your sourced "
@@ -428,6 +536,78 @@ class Koris:  # pylint: disable=no-self-use,too-many-locals
 
         LOGGER.success("Adding new node finished successfully")
 
+    def bench(self, scenarios: str = "apply,add,destroy",
+              nodes: str = "10,100,500", time_scale: float = 0.01,
+              latency: float = 0.03, output: str = None):
+        """
+        Benchmark koris against a simulated OpenStack cloud.
+
+        scenarios - comma separated list of apply, add and destroy
+        nodes - comma separated list of cluster sizes
+        time_scale - real seconds per simulated second of the cloud
+        latency - median latency of an API request in seconds
+        output - write the results as JSON to this file
+        ---
+        No real cloud is used, thus no OpenStack RC file is needed.
+        """
+        import json
+        from .bench import format_results, run
+        from .cloud.simulator import LatencyModel
+
+        results = run(scenarios=scenarios.split(","),
+                      sizes=[int(size) for size in nodes.split(",")],
+                      latency=LatencyModel(median=latency),
+                      time_scale=time_scale)
+        print(format_results(results))
+        if output:
+            with open(output, "w") as fh:
+                json.dump(results, fh, indent=2)
+
+    def perf(self, action: str, operation: str = None, cluster: str = None,
+             last: int = 100, window: int = 10, threshold: float = 0.25,
+             json_file: str = None):
+        """
+        Report the durations of the recorded koris operations.
+
+        action - report or runs
+        operation - only show runs of apply, add_node, add_master, delete_node or destroy
+        cluster - only show runs of this cluster
+        last - the number of the latest runs to show
+        window - compare the last run with the median of this many runs before it
+        threshold - report a regression if the last run is slower by this fraction
+        json_file - write the report as JSON to this file
+        ---
+        The report shows the percentiles and the trend of the durations of the
+        operations and their phases, of the boot times per availability zone
+        and flavor, and of the API calls and latencies per service. Boot times
+        and API latencies depend on the cloud, the number of API calls depends
+        on koris.
+        The history is kept in $KORIS_PERF_DB, or in
+        ~/.local/share/koris/perf.sqlite.
+        """
+        import json
+        from .util.perfstore import PerfStore, store_path
+
+        allowed_actions = ["report", "runs"]
+        if action not in allowed_actions:
+            LOGGER.error('Error: action must be '
+                         '[%s]' % " | ".join(allowed_actions))
+            sys.exit(1)
+
+        store = PerfStore(store_path())
+        try:
+            if action == "runs":
+                print(store.format_runs(operation, cluster, last))
+                return
+            print(store.format_report(operation, cluster, last, window,
+                                      threshold))
+            if json_file:
+                with open(json_file, "w") as fh:
+                    json.dump(store.report(operation, cluster, last, window,
+                                           threshold), fh, indent=2)
+        finally:
+            store.close()
+
 
 def main():
     """
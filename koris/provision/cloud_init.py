@@ -25,6 +25,12 @@ LOGGER = Logger(__name__)
 
 BOOTSTRAP_SCRIPTS_DIR = "/koris/provision/userdata/"
 
+# Sets the hostname to the current server name as seen by the metadata service
+METADATA_HOSTNAME_CMD = (
+    'hostnamectl set-hostname "$(curl -sf '
+    'http://169.254.169.254/openstack/latest/meta_data.json | '
+    'python3 -c \'import json, sys; print(json.load(sys.stdin)["name"])\')"')
+
 
 def get_audit_policy():
     """read the"""
@@ -348,8 +354,14 @@ class NodeInit(BaseInit):
                  discovery_hash, lb_dns='', os_type='ubuntu',
                  os_version="16.04",
                  k8s_version=KUBERNETES_BASE_VERSION,
-                 pod_network="CALICO"):
+                 pod_network="CALICO",
+                 hostname_from_metadata=False):
         """
+        Args:
+            hostname_from_metadata (bool): set the hostname from the server
+                name in the metadata service instead of the name the server
+                was created with. Needed for servers which are renamed after
+                creation, see :meth:`koris.cloud.openstack.Instance.create_batch`.
         """
         super().__init__(cloud_config)
         self.ca_cert = ca_cert
@@ -368,6 +380,16 @@ class NodeInit(BaseInit):
         self._write_koris_env()
         self._write_kubelet_default()
         self._write_cloud_config()
+        if hostname_from_metadata:
+            self._write_hostname_from_metadata()
+
+    def _write_hostname_from_metadata(self):
+        """
+        let cloud-init keep its hands off the hostname and set it from the
+        metadata service early during boot
+        """
+        self._cloud_config_data['preserve_hostname'] = True
+        self._cloud_config_data['bootcmd'] = [METADATA_HOSTNAME_CMD]
 
     def _write_koris_env(self):
         """
@@ -0,0 +1,339 @@
+"""
+API call accounting
+===================
+
+Record every OpenStack API call koris makes: the method, the service, the
+URL template, the status, the latency and the number of retries.
+
+All OpenStack clients, including the openstacksdk connection, send their
+requests through the keystoneauth session of
+:func:`koris.cloud.openstack.get_session`, which is instrumented with
+:meth:`ApiStats.install`. The calls are only recorded while the statistics
+are enabled, e.g. with ``koris --api-stats apply ...``.
+
+Calls are grouped by the operation they belong to, see :func:`operation`.
+The tasks of a :class:`koris.util.dag.TaskGraph` are operations. Identical
+GET requests repeated inside one operation, and GET requests of the same
+URL template repeated many times, are reported, because they usually hint at
+a loop which fetches one resource per iteration (N+1) instead of listing
+them once.
+
+Example::
+
+    API_STATS.enable()
+    with operation("masters"):
+        nova.servers.list()
+    API_STATS.print_summary()
+    API_STATS.write_json("api-stats.json")
+"""
+import contextvars
+import heapq
+import json
+import re
+import threading
+import time
+
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+from urllib.parse import urlparse
+
+from koris.util.logger import Logger
+
+LOGGER = Logger(__name__)
+
+# the operation which calls are recorded for, see operation()
+CURRENT_OPERATION = contextvars.ContextVar("koris_operation", default="koris")
+
+# path segments which are replaced by {id} in the URL template
+ID_REGEX = re.compile(
+    r"^([0-9a-f]{8}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{12}"
+    r"|[0-9a-f]{32,}|[0-9]+)$", re.IGNORECASE)
+
+# report identical GET requests if they are sent this many times inside
+# one operation
+REPEAT_THRESHOLD = 2
+
+# report GET requests of one URL template if they are sent this many times
+# inside one operation
+TEMPLATE_THRESHOLD = 5
+
+
+@contextmanager
+def operation(name):
+    """record the API calls inside the block for the operation name
+
+    The operation is kept in a context variable, thus it is inherited by
+    coroutines started inside the block and by functions passed to
+    :func:`koris.util.util.run_blocking`.
+    """
+    token = CURRENT_OPERATION.set(name)
+    try:
+        yield
+    finally:
+        CURRENT_OPERATION.reset(token)
+
+
+def url_template(url):
+    """return the path of url with all IDs replaced by ``{id}``
+
+    Example:
+        >>> url_template("https://nova:8774/v2.1/servers/1a2b...?all=1")
+        '/v2.1/servers/{id}'
+    """
+    path = urlparse(url).path
+    return "/".join("{id}" if ID_REGEX.match(part) else part
+                    for part in path.split("/"))
+
+
+class ApiStats:
+    """Records the OpenStack API calls of a keystoneauth session
+
+    Args:
+        repeat_threshold (int): Report identical GET requests sent this many
+            times inside one operation
+        template_threshold (int): Report GET requests of one URL template
+            sent this many times inside one operation
+    """
+
+    def __init__(self, repeat_threshold=REPEAT_THRESHOLD,
+                 template_threshold=TEMPLATE_THRESHOLD):
+        self.repeat_threshold = repeat_threshold
+        self.template_threshold = template_threshold
+        self.enabled = False
+        self.calls = []
+        self._lock = threading.Lock()
+        self._attempts = threading.local()
+
+    def enable(self):
+        """start recording calls"""
+        self.enabled = True
+
+    def reset(self):
+        """forget all recorded calls"""
+        with self._lock:
+            self.calls = []
+
+    def install(self, sess):
+        """instrument a keystoneauth session
+
+        The request method of the session is wrapped to record each call.
+        The HTTP requests of its requests session are counted as well, thus
+        retries done by keystoneauth are recorded with the call.
+
+        Args:
+            sess: A :class:`keystoneauth1.session.Session`
+
+        Returns:
+            The session
+        """
+        if getattr(sess, "_koris_api_stats", None) is self:
+            return sess
+
+        request = sess.request
+        http_request = sess.session.request
+
+        @wraps(http_request)
+        def counted_http_request(*args, **kwargs):
+            # the count is None outside of a recorded call
+            count = getattr(self._attempts, "count", None) or 0
+            self._attempts.count = count + 1
+            return http_request(*args, **kwargs)
+
+        @wraps(request)
+        def recorded_request(url, method, *args, **kwargs):
+            if not self.enabled:
+                return request(url, method, *args, **kwargs)
+
+            outer = getattr(self._attempts, "count", None)
+            self._attempts.count = 0
+            start = time.monotonic()
+            status = None
+            try:
+                resp = request(url, method, *args, **kwargs)
+                status = resp.status_code
+                return resp
+            except Exception as err:
+                status = getattr(err, "http_status", None) or type(err).__name__
+                raise
+            finally:
+                attempts = self._attempts.count
+                self._attempts.count = outer
+                self.record(method, self._service(url, kwargs), url, status,
+                            time.monotonic() - start, max(attempts - 1, 0),
+                            start)
+
+        sess.session.request = counted_http_request
+        sess.request = recorded_request
+        sess._koris_api_stats = self  # pylint: disable=protected-access
+        return sess
+
+    @staticmethod
+    def _service(url, kwargs):
+        endpoint_filter = kwargs.get("endpoint_filter") or {}
+        candidates = (endpoint_filter.get("service_type"),
+                      kwargs.get("service_type"), urlparse(url).netloc)
+        return next((name for name in candidates if name), "unknown")
+
+    def record(self, method, service, url, status, duration, retries=0,
+               start=None):
+        """add a call to the statistics
+
+        Args:
+            method (str): The HTTP method
+            service (str): The service type, e.g. ``compute``
+            url (str): The requested URL
+            status: The HTTP status code, or the name of the exception if
+                the request failed without response
+            duration (float): The latency in seconds
+            retries (int): The number of retried HTTP requests
+            start (float): The :func:`time.monotonic` time the call was sent,
+                defaults to ``duration`` seconds ago
+        """
+        if start is None:
+            start = time.monotonic() - duration
+        call = OrderedDict([
+            ("operation", CURRENT_OPERATION.get()),
+            ("method", method.upper()),
+            ("service", service),
+            ("template", url_template(url)),
+            ("url", url),
+            ("status", status),
+            ("duration", duration),
+            ("retries", retries),
+            ("start", start),
+        ])
+        with self._lock:
+            self.calls.append(call)
+
+    def summary(self):
+        """return the statistics per service, method and URL template
+
+        Returns:
+            A list of dicts with the keys ``service``, ``method``,
+            ``template``, ``calls``, ``errors``, ``retries``, ``total``,
+            ``mean`` and ``max``, the slowest endpoints first.
+        """
+        rows = OrderedDict()
+        for call in list(self.calls):
+            key = (call["service"], call["method"], call["template"])
+            row = rows.setdefault(key, OrderedDict([
+                ("service", key[0]), ("method", key[1]), ("template", key[2]),
+                ("calls", 0), ("errors", 0), ("retries", 0), ("total", 0.0),
+                ("max", 0.0)]))
+            row["calls"] += 1
+            row["retries"] += call["retries"]
+            row["total"] += call["duration"]
+            row["max"] = max(row["max"], call["duration"])
+            if not isinstance(call["status"], int) or call["status"] >= 400:
+                row["errors"] += 1
+
+        for row in rows.values():
+            row["mean"] = row["total"] / row["calls"]
+        return sorted(rows.values(), key=lambda row: row["total"],
+                      reverse=True)
+
+    def profile(self):
+        """return the number of calls per operation and endpoint
+
+        Returns:
+            A dict of operation to a dict of ``"<METHOD> <URL template>"``
+            to the number of calls
+        """
+        profile = {}
+        for call in list(self.calls):
+            endpoint = "%s %s" % (call["method"], call["template"])
+            counts = profile.setdefault(call["operation"], Counter())
+            counts[endpoint] += 1
+        return {op: dict(counts) for op, counts in profile.items()}
+
+    def serial_round_trips(self, operation_name=None):
+        """return the length of the longest chain of consecutive calls
+
+        Calls which overlap ran concurrently. The chain is the sequence of
+        calls which each started after the previous one finished, thus its
+        length is the number of round trips the operation had to wait for.
+
+        Args:
+            operation_name (str): Only count the calls of this operation
+        """
+        calls = sorted((call for call in list(self.calls)
+                        if operation_name in (None, call["operation"])),
+                       key=lambda call: call["start"])
+        # the ends of the running calls with the length of their chain
+        running = []
+        longest = 0
+        for call in calls:
+            while running and running[0][0] <= call["start"]:
+                longest = max(longest, heapq.heappop(running)[1])
+            heapq.heappush(running, (call["start"] + call["duration"],
+                                     longest + 1))
+        return max([longest] + [chain for _, chain in running])
+
+    def repeated_gets(self):
+        """return GET requests which are repeated inside one operation
+
+        Returns:
+            A list of dicts with the keys ``operation``, ``kind``, ``url``
+            and ``count``. The kind ``identical`` is used for the same URL
+            requested repeatedly, ``template`` for the same URL template
+            with different IDs, which is the typical N+1 pattern.
+        """
+        identical = Counter()
+        templates = Counter()
+        for call in list(self.calls):
+            if call["method"] != "GET":
+                continue
+            identical[(call["operation"], call["url"])] += 1
+            templates[(call["operation"], call["template"])] += 1
+
+        found = [{"operation": op, "kind": "identical", "url": url,
+                  "count": count}
+                 for (op, url), count in identical.items()
+                 if count >= self.repeat_threshold]
+        found += [{"operation": op, "kind": "template", "url": template,
+                   "count": count}
+                  for (op, template), count in templates.items()
+                  if count >= self.template_threshold and "{id}" in template]
+        return sorted(found, key=lambda item: item["count"], reverse=True)
+
+    def as_dict(self):
+        """return the raw calls, the summary and the repeated GET requests"""
+        return {"calls": list(self.calls),
+                "summary": self.summary(),
+                "repeated_gets": self.repeated_gets()}
+
+    def write_json(self, path):
+        """write :meth:`as_dict` to a JSON file"""
+        with open(path, "w") as fh:
+            json.dump(self.as_dict(), fh, indent=2)
+
+    def format_summary(self):
+        """return the summary as a text table"""
+        lines = ["%-14s %-6s %-52s %6s %6s %7s %9s %9s" % (
+            "service", "method", "endpoint", "calls", "errors", "retries",
+            "total[s]", "max[s]")]
+        for row in self.summary():
+            lines.append("%-14s %-6s %-52s %6d %6d %7d %9.3f %9.3f" % (
+                row["service"][:14], row["method"], row["template"][-52:],
+                row["calls"], row["errors"], row["retries"], row["total"],
+                row["max"]))
+        lines.append("%d API calls in %.3fs" % (
+            len(self.calls), sum(call["duration"] for call in self.calls)))
+        return "\n".join(lines)
+
+    def print_summary(self):
+        """print the summary table and warn about repeated GET requests"""
+        print(self.format_summary())
+        for item in self.repeated_gets():
+            if item["kind"] == "identical":
+                LOGGER.warn("%s: GET %s was sent %d times",
+                            item["operation"], item["url"], item["count"])
+            else:
+                LOGGER.warn("%s: GET %s was sent %d times, "
+                            "possibly one request per resource (N+1)",
+                            item["operation"], item["url"], item["count"])
+
+
+# The statistics of all calls of the koris process
+API_STATS = ApiStats()
@@ -0,0 +1,254 @@
+"""
+Persistent cache
+================
+
+Cache OpenStack resources which rarely change, e.g. flavors, images and
+external networks, on disk, so repeated koris calls don't look them up
+again.
+
+The entries are kept in one JSON file. They are stored per cloud and
+project and expire after a time to live which depends on the kind of the
+resource. Concurrent koris processes serialize their access with a lock
+file, and the cache file is replaced atomically. If the cache directory
+can't be written, every value is missing and nothing is stored.
+
+Example::
+
+    cache = get_cache()
+    info = cache.get_or_set("flavor", "ECS.C1.4-8",
+                            lambda: nova.flavors.find(name="ECS.C1.4-8").to_dict())
+
+The Keystone token can be cached as well, encrypted, see :class:`TokenCache`.
+"""
+import base64
+import fcntl
+import json
+import os
+import tempfile
+import time
+
+from koris.util.logger import Logger
+
+LOGGER = Logger(__name__)
+
+# the time to live of the cached resources in seconds
+TTLS = {
+    "flavor": 24 * 3600,
+    "image": 3600,
+    "external_network": 24 * 3600,
+    "version": 24 * 3600,
+}
+
+DEFAULT_TTL = 3600
+
+
+def cache_dir():
+    """return the directory of the koris cache
+
+    It is ``$KORIS_CACHE_DIR``, or ``koris`` in ``$XDG_CACHE_HOME``
+    (``~/.cache``).
+    """
+    if os.environ.get("KORIS_CACHE_DIR"):
+        return os.environ["KORIS_CACHE_DIR"]
+    base = os.environ.get("XDG_CACHE_HOME",
+                          os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(base, "koris")
+
+
+class DiskCache:
+    """A JSON file with cached values which expire
+
+    Args:
+        path (str): The path of the cache file
+        namespace (str): Separates the values of different clouds and
+            projects in the same file
+        ttls (dict): The time to live in seconds per kind of value
+    """
+
+    def __init__(self, path, namespace="", ttls=None):
+        self.path = path
+        self.namespace = namespace
+        self.ttls = dict(TTLS, **(ttls or {}))
+
+    def _lock(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        return open(self.path + ".lock", "a")
+
+    def _read(self):
+        try:
+            with open(self.path) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, data):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path))
+        with os.fdopen(fd, "w") as fh:
+            json.dump(data, fh)
+        os.replace(tmp, self.path)
+
+    def _key(self, kind, key):
+        return "%s|%s|%s" % (self.namespace, kind, key)
+
+    def get(self, kind, key):
+        """return a cached value, or None if it is missing or expired"""
+        try:
+            with self._lock() as lock:
+                fcntl.flock(lock, fcntl.LOCK_SH)
+                entry = self._read().get(self._key(kind, key))
+        except OSError as err:
+            LOGGER.debug("Could not read the cache %s: %s", self.path, err)
+            return None
+
+        if entry is None:
+            return None
+        if time.time() - entry["time"] > self.ttls.get(kind, DEFAULT_TTL):
+            return None
+        return entry["value"]
+
+    def set(self, kind, key, value):
+        """store a JSON serializable value"""
+        try:
+            with self._lock() as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                data = self._read()
+                now = time.time()
+                # drop expired entries, so the file does not grow forever
+                data = {k: entry for k, entry in data.items()
+                        if now - entry["time"] <= max(self.ttls.values())}
+                data[self._key(kind, key)] = {"time": now, "value": value}
+                self._write(data)
+        except OSError as err:
+            LOGGER.debug("Could not write the cache %s: %s", self.path, err)
+
+    def get_or_set(self, kind, key, func):
+        """return the cached value, or call func and cache its result
+
+        Results which are empty (e.g. None if nothing was found) are not
+        cached.
+        """
+        value = self.get(kind, key)
+        if value is not None:
+            LOGGER.debug("Using cached %s %s", kind, key)
+            return value
+
+        value = func()
+        if value:
+            self.set(kind, key, value)
+        return value
+
+    def invalidate(self, kind=None):
+        """remove all values of this namespace, or only those of one kind"""
+        prefix = "%s|" % self.namespace
+        if kind:
+            prefix += "%s|" % kind
+
+        try:
+            with self._lock() as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                data = self._read()
+                self._write({k: entry for k, entry in data.items()
+                             if not k.startswith(prefix)})
+        except OSError as err:
+            LOGGER.debug("Could not write the cache %s: %s", self.path, err)
+
+
+def get_cache(path=None):
+    """return the cache of the currently sourced cloud and project
+
+    Returns:
+        A :class:`DiskCache` or None if no OpenStack RC file is sourced.
+    """
+    auth_url = os.environ.get("OS_AUTH_URL")
+    project = next((os.environ[var] for var in (
+        "OS_PROJECT_ID", "OS_PROJECT_NAME", "OS_TENANT_NAME")
+        if os.environ.get(var)), None)
+    if not auth_url or not project:
+        return None
+
+    path = path or os.path.join(cache_dir(), "openstack.json")
+    namespace = "%s|%s" % (auth_url.rstrip("/"), project)
+    return DiskCache(path, namespace=namespace)
+
+
+class TokenCache:
+    """Keep the token of a keystoneauth plugin between koris calls
+
+    The state of the plugin (the token and its service catalog) is stored
+    encrypted with a key derived from the password, thus only someone who
+    knows the password can use the cached token. The plugin authenticates
+    again as soon as the token expires.
+
+    Example:
+        >>> auth = identity.Password(**variables)
+        >>> cache = TokenCache(auth, variables["password"])
+        >>> cache.load()
+        >>> sess = session.Session(auth=auth)
+        >>> ...
+        >>> cache.save()
+
+    Args:
+        auth: A keystoneauth identity plugin
+        secret (str): The password of the user
+        directory (str): Where the tokens are stored, defaults to
+            :func:`cache_dir`
+    """
+    # the number of PBKDF2 iterations, this makes guessing the password
+    # from the cache expensive
+    iterations = 100000
+
+    def __init__(self, auth, secret, directory=None):
+        # cryptography is only imported if tokens are cached
+        from cryptography.fernet import Fernet
+        from cryptography.hazmat.backends import default_backend
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
+        self.auth = auth
+        cache_id = auth.get_cache_id()
+        self.path = os.path.join(
+            directory or cache_dir(),
+            "token-%s" % base64.urlsafe_b64encode(
+                base64.b64decode(cache_id)).decode().rstrip("="))
+        kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32,
+                         salt=cache_id.encode(), iterations=self.iterations,
+                         backend=default_backend())
+        self.fernet = Fernet(base64.urlsafe_b64encode(
+            kdf.derive(secret.encode())))
+
+    def load(self):
+        """set the cached state on the plugin
+
+        Returns:
+            bool: True if a cached token was found.
+        """
+        from cryptography.fernet import InvalidToken
+
+        try:
+            with open(self.path, "rb") as fh:
+                state = self.fernet.decrypt(fh.read()).decode()
+        except (OSError, InvalidToken):
+            return False
+
+        self.auth.set_auth_state(state)
+        LOGGER.debug("Using cached token")
+        return True
+
+    def save(self):
+        """store the state of the plugin, if it is authenticated
+
+        This runs at the exit of koris, thus a failure is only logged.
+        """
+        try:
+            state = self.auth.get_auth_state()
+            if not state:
+                return
+
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path))
+            # mkstemp creates the file readable only by the user
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(self.fernet.encrypt(state.encode()))
+            os.replace(tmp, self.path)
+        except Exception as err:  # pylint: disable=broad-except
+            LOGGER.debug("Could not cache the token: %s", err)
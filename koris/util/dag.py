@@ -0,0 +1,252 @@
+"""
+Dependency graph of tasks
+=========================
+
+Run the steps of a build as a graph of tasks with declared dependencies.
+Each task starts as soon as all the tasks it requires are finished. Tasks
+receive the results of the tasks they require as keyword arguments.
+
+Coroutine functions run in the event loop, all other functions are blocking
+and run in a thread of their own. They don't take the workers of the thread
+pool of :func:`koris.util.util.run_blocking`, since they may wait a long time
+for the OpenStack calls which run there. Each task runs in a span of
+:mod:`koris.util.tracing`.
+
+Example::
+
+    graph = TaskGraph()
+    graph.add("network", create_network)
+    graph.add("ca", create_ca)
+    graph.add("masters", create_masters, requires=("network", "ca"))
+    results = graph.run()
+"""
+import asyncio
+import contextvars
+import time
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from koris.util.apistats import operation
+from koris.util.logger import Logger
+from koris.util.tracing import span
+
+LOGGER = Logger(__name__)
+
+
+class TaskGraphError(Exception):
+    """raised if the graph has unknown dependencies or cycles"""
+
+
+class Task:  # pylint: disable=too-few-public-methods
+    """A single step in a :class:`TaskGraph`
+
+    Args:
+        name (str): The name of the task, which is also the name of the
+            keyword argument of the tasks which require this one
+        func (callable): A function or a coroutine function
+        requires (tuple): The names of the tasks which have to finish before
+    """
+
+    def __init__(self, name, func, requires=()):
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        self.started = None
+        self.finished = None
+
+    @property
+    def duration(self):
+        """the time in seconds the task ran"""
+        if self.started is None or self.finished is None:
+            return None
+        return self.finished - self.started
+
+    def __repr__(self):
+        return "<Task %s requires=%s>" % (self.name, list(self.requires))
+
+
+class TaskGraph:
+    """Schedule tasks with dependencies concurrently"""
+
+    def __init__(self):
+        self.tasks = OrderedDict()
+        self.results = {}
+        self._executor = None
+
+    def add(self, name, func, requires=()):
+        """add a task to the graph
+
+        Args:
+            name (str): The name of the task
+            func (callable): A function or a coroutine function called with
+                the results of the required tasks as keyword arguments
+            requires (tuple): The names of the required tasks
+
+        Returns:
+            The :class:`Task`
+        """
+        if name in self.tasks:
+            raise TaskGraphError("Task %s was already added" % name)
+        task = Task(name, func, requires)
+        self.tasks[name] = task
+        return task
+
+    def task(self, name=None, requires=()):
+        """decorator to add a function as task to the graph"""
+        def decorator(func):
+            self.add(name or func.__name__, func, requires)
+            return func
+        return decorator
+
+    def order(self):
+        """return the tasks in an order which satisfies all dependencies
+
+        Raises:
+            TaskGraphError if a required task is unknown or if the
+            dependencies contain a cycle.
+        """
+        ordered = []
+        state = {}
+
+        def visit(task, path):
+            if state.get(task.name) == "done":
+                return
+            if state.get(task.name) == "visiting":
+                raise TaskGraphError("Cycle in tasks: %s" % " -> ".join(
+                    path + [task.name]))
+            state[task.name] = "visiting"
+            for name in task.requires:
+                if name not in self.tasks:
+                    raise TaskGraphError("Task %s requires unknown task %s" % (
+                        task.name, name))
+                visit(self.tasks[name], path + [task.name])
+            state[task.name] = "done"
+            ordered.append(task)
+
+        for task in self.tasks.values():
+            visit(task, [])
+
+        return ordered
+
+    def subgraph(self, *names):
+        """return a graph of the named tasks and the tasks they require
+
+        Example:
+            >>> graph.subgraph("masters").run()
+
+        Raises:
+            TaskGraphError if a task is unknown.
+        """
+        graph = TaskGraph()
+        pending = list(names)
+        needed = set()
+        while pending:
+            name = pending.pop()
+            if name not in self.tasks:
+                raise TaskGraphError("Unknown task %s" % name)
+            if name not in needed:
+                needed.add(name)
+                pending.extend(self.tasks[name].requires)
+
+        for task in self.tasks.values():
+            if task.name in needed:
+                graph.add(task.name, task.func, task.requires)
+        return graph
+
+    async def _run_task(self, task, futures):
+        if task.requires:
+            await asyncio.gather(*[futures[name] for name in task.requires])
+        kwargs = {name: self.results[name] for name in task.requires}
+
+        LOGGER.debug("Starting task %s ...", task.name)
+        task.started = time.monotonic()
+        requires = ",".join(task.requires)
+        with operation(task.name), span(task.name, requires=requires):
+            if asyncio.iscoroutinefunction(task.func):
+                result = await task.func(**kwargs)
+            else:
+                context = contextvars.copy_context()
+                result = await asyncio.get_event_loop().run_in_executor(
+                    self._executor, partial(context.run, task.func, **kwargs))
+        task.finished = time.monotonic()
+        LOGGER.debug("Finished task %s in %.2fs", task.name, task.duration)
+
+        self.results[task.name] = result
+        return result
+
+    async def execute(self):
+        """run all tasks in the current event loop
+
+        If a task fails, all tasks which did not finish yet are cancelled
+        and the exception is raised.
+
+        Returns:
+            A dictionary with the results of all tasks
+        """
+        order = self.order()
+        blocking = [task for task in order
+                    if not asyncio.iscoroutinefunction(task.func)]
+        # one thread per blocking task, thus they never wait for each other
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(len(blocking), 1), thread_name_prefix="koris-task")
+        futures = {}
+        for task in order:
+            futures[task.name] = asyncio.ensure_future(
+                self._run_task(task, futures))
+
+        try:
+            await asyncio.gather(*futures.values())
+        except BaseException:
+            for future in futures.values():
+                future.cancel()
+            await asyncio.gather(*futures.values(), return_exceptions=True)
+            raise
+        finally:
+            self._executor.shutdown(wait=False)
+
+        return self.results
+
+    def run(self, loop=None):
+        """run all tasks until they are complete
+
+        Args:
+            loop: The event loop, defaults to the current event loop
+
+        Returns:
+            A dictionary with the results of all tasks
+        """
+        loop = loop or asyncio.get_event_loop()
+        return loop.run_until_complete(self.execute())
+
+    def critical_path(self):
+        """return the chain of tasks which determined the total run time
+
+        Starting from the task which finished last, the path follows the
+        required task which finished last, until a task without requirements
+        is reached.
+
+        Returns:
+            A list of :class:`Task` in the order they ran
+        """
+        done = [task for task in self.tasks.values()
+                if task.finished is not None]
+        if not done:
+            return []
+
+        path = [max(done, key=lambda task: task.finished)]
+        while path[-1].requires:
+            path.append(max((self.tasks[name] for name in path[-1].requires),
+                            key=lambda task: task.finished))
+        return list(reversed(path))
+
+    def report(self):
+        """log the critical path and the duration of its tasks"""
+        path = self.critical_path()
+        if not path:
+            return
+        LOGGER.info("Critical path (%.2fs): %s",
+                    path[-1].finished - path[0].started,
+                    " -> ".join("%s (%.2fs)" % (task.name, task.duration)
+                                for task in path))
@@ -0,0 +1,653 @@
+"""
+Performance history
+===================
+
+Keep a compact record of every koris operation in a local SQLite database,
+and report how the durations develop across runs.
+
+A record holds the duration of the operation and of its phases, the boot
+time of every instance, the latency, errors and retries of the OpenStack
+API calls per endpoint, the size of the cluster, the flavors, the
+availability zones and the Kubernetes version. It is made of the spans of
+:mod:`koris.util.tracing` and the calls of :mod:`koris.util.apistats`: a
+root span named like one of ``OPERATIONS`` is a run, its children are the
+phases and its spans named ``instance`` are the boot times.
+
+koris records apply, add, delete and destroy unless it is called with
+``--no-perf-store``. Tracing and the API statistics are enabled for these
+commands only, so ``--no-perf-store`` turns them off as well.
+The database is ``$KORIS_PERF_DB``, or ``koris/perf.sqlite`` in
+``$XDG_DATA_HOME`` (``~/.local/share``).
+
+The report of ``koris perf report`` groups the boot times by availability
+zone and flavor and the API latencies by service, which depend on the
+cloud, and the API calls per run, which depend on koris. An operation which
+got slower while the boot times and latencies did not, was slowed down by
+koris.
+
+Example::
+
+    store = PerfStore(store_path())
+    store.record(TRACER.spans, API_STATS.calls)
+    print(store.format_report(operation="apply"))
+"""
+import atexit
+import os
+import sqlite3
+import time
+
+from collections import OrderedDict, defaultdict
+
+from koris.util.apistats import API_STATS
+from koris.util.logger import Logger
+from koris.util.tracing import TRACER
+
+LOGGER = Logger(__name__)
+
+# the root spans which are recorded as runs
+OPERATIONS = ("apply", "add_node", "add_master", "delete_node", "destroy")
+
+# the number of runs which are kept in the database
+KEEP_RUNS = 2000
+
+# compare the last run with the median of this many runs before it
+WINDOW = 10
+
+# report a regression if the last run is this much slower than the median
+THRESHOLD = 0.25
+
+# the number of earlier runs needed to report a regression
+MIN_RUNS = 3
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    operation TEXT NOT NULL,
+    cluster TEXT,
+    masters INTEGER,
+    nodes INTEGER,
+    amount INTEGER,
+    master_flavor TEXT,
+    node_flavor TEXT,
+    zones TEXT,
+    k8s_version TEXT,
+    koris_version TEXT,
+    duration REAL NOT NULL,
+    error TEXT,
+    api_calls INTEGER NOT NULL,
+    api_errors INTEGER NOT NULL,
+    api_retries INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_operation ON runs (operation, started);
+CREATE TABLE IF NOT EXISTS phases (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    duration REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS phases_run ON phases (run_id);
+CREATE TABLE IF NOT EXISTS instances (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    host TEXT,
+    role TEXT,
+    zone TEXT,
+    flavor TEXT,
+    boot_time REAL NOT NULL,
+    ok INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS instances_run ON instances (run_id);
+CREATE TABLE IF NOT EXISTS api (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    service TEXT NOT NULL,
+    method TEXT NOT NULL,
+    template TEXT NOT NULL,
+    calls INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    retries INTEGER NOT NULL,
+    total REAL NOT NULL,
+    p50 REAL NOT NULL,
+    p95 REAL NOT NULL,
+    max REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS api_run ON api (run_id);
+"""
+
+SPARKS = "▁▂▃▄▅▆▇█"
+
+
+def store_path():
+    """return the path of the performance database
+
+    It is ``$KORIS_PERF_DB``, or ``koris/perf.sqlite`` in
+    ``$XDG_DATA_HOME`` (``~/.local/share``).
+    """
+    if os.environ.get("KORIS_PERF_DB"):
+        return os.environ["KORIS_PERF_DB"]
+    base = os.environ.get("XDG_DATA_HOME",
+                          os.path.join(os.path.expanduser("~"), ".local",
+                                       "share"))
+    return os.path.join(base, "koris", "perf.sqlite")
+
+
+def percentile(values, pct):
+    """return the pct-th percentile of values, interpolated linearly
+
+    Returns:
+        The percentile, or None if there are no values
+    """
+    values = sorted(values)
+    if not values:
+        return None
+    rank = (len(values) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def compare(values, window=WINDOW, threshold=THRESHOLD, min_runs=MIN_RUNS):
+    """compare the last value of a series with the values before it
+
+    Args:
+        values (list): The values of the runs, the oldest first
+        window (int): The number of values before the last one to compare
+            with
+        threshold (float): The relative change which is a regression
+        min_runs (int): The number of values before the last one needed to
+            report a regression
+
+    Returns:
+        A tuple of the median of the values before the last one, the change
+        of the last value relative to it, e.g. ``0.3`` for 30% more, and
+        whether the change is a regression. The median and the change are
+        None if there is only one value.
+    """
+    before = values[-window - 1:-1]
+    baseline = percentile(before, 50)
+    if not baseline:
+        return baseline, None, False
+    change = values[-1] / baseline - 1
+    return baseline, change, len(before) >= min_runs and change > threshold
+
+
+def sparkline(values):
+    """return the values as a line of bars, the oldest first"""
+    if not values:
+        return ""
+    low, high = min(values), max(values)
+    if high == low:
+        return SPARKS[0] * len(values)
+    return "".join(SPARKS[int((val - low) / (high - low) * (len(SPARKS) - 1))]
+                   for val in values)
+
+
+def _descendants(item, children):
+    stack = list(children.get(item.span_id, []))
+    while stack:
+        child = stack.pop()
+        yield child
+        stack.extend(children.get(child.span_id, []))
+
+
+def _failed(call):
+    return not isinstance(call["status"], int) or call["status"] >= 400
+
+
+def _api_rows(calls):
+    rows = OrderedDict()
+    for call in calls:
+        key = (call["service"], call["method"], call["template"])
+        rows.setdefault(key, []).append(call)
+
+    for (service, method, template), selected in rows.items():
+        durations = [call["duration"] for call in selected]
+        yield {"service": service, "method": method, "template": template,
+               "calls": len(selected),
+               "errors": sum(1 for call in selected if _failed(call)),
+               "retries": sum(call["retries"] for call in selected),
+               "total": sum(durations),
+               "p50": percentile(durations, 50),
+               "p95": percentile(durations, 95),
+               "max": max(durations)}
+
+
+def extract_runs(spans, calls=(), koris_version=None):
+    """return the records of the operations traced in spans
+
+    Each finished root span named like one of ``OPERATIONS`` is a run. The
+    API calls are assigned to the last run which started before them, or
+    to the first run, thus the lookups of a command before its operation
+    started are part of the run.
+
+    Args:
+        spans (list): The :class:`koris.util.tracing.Span` of the process
+        calls (list): The calls of :class:`koris.util.apistats.ApiStats`
+        koris_version (str): The version of koris
+
+    Returns:
+        A list of dicts with the keys of the table ``runs`` and the lists
+        ``phases``, ``instances`` and ``api``, the oldest run first
+    """
+    children = defaultdict(list)
+    for item in spans:
+        children[item.parent_id].append(item)
+
+    roots = sorted((item for item in children.get(None, [])
+                    if item.name in OPERATIONS and item.end is not None),
+                   key=lambda item: item.start)
+    if not roots:
+        return []
+
+    # the calls are timed with time.monotonic, the spans with time.time
+    offset = time.time() - time.monotonic()
+    assigned = defaultdict(list)
+    for call in calls:
+        started = call["start"] + offset
+        index = max([idx for idx, root in enumerate(roots)
+                     if root.start <= started] or [0])
+        assigned[index].append(call)
+
+    runs = []
+    for index, root in enumerate(roots):
+        attrs = root.attributes
+        role = attrs.get("role")
+        flavors = {"master": attrs.get("master_flavor"),
+                   "node": attrs.get("node_flavor")}
+        if role in flavors and attrs.get("flavor"):
+            flavors[role] = attrs["flavor"]
+
+        instances = [{"host": item.attributes.get("host"),
+                      "role": item.attributes.get("role"),
+                      "zone": item.attributes.get("zone"),
+                      "flavor": flavors.get(item.attributes.get("role")),
+                      "boot_time": item.duration,
+                      "ok": item.error is None}
+                     for item in _descendants(root, children)
+                     if item.name == "instance" and item.end is not None]
+
+        selected = assigned[index]
+        runs.append({
+            "started": root.start,
+            "operation": root.name,
+            "cluster": attrs.get("cluster"),
+            "masters": attrs.get("masters"),
+            "nodes": attrs.get("nodes"),
+            "amount": attrs.get("amount"),
+            "master_flavor": flavors["master"],
+            "node_flavor": flavors["node"],
+            "zones": attrs.get("zones") or attrs.get("zone"),
+            "k8s_version": attrs.get("k8s_version"),
+            "koris_version": koris_version,
+            "duration": root.duration,
+            "error": root.error,
+            "api_calls": len(selected),
+            "api_errors": sum(1 for call in selected if _failed(call)),
+            "api_retries": sum(call["retries"] for call in selected),
+            "phases": [{"name": item.name, "duration": item.duration}
+                       for item in sorted(children.get(root.span_id, []),
+                                          key=lambda item: item.start)
+                       if item.end is not None],
+            "instances": instances,
+            "api": list(_api_rows(selected)),
+        })
+    return runs
+
+
+def _size(run):
+    """return the size of the cluster of a run, e.g. ``3+10`` or ``+2``"""
+    size = ""
+    if run["masters"] is not None or run["nodes"] is not None:
+        size = "%s+%s" % (run["masters"] or 0, run["nodes"] or 0)
+    if run["amount"] is not None:
+        size = ("%s " % size if size else "") + "+%d" % run["amount"]
+    return size or "-"
+
+
+class PerfStore:
+    """The SQLite database of the performance records
+
+    Args:
+        path (str): The database file, it is created if it does not exist
+        keep (int): The number of runs to keep, older runs are deleted
+    """
+
+    RUN_COLUMNS = ("started", "operation", "cluster", "masters", "nodes",
+                   "amount", "master_flavor", "node_flavor", "zones",
+                   "k8s_version", "koris_version", "duration", "error",
+                   "api_calls", "api_errors", "api_retries")
+
+    def __init__(self, path, keep=KEEP_RUNS):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.keep = keep
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(SCHEMA)
+        self.conn.execute("PRAGMA user_version = %d" % SCHEMA_VERSION)
+
+    def close(self):
+        """close the database"""
+        self.conn.close()
+
+    def add_run(self, run):
+        """insert a record of :func:`extract_runs`
+
+        Returns:
+            The ID of the run
+        """
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO runs (%s) VALUES (%s)" % (
+                    ", ".join(self.RUN_COLUMNS),
+                    ", ".join("?" * len(self.RUN_COLUMNS))),
+                [run[key] for key in self.RUN_COLUMNS])
+            run_id = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT INTO phases VALUES (?, ?, ?)",
+                [(run_id, item["name"], item["duration"])
+                 for item in run["phases"]])
+            self.conn.executemany(
+                "INSERT INTO instances VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, item["host"], item["role"], item["zone"],
+                  item["flavor"], item["boot_time"], item["ok"])
+                 for item in run["instances"]])
+            self.conn.executemany(
+                "INSERT INTO api VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, item["service"], item["method"], item["template"],
+                  item["calls"], item["errors"], item["retries"],
+                  item["total"], item["p50"], item["p95"], item["max"])
+                 for item in run["api"]])
+            self.conn.execute(
+                "DELETE FROM runs WHERE id NOT IN "
+                "(SELECT id FROM runs ORDER BY started DESC LIMIT ?)",
+                (self.keep,))
+        return run_id
+
+    def record(self, spans, calls=(), koris_version=None):
+        """add the operations traced in spans
+
+        See :func:`extract_runs` for the arguments.
+
+        Returns:
+            The IDs of the new runs
+        """
+        return [self.add_run(run)
+                for run in extract_runs(spans, calls, koris_version)]
+
+    def runs(self, operation=None, cluster=None, last=None):
+        """return the runs, the oldest first
+
+        Args:
+            operation (str): Only return runs of this operation
+            cluster (str): Only return runs of this cluster
+            last (int): Only return this many of the latest runs
+
+        Returns:
+            A list of dicts with the columns of the table ``runs``
+        """
+        where, params = [], []
+        for column, value in (("operation", operation), ("cluster", cluster)):
+            if value:
+                where.append("%s = ?" % column)
+                params.append(value)
+        query = "SELECT * FROM runs"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY started DESC"
+        if last:
+            query += " LIMIT %d" % int(last)
+        return [dict(row) for row in
+                reversed(self.conn.execute(query, params).fetchall())]
+
+    def _rows(self, table, run_ids):
+        rows = defaultdict(list)
+        ids = list(run_ids)
+        # stay below the limit of SQLite for the number of parameters
+        for idx in range(0, len(ids), 500):
+            chunk = ids[idx:idx + 500]
+            for row in self.conn.execute(
+                    "SELECT * FROM %s WHERE run_id IN (%s)" % (
+                        table, ", ".join("?" * len(chunk))), chunk):
+                rows[row["run_id"]].append(dict(row))
+        return rows
+
+    def report(self, operation=None, cluster=None, last=100, window=WINDOW,
+               threshold=THRESHOLD):
+        """return the statistics of the latest runs
+
+        The durations of the operations are grouped by the operation and
+        the size of the cluster, the phases by the operation, the boot times
+        by the availability zone, the flavor and the role, and the API
+        calls by the service. Failed runs and instances are left out of the
+        durations.
+
+        Each group is a series of one value per run. The last value is
+        compared with the median of the ``window`` values before it, see
+        :func:`compare`.
+
+        Args:
+            operation (str): Only report runs of this operation
+            cluster (str): Only report runs of this cluster
+            last (int): The number of the latest runs to report
+            window (int): The number of runs the last run is compared with
+            threshold (float): The relative change which is a regression
+
+        Returns:
+            A dict with the lists ``operations``, ``phases``, ``boot_times``,
+            ``api`` and ``regressions`` and the number of ``runs``
+        """
+        runs = self.runs(operation, cluster, last)
+        ok_runs = [run for run in runs if run["error"] is None]
+        phases = self._rows("phases", [run["id"] for run in ok_runs])
+        instances = self._rows("instances", [run["id"] for run in runs])
+        api = self._rows("api", [run["id"] for run in runs])
+
+        def stats(kind, source, key, values, series):
+            baseline, change, regression = compare(series, window, threshold)
+            return OrderedDict([
+                ("kind", kind), ("source", source), ("key", key),
+                ("count", len(values)),
+                ("p50", percentile(values, 50)),
+                ("p90", percentile(values, 90)),
+                ("max", max(values)), ("last", series[-1]),
+                ("baseline", baseline), ("change", change),
+                ("regression", regression), ("series", series)])
+
+        def per_run(groups, kind, source, reduce=max):
+            # groups: key -> run ID -> values
+            for key, values in groups.items():
+                series = [reduce(values[run["id"]]) for run in runs
+                          if values.get(run["id"])]
+                yield stats(kind, source, key,
+                            [val for vals in values.values() for val in vals],
+                            series)
+
+        durations = defaultdict(dict)
+        phase_times = defaultdict(dict)
+        for run in ok_runs:
+            durations[(run["operation"], _size(run))][run["id"]] = \
+                [run["duration"]]
+            for item in phases[run["id"]]:
+                phase_times[(run["operation"], item["name"])].setdefault(
+                    run["id"], []).append(item["duration"])
+
+        boot_times = defaultdict(dict)
+        for run in runs:
+            for item in instances[run["id"]]:
+                if item["ok"]:
+                    boot_times[(item["zone"], item["flavor"],
+                                item["role"])].setdefault(
+                                    run["id"], []).append(item["boot_time"])
+
+        api_calls = defaultdict(dict)
+        api_latency = defaultdict(dict)
+        retries = defaultdict(int)
+        errors = defaultdict(int)
+        for run in runs:
+            by_service = defaultdict(list)
+            for item in api[run["id"]]:
+                by_service[item["service"]].append(item)
+            for service, items in by_service.items():
+                calls = sum(item["calls"] for item in items)
+                api_calls[(service,)][run["id"]] = [calls]
+                api_latency[(service,)][run["id"]] = [
+                    sum(item["total"] for item in items) / calls]
+                retries[service] += sum(item["retries"] for item in items)
+                errors[service] += sum(item["errors"] for item in items)
+
+        def median(values):
+            return percentile(values, 50)
+
+        report = OrderedDict([
+            ("runs", len(runs)),
+            ("operations", list(per_run(durations, "operation", None))),
+            ("phases", list(per_run(phase_times, "phase", None))),
+            ("boot_times", list(per_run(boot_times, "boot_time", "cloud",
+                                        median))),
+            ("api", []),
+        ])
+        for calls, latency in zip(per_run(api_calls, "api_calls", "koris"),
+                                  per_run(api_latency, "api_latency",
+                                          "cloud")):
+            service = calls["key"][0]
+            report["api"].append(OrderedDict([
+                ("service", service), ("calls", calls),
+                ("latency", latency), ("retries", retries[service]),
+                ("errors", errors[service])]))
+
+        compared = report["operations"] + report["phases"]
+        compared += report["boot_times"]
+        compared += [row[key] for row in report["api"]
+                     for key in ("calls", "latency")]
+        report["regressions"] = [item for item in compared
+                                 if item["regression"]]
+        return report
+
+    def format_runs(self, operation=None, cluster=None, last=20):
+        """return the latest runs as a text table"""
+        lines = ["%-19s %-12s %-20s %-9s %-12s %-8s %9s %6s  %s" % (
+            "started", "operation", "cluster", "size", "node flavor", "k8s",
+            "time[s]", "calls", "error")]
+        for run in self.runs(operation, cluster, last):
+            line = "%-19s %-12s %-20s %-9s %-12s %-8s %9.1f %6d  %s" % (
+                time.strftime("%Y-%m-%d %H:%M:%S",
+                              time.localtime(run["started"])),
+                run["operation"], (run["cluster"] or "-")[:20],
+                _size(run), (run["node_flavor"] or "-")[:12],
+                run["k8s_version"] or "-", run["duration"],
+                run["api_calls"], run["error"] or "")
+            lines.append(line.rstrip())
+        return "\n".join(lines)
+
+    def format_report(self, operation=None, cluster=None, last=100,
+                      window=WINDOW, threshold=THRESHOLD):
+        """return :meth:`report` as text tables"""
+        report = self.report(operation, cluster, last, window, threshold)
+        if not report["runs"]:
+            return "No runs recorded in %s" % self.path
+
+        def change(item):
+            if item["change"] is None:
+                return "%8s" % "-"
+            return "%+7.0f%%" % (item["change"] * 100)
+
+        def row(label, item, scale=1):
+            return "%-42s %5d %9.2f %9.2f %9.2f %9.2f %s %s%s" % (
+                label[:42], item["count"], item["p50"] * scale,
+                item["p90"] * scale, item["max"] * scale,
+                item["last"] * scale, change(item),
+                sparkline(item["series"][-window * 2:]),
+                " !" if item["regression"] else "")
+
+        def header(title, unit="s"):
+            return "\n%-42s %5s %9s %9s %9s %9s %8s %s" % (
+                title, "count", "p50[%s]" % unit, "p90[%s]" % unit,
+                "max[%s]" % unit, "last[%s]" % unit, "change", "trend")
+
+        lines = ["%d runs in %s, the change is the last run compared with "
+                 "the median of the %d runs before it" % (
+                     report["runs"], self.path, window)]
+
+        lines.append(header("operation / cluster size"))
+        lines.extend(row("%s / %s" % item["key"], item)
+                     for item in report["operations"])
+
+        lines.append(header("operation / phase"))
+        lines.extend(row("%s / %s" % item["key"], item)
+                     for item in sorted(report["phases"],
+                                        key=lambda item: item["key"]))
+
+        lines.append(header("boot time: zone / flavor / role"))
+        lines.extend(row(" / ".join(str(part) for part in item["key"]), item)
+                     for item in sorted(report["boot_times"],
+                                        key=lambda item: str(item["key"])))
+
+        lines.append(header("API calls per run: service", unit="#"))
+        lines.extend(row(item["service"], item["calls"])
+                     for item in report["api"])
+        lines.append(header("API latency: service", unit="ms"))
+        lines.extend(row(item["service"], item["latency"], scale=1000)
+                     for item in report["api"])
+        lines.append("\n%-42s %7s %7s" % ("API service", "retries",
+                                          "errors"))
+        lines.extend("%-42s %7d %7d" % (item["service"], item["retries"],
+                                        item["errors"])
+                     for item in report["api"])
+
+        if report["regressions"]:
+            lines.append("\nRegressions:")
+        for item in report["regressions"]:
+            lines.append("  [%s] %s %s: %.3g, %+.0f%% over the median %.3g" % (
+                item["source"] or "koris or cloud",
+                item["kind"].replace("_", " "),
+                " / ".join(str(part) for part in item["key"]),
+                item["last"], item["change"] * 100, item["baseline"]))
+        return "\n".join(lines)
+
+
+class PerfRecorder:
+    """Records the operation of the koris process in the store on exit"""
+
+    def __init__(self):
+        self.enabled = False
+        self.koris_version = None
+        self._registered = False
+
+    def start(self, koris_version=None):
+        """enable tracing and the API statistics, and record on exit"""
+        TRACER.enable()
+        API_STATS.enable()
+        self.enabled = True
+        self.koris_version = koris_version
+        if not self._registered:
+            atexit.register(self.record)
+            self._registered = True
+
+    def stop(self):
+        """don't record the operation"""
+        self.enabled = False
+
+    def record(self):
+        """add the operations of the process to the store
+
+        Errors are logged, the store must never fail an operation.
+        """
+        if not self.enabled:
+            return
+        try:
+            store = PerfStore(store_path())
+            try:
+                store.record(TRACER.spans, API_STATS.calls, self.koris_version)
+            finally:
+                store.close()
+        except (OSError, sqlite3.Error) as err:
+            LOGGER.debug("Could not record the performance of the "
+                         "operation: %s", err)
+
+
+# The recorder of the koris process
+PERF_RECORDER = PerfRecorder()
@@ -0,0 +1,264 @@
+"""
+Tracing
+=======
+
+Record how long the phases of a koris operation take, and which of them
+run concurrently, as nested spans.
+
+A span is opened with :func:`span` or :func:`traced`. The current span is
+kept in a context variable, thus coroutines started inside a span and
+functions passed to :func:`koris.util.util.run_blocking` open their spans
+as its children. Every task of a :class:`koris.util.dag.TaskGraph` is a
+span.
+
+The spans are only kept while the tracer is enabled, e.g. with
+``koris --trace apply.json apply ...``. They are exported as Chrome trace
+JSON, which is shown by ``chrome://tracing`` and https://ui.perfetto.dev,
+or as OTLP JSON, which OpenTelemetry collectors and Jaeger import.
+
+Example::
+
+    TRACER.enable()
+    with span("apply", cluster="koris"):
+        with span("network"):
+            ...
+    TRACER.write_chrome_trace("apply.json")
+"""
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+# the innermost open span
+CURRENT_SPAN = contextvars.ContextVar("koris_span", default=None)
+
+
+class Span:
+    """A timed step of an operation
+
+    Args:
+        name (str): The name of the step
+        trace_id (str): The ID of the trace of the span
+        parent (Span): The enclosing span, or None for a root span
+        attributes (dict): Describe the step, e.g. the host name
+    """
+
+    def __init__(self, name, trace_id, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.start = time.time()
+        self.end = None
+        self.error = None
+
+    def set(self, **attributes):
+        """add attributes to the span"""
+        self.attributes.update(attributes)
+
+    @property
+    def duration(self):
+        """the time in seconds the span was open"""
+        if self.end is None:
+            return None
+        return self.end - self.start
+
+    def __repr__(self):
+        return "<Span %s %s>" % (self.name, self.attributes)
+
+
+class Tracer:
+    """Collects the spans of the koris process"""
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_id = uuid.uuid4().hex
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def enable(self):
+        """start keeping spans"""
+        self.enabled = True
+
+    def reset(self):
+        """forget all finished spans"""
+        with self._lock:
+            self.spans = []
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """open a span for the block
+
+        Exceptions raised inside the block are recorded in the span.
+
+        Yields:
+            The :class:`Span`
+        """
+        current = Span(name, self.trace_id, CURRENT_SPAN.get(), attributes)
+        token = CURRENT_SPAN.set(current)
+        try:
+            yield current
+        except BaseException as err:
+            current.error = "%s: %s" % (type(err).__name__, err)
+            raise
+        finally:
+            current.end = time.time()
+            CURRENT_SPAN.reset(token)
+            if self.enabled:
+                with self._lock:
+                    self.spans.append(current)
+
+    def traced(self, name=None, **attributes):
+        """decorate a function or coroutine function to run in a span
+
+        Args:
+            name (str): The name of the span, defaults to the function name
+            attributes: The attributes of the span
+        """
+        def decorator(func):
+            span_name = name or func.__name__
+
+            if asyncio.iscoroutinefunction(func):
+                @wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(span_name, **attributes):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name, **attributes):
+                    return func(*args, **kwargs)
+            return wrapper
+
+        return decorator
+
+    def _lanes(self):
+        """assign every span to a row of the timeline
+
+        A span is shown in the row of its parent, unless a sibling which
+        overlaps it is already shown there. Thus the spans of one row nest
+        properly, as the Chrome trace format requires, and concurrent
+        steps are shown next to each other.
+
+        Returns:
+            A dict of span ID to row number
+        """
+        children = defaultdict(list)
+        for item in sorted(self.spans, key=lambda item: item.start):
+            children[item.parent_id].append(item)
+
+        known = {item.span_id for item in self.spans}
+        # spans whose parent is still open are shown as roots
+        roots = [item for parent_id, items in children.items()
+                 if parent_id is None or parent_id not in known
+                 for item in items]
+
+        lanes = {}
+        next_lane = [0]
+
+        def place(items, own_lane):
+            # the end of the last span in each row available to the items
+            rows = [] if own_lane is None else [[own_lane, float("-inf")]]
+            for item in sorted(items, key=lambda item: item.start):
+                row = next((row for row in rows if row[1] <= item.start), None)
+                if row is None:
+                    next_lane[0] += 1
+                    row = [next_lane[0], float("-inf")]
+                    rows.append(row)
+                row[1] = item.end
+                lanes[item.span_id] = row[0]
+                place(children.get(item.span_id, []), row[0])
+
+        place(roots, None)
+        return lanes
+
+    def chrome_trace(self):
+        """return the spans in the Chrome trace event format"""
+        if not self.spans:
+            return {"traceEvents": [], "displayTimeUnit": "ms"}
+
+        origin = min(item.start for item in self.spans)
+        lanes = self._lanes()
+        pid = os.getpid()
+        events = []
+        named = set()
+        for item in sorted(self.spans, key=lambda item: item.start):
+            lane = lanes[item.span_id]
+            if lane not in named:
+                named.add(lane)
+                events.append({"name": "thread_name", "ph": "M", "pid": pid,
+                               "tid": lane, "args": {"name": item.name}})
+            args = dict(item.attributes)
+            if item.error:
+                args["error"] = item.error
+            events.append({"name": item.name, "cat": "koris", "ph": "X",
+                           "ts": (item.start - origin) * 1e6,
+                           "dur": item.duration * 1e6,
+                           "pid": pid, "tid": lane, "args": args})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def otlp(self, service_name="koris"):
+        """return the spans in the OTLP JSON format"""
+        def value(val):
+            if isinstance(val, bool):
+                return {"boolValue": val}
+            if isinstance(val, int):
+                return {"intValue": str(val)}
+            if isinstance(val, float):
+                return {"doubleValue": val}
+            return {"stringValue": str(val)}
+
+        def attributes(attrs):
+            return [{"key": key, "value": value(val)}
+                    for key, val in sorted(attrs.items())]
+
+        spans = []
+        for item in self.spans:
+            status = {"code": 1}
+            if item.error:
+                status = {"code": 2, "message": item.error}
+            otlp_span = {
+                "traceId": item.trace_id,
+                "spanId": item.span_id,
+                "name": item.name,
+                "kind": 1,
+                "startTimeUnixNano": str(int(item.start * 1e9)),
+                "endTimeUnixNano": str(int(item.end * 1e9)),
+                "attributes": attributes(item.attributes),
+                "status": status,
+            }
+            if item.parent_id:
+                otlp_span["parentSpanId"] = item.parent_id
+            spans.append(otlp_span)
+
+        return {"resourceSpans": [{
+            "resource": {"attributes": attributes(
+                {"service.name": service_name})},
+            "scopeSpans": [{"scope": {"name": "koris"}, "spans": spans}],
+        }]}
+
+    def write_chrome_trace(self, path):
+        """write :meth:`chrome_trace` to a JSON file"""
+        with open(path, "w") as fh:
+            json.dump(self.chrome_trace(), fh)
+
+    def write_otlp(self, path):
+        """write :meth:`otlp` to a JSON file"""
+        with open(path, "w") as fh:
+            json.dump(self.otlp(), fh)
+
+
+# The tracer of the koris process
+TRACER = Tracer()
+
+span = TRACER.span  # pylint: disable=invalid-name
+traced = TRACER.traced  # pylint: disable=invalid-name
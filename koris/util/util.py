@@ -1,26 +1,41 @@
 """
 General purpose utilities
 """
+import asyncio
 import base64
+import contextvars
 import copy
 import logging
+import os
+import random
 import re
+import threading
 import time
 import sys
 
-
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
+from functools import partial
 from functools import wraps
 from html.parser import HTMLParser
-from pkg_resources import parse_version
+from urllib.error import URLError, HTTPError
+from urllib.request import urlopen
 
 import yaml
 
+from koris.util.cache import DiskCache, cache_dir
 from koris.util.hue import red  # pylint: disable=no-name-in-module
 from koris.util.logger import Logger
 
 LOGGER = Logger(__name__)
 
+# The upper bound of blocking calls (e.g. to the OpenStack APIs) which may
+# run at the same time. Can be overridden with KORIS_MAX_CONCURRENCY or
+# ``max_concurrency`` in the koris config, see :func:`set_concurrency`.
+MAX_CONCURRENCY = int(os.environ.get("KORIS_MAX_CONCURRENCY", 20))
+
+_EXECUTOR = None
+
 
 def get_logger(name, level=logging.INFO):
     """
@@ -139,40 +154,297 @@ def host_names(role, num, cluster_name):
             range(1, num + 1)]
 
 
-def retry(exceptions, tries=4, delay=3, backoff=2, logger=None):
+def host_name_regex(cluster_name, role=None):
+    """
+    return a regular expression which matches the host names of a cluster
+    (see :func:`host_names`), but not those of a cluster whose name only
+    contains cluster_name.
+
+    The expression is also understood by the name filter of nova.
+    """
+    name_validation(cluster_name)
+    return "^%s-(%s)-[0-9]+$" % (cluster_name, role or "master|node")
+
+
+class RetryBudget:
+    """A number of retries shared by many functions decorated with
+    :func:`retry`.
+
+    Once the budget is spent, failing calls are not retried anymore, thus
+    a broken cloud fails fast instead of every call waiting for all its
+    tries.
+
+    Args:
+        retries (int): The number of retries all functions may do together.
+    """
+
+    def __init__(self, retries):
+        self.retries = retries
+        self._lock = threading.Lock()
+
+    def spend(self):
+        """Take one retry from the budget.
+
+        Returns:
+            bool: False if the budget is exhausted.
+        """
+        with self._lock:
+            if self.retries <= 0:
+                return False
+            self.retries -= 1
+            return True
+
+
+class RetryStats:
+    """Count the retries and failures of functions decorated with
+    :func:`retry`.
+    """
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, retried=False, failed=False):
+        """Record a retry or a final failure of a function"""
+        with self._lock:
+            stats = self._stats.setdefault(name, {'retries': 0, 'failures': 0})
+            stats['retries'] += int(retried)
+            stats['failures'] += int(failed)
+
+    def as_dict(self):
+        """Return a copy of all recorded counts"""
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+    def reset(self):
+        """Forget all recorded counts"""
+        with self._lock:
+            self._stats.clear()
+
+    def log(self, logger):
+        """Log the functions which had to be retried"""
+        for name, stats in sorted(self.as_dict().items()):
+            logger("%s: %d retries, %d failures", name, stats['retries'],
+                   stats['failures'])
+
+
+# counts the retries of all functions decorated with retry
+RETRY_STATS = RetryStats()
+
+
+def _retry_delays(tries, delay, backoff, jitter=0, max_delay=None,
+                  deadline=None, budget=None, start=None):
+    """Yield the delays before each retry.
+
+    The generator stops if no further try is allowed, because all tries are
+    done, the deadline would be exceeded or the budget is spent. The
+    deadline counts from ``start``, the :func:`time.monotonic` time of the
+    first try, which defaults to the first retry.
+    """
+    if start is None:
+        start = time.monotonic()
+    for _ in range(tries - 1):
+        wait = delay * (1 + random.uniform(-jitter, jitter)) if jitter else delay
+        if max_delay is not None:
+            wait = min(wait, max_delay)
+        if deadline is not None and time.monotonic() - start + wait > deadline:
+            return
+        if budget is not None and not budget.spend():
+            return
+        yield wait
+        delay *= backoff
+
+
+# pylint: disable=too-many-arguments
+def retry(exceptions, tries=4, delay=3, backoff=2, logger=None,
+          jitter=0, max_delay=None, deadline=None, budget=None):
     """
     Retry calling the decorated function using an exponential backoff.
 
+    Coroutine functions are retried with ``asyncio.sleep``, so waiting does
+    not block other coroutines in the event loop. Retries and final failures
+    are counted in :data:`RETRY_STATS`.
+
     Args:
         exceptions: The exception to check. may be a tuple of exceptions to check.
         tries: Number of times to try (not retry) before giving up.
         delay: Initial delay between retries in seconds.
         backoff: Backoff multiplier (e.g. value of 2 will double the delay each retry).
         logger: Logger to use. If None, print.
+        jitter: Randomize each delay by up to this fraction (e.g. 0.2 is +/- 20%).
+        max_delay: Upper bound of a single delay in seconds.
+        deadline: Give up if the next try would start later than this number
+            of seconds after the first try.
+        budget: A :class:`RetryBudget` shared with other functions.
     """
     def deco_retry(f):  # pylint: disable=invalid-name
+        name = f.__qualname__
+
+        def next_delay(delays, err):
+            wait = next(delays, None)
+            if wait is None:
+                RETRY_STATS.record(name, failed=True)
+                return None
+            RETRY_STATS.record(name, retried=True)
+            if logger:
+                logger('{}, Retrying in {} seconds...'.format(err, int(wait)))
+            return wait
+
+        def delays():
+            # called before the first try, which the deadline counts from
+            return _retry_delays(tries, delay, backoff, jitter, max_delay,
+                                 deadline, budget, start=time.monotonic())
+
+        if asyncio.iscoroutinefunction(f):
+            @wraps(f)
+            async def f_retry_async(*args, **kwargs):
+                mdelays = delays()
+                while True:
+                    try:
+                        return await f(*args, **kwargs)
+                    except exceptions as e:  # pylint: disable=invalid-name
+                        wait = next_delay(mdelays, e)
+                        if wait is None:
+                            raise
+                        await asyncio.sleep(wait)
+
+            return f_retry_async
 
         @wraps(f)
         def f_retry(*args, **kwargs):
-            mtries, mdelay = tries, delay
-            while mtries > 1:
+            mdelays = delays()
+            while True:
                 try:
                     return f(*args, **kwargs)
                 except exceptions as e:  # pylint: disable=invalid-name
-                    msg = '{}, Retrying in {} seconds...'.format(e,
-                                                                 int(mdelay))
-                    if logger:
-                        logger(msg)
-                    time.sleep(mdelay)
-                    mtries -= 1
-                    mdelay *= backoff
-            return f(*args, **kwargs)
+                    wait = next_delay(mdelays, e)
+                    if wait is None:
+                        raise
+                    time.sleep(wait)
 
         return f_retry  # true decorator
 
     return deco_retry
 
 
+def get_executor():
+    """Return the thread pool used for blocking calls.
+
+    The pool is created on first usage with :data:`MAX_CONCURRENCY` workers.
+    """
+    global _EXECUTOR  # pylint: disable=global-statement
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY,
+                                       thread_name_prefix="koris")
+    return _EXECUTOR
+
+
+def set_concurrency(limit):
+    """Change the number of blocking calls which may run at the same time.
+
+    An existing thread pool is shut down (without waiting for running calls)
+    and replaced on next usage.
+
+    Args:
+        limit (int): The maximal number of worker threads. If ``None`` the
+            current limit is kept.
+    """
+    global MAX_CONCURRENCY, _EXECUTOR  # pylint: disable=global-statement
+    if limit is None or int(limit) == MAX_CONCURRENCY:
+        return
+
+    if int(limit) < 1:
+        raise ValueError(f"concurrency limit must be positive, got {limit}")
+
+    MAX_CONCURRENCY = int(limit)
+    if _EXECUTOR is not None:
+        _EXECUTOR.shutdown(wait=False)
+        _EXECUTOR = None
+
+
+class LazyAttribute:
+    """An attribute which is computed on first access.
+
+    The value is stored in the instance, thus the function is called only
+    once and the attribute can be overwritten like any other attribute.
+    Concurrent first accesses from several threads are serialized, so the
+    attributes of an object can be resolved in parallel with
+    :func:`prefetch`.
+
+    Example:
+        >>> class Cluster:
+        ...     @LazyAttribute
+        ...     def flavor(self):
+        ...         return nova.flavors.find(name="ECS.C1.4-8")
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.name = func.__name__
+        self.__doc__ = func.__doc__
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+
+        locks = obj.__dict__.setdefault('_lazy_locks', {})
+        with locks.setdefault(self.name, threading.Lock()):
+            if self.name not in obj.__dict__:
+                obj.__dict__[self.name] = self.func(obj)
+        return obj.__dict__[self.name]
+
+
+def prefetch(obj, names):
+    """Resolve attributes of an object concurrently in the thread pool.
+
+    Args:
+        obj: Any object, usually one with :class:`LazyAttribute` attributes
+        names (iterable): The names of the attributes
+
+    Each attribute is resolved in a copy of the current context, like the
+    functions of :func:`run_blocking`.
+
+    Returns:
+        obj
+    """
+    names = list(names)
+    contexts = [contextvars.copy_context() for _ in names]
+    list(get_executor().map(lambda context, name: context.run(getattr, obj, name),
+                            contexts, names))
+    return obj
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking function in the koris thread pool.
+
+    All OpenStack clients (novaclient, cinderclient, ...) are synchronous.
+    Calling them directly from a coroutine blocks the event loop, so other
+    coroutines can't proceed until the HTTP request has finished. Awaiting
+    this function instead lets the loop run other coroutines meanwhile.
+
+    Example:
+        >>> vol = await run_blocking(cinder.volumes.get, vol_id)
+
+    Args:
+        func (callable): The blocking function.
+        args, kwargs: Passed to ``func``.
+
+    The function runs in a copy of the current context, thus context
+    variables like :data:`koris.util.apistats.CURRENT_OPERATION` are visible
+    in the thread.
+
+    Returns:
+        Whatever ``func`` returns.
+    """
+    loop = asyncio.get_event_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_executor(), partial(context.run, func, *args, **kwargs))
+
+
 class TitleParser(HTMLParser):  # pylint: disable=abstract-method
     """
     parse <title></title> from a given HTML page.
@@ -212,7 +484,54 @@ class KorisVersionCheck:  # pylint: disable=too-few-public-methods
 
     def check_is_latest(self, current_version):
         """compare the published version on the docs to the current_version"""
+        # pkg_resources is slow to import, only import it when needed
+        from pkg_resources import parse_version
+
         if parse_version(self.version) > parse_version(re.sub(r"\.dev\d*", "",
                                                               current_version)):
             print(red("Version {} of Koris was released, you should upgrade!".format(
                 self.version)))
+
+
+def fetch_published_version(url, timeout=1.5):
+    """return the koris version published on the docs at url, or None"""
+    try:
+        html_string = str(urlopen(url, timeout=timeout).read())
+    except (HTTPError, URLError, OSError):
+        return None
+    return KorisVersionCheck(html_string).version
+
+
+def check_version(current_version, url, cache=None):
+    """warn if a newer koris version was published
+
+    The published version is looked up in the cache. If it is missing or
+    older than a day, it is fetched in a background thread, so koris does
+    not wait for the docs. The warning is then shown by the next call.
+
+    Args:
+        current_version (str): The installed version
+        url (str): The URL of the koris docs
+        cache (:class:`koris.util.cache.DiskCache`): defaults to
+            ``version.json`` in :func:`koris.util.cache.cache_dir`
+
+    Returns:
+        The background thread, or None if the cached version was used
+    """
+    cache = cache or DiskCache(os.path.join(cache_dir(), "version.json"))
+    published = cache.get("version", url)
+    if published is not None:
+        checker = KorisVersionCheck("")
+        checker.version = published
+        checker.check_is_latest(current_version)
+        return None
+
+    def refresh():
+        version = fetch_published_version(url)
+        if version:
+            cache.set("version", url, version)
+
+    thread = threading.Thread(target=refresh, name="koris-version-check",
+                              daemon=True)
+    thread.start()
+    return thread
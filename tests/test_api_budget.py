@@ -0,0 +1,176 @@
+"""
+API call budgets of koris operations
+
+The OpenStack requests of apply, add, delete node and destroy are recorded
+against the simulator of koris.cloud.simulator, the Kubernetes requests
+against a stub of koris.deploy.k8s.K8S. Each operation has a budget of
+calls, which grows at most linearly with the number of nodes. A change which
+adds a request per node to an operation with a constant budget fails here.
+
+The serial round trips are not asserted. They are measured from the wall
+clock overlap of the calls, which depends on the load of the machine. The
+number of status polls varies by a few calls as well, the budgets of the
+operations which poll leave room for that.
+"""
+import json
+
+from functools import partialmethod
+from unittest import mock
+
+import pytest
+
+from koris import bench
+from koris import koris as cli
+from koris.cloud import builder
+from koris.cloud.openstack import LoadBalancer, StatusPoller, get_connection
+from koris.cloud.simulator import LatencyModel, Simulator
+from koris.util.apistats import API_STATS, ApiStats, operation
+
+SIZES = (2, 6)
+
+# the budget of calls of each phase, as (constant, per node); the key None
+# is the whole phase, the other keys are the operations of the phase, e.g.
+# the tasks of the graph of apply
+BUDGETS = {
+    "apply": {
+        None: (94, 4),
+        "loadbalancer": (6, 0),
+        "master_instances": (7, 0),
+        "node_instances": (4, 1),
+        "masters": (14, 0),
+        "nodes": (5, 3),
+    },
+    "add": {None: (24, 3)},
+    "delete_node": {None: (6, 0)},
+    # the member of the LoadBalancer is found with O(1) requests
+    "delete_master": {None: (14, 0)},
+    "destroy": {
+        None: (25, 8),
+        "delete_servers": (5, 6),
+        "loadbalancer": (4, 0),
+        "secgroup": (6, 0),
+    },
+}
+
+# the calls of the Kubernetes API of each phase
+K8S_BUDGETS = {"delete_node": 3, "delete_master": 4}
+
+
+class UserData:
+    """the user data of all instances
+
+    Its content does not change the requests to OpenStack.
+    """
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __str__(self):
+        return "#cloud-config\n"
+
+
+def add_masters_to_loadbalancer(sim, config):
+    """add the masters to the pool, like koris apply does once they are
+    ready"""
+    lb = LoadBalancer(config, get_connection())
+    lb.get()
+    pool_id = lb.master_listener['pool']['id']
+    for server in sim.state["servers"].values():
+        if "master" in server["name"]:
+            port = next(port for port in sim.state["ports"].values()
+                        if port["device_id"] == server["id"])
+            lb.add_member(pool_id, port["fixed_ips"][0]["ip_address"])
+
+
+def run_lifecycle(nodes):
+    """apply a cluster, add nodes, delete a node and a master and destroy
+    the cluster
+
+    Returns:
+        A dict of the phase to the recorded calls and the calls of the
+        Kubernetes stub
+    """
+    sim = Simulator(latency=LatencyModel(median=0.002, sigma=0),
+                    time_scale=0, seed=1)
+    sim.add("keypairs", id=bench.KEYPAIR, name=bench.KEYPAIR,
+            public_key="ssh-rsa AAAA")
+    config = bench.bench_config(nodes)
+    phases = (
+        ("apply", lambda: bench.apply_cluster(config)),
+        ("add", lambda: bench.add_nodes(config, nodes)),
+        ("delete_node", lambda: cli.delete_node(config, "bench-node-1")),
+        ("delete_master", lambda: cli.delete_node(config, "bench-master-2")),
+        ("destroy", lambda: bench.destroy_cluster(config)),
+    )
+
+    recorded = {}
+    k8s = mock.MagicMock()
+    enabled = API_STATS.enabled
+    API_STATS.enable()
+    try:
+        with sim.installed(), \
+                mock.patch("koris.deploy.k8s.K8S", return_value=k8s), \
+                mock.patch.multiple(builder, NodeInit=UserData,
+                                    FirstMasterInit=UserData,
+                                    NthMasterInit=UserData), \
+                mock.patch.object(StatusPoller, "__init__", partialmethod(
+                    StatusPoller.__init__, interval=0.01)):
+            for phase, func in phases:
+                if phase == "delete_node":
+                    add_masters_to_loadbalancer(sim, config)
+                API_STATS.reset()
+                k8s.reset_mock()
+                with operation(phase):
+                    func()
+                recorded[phase] = (list(API_STATS.calls),
+                                   list(k8s.method_calls))
+    finally:
+        API_STATS.enabled = enabled
+        API_STATS.reset()
+    return recorded
+
+
+@pytest.fixture(scope="module", params=SIZES)
+def lifecycle(request):
+    return request.param, run_lifecycle(request.param)
+
+
+def check(phase, nodes, calls):
+    """return the operations of phase which exceed their budget"""
+    stats = ApiStats()
+    stats.calls = calls
+    profile = stats.profile()
+    exceeded = []
+    for name, (constant, per_node) in BUDGETS[phase].items():
+        selected = [call for call in calls
+                    if name in (None, call["operation"])]
+        if len(selected) > constant + per_node * nodes:
+            exceeded.append("%s/%s: %d calls with %d nodes, %s" % (
+                phase, name or "total", len(selected), nodes,
+                json.dumps(profile.get(name or phase))))
+    return exceeded
+
+
+@pytest.mark.parametrize("phase", sorted(BUDGETS))
+def test_api_budget(lifecycle, phase):
+    nodes, recorded = lifecycle
+    calls, _ = recorded[phase]
+    assert not check(phase, nodes, calls)
+
+
+@pytest.mark.parametrize("phase", sorted(K8S_BUDGETS))
+def test_kubernetes_budget(lifecycle, phase):
+    _, recorded = lifecycle
+    _, k8s_calls = recorded[phase]
+    assert len(k8s_calls) <= K8S_BUDGETS[phase], k8s_calls
+
+
+def test_budget_detects_n_plus_one():
+    calls = [{"operation": "delete_master", "method": "GET",
+              "template": "/v2.0/lbaas/pools/{id}/members/{id}",
+              "url": "/v2.0/lbaas/pools/1/members/%d" % idx,
+              "status": 200, "duration": 0.005, "retries": 0,
+              "start": idx * 0.01} for idx in range(20)]
+    exceeded = check("delete_master", 20, calls)
+    assert len(exceeded) == 1
+    assert "20 calls with 20 nodes" in exceeded[0]
@@ -0,0 +1,185 @@
+import asyncio
+import json
+
+from unittest import mock
+
+import pytest
+
+from koris.util.apistats import ApiStats, operation, url_template
+from koris.util.dag import TaskGraph
+
+SERVER_ID = "0d4ad4f9-0bb5-4d3c-8c8f-1b4a3e1f2a10"
+
+
+class FakeHttpError(Exception):
+    http_status = 404
+
+
+class FakeSession:
+    """behaves like a keystoneauth session, which sends its requests with
+    the requests session in the attribute session"""
+
+    def __init__(self, attempts=1, status=200):
+        self.session = mock.Mock()
+        self.attempts = attempts
+        self.status = status
+
+    def request(self, url, method, **kwargs):
+        for _ in range(self.attempts):
+            self.session.request(method, url)
+        if self.status >= 400:
+            raise FakeHttpError()
+        return mock.Mock(status_code=self.status)
+
+
+@pytest.fixture
+def stats():
+    stats = ApiStats()
+    stats.enable()
+    return stats
+
+
+def test_url_template():
+    assert url_template(
+        "https://nova:8774/v2.1/servers/%s?all_tenants=1" % SERVER_ID) == \
+        "/v2.1/servers/{id}"
+    assert url_template("/v2.1/flavors/42/os-extra_specs") == \
+        "/v2.1/flavors/{id}/os-extra_specs"
+    assert url_template("/v2.0/ports") == "/v2.0/ports"
+
+
+def test_install_records_calls(stats):
+    sess = stats.install(FakeSession(attempts=3))
+    sess.request("/servers/%s" % SERVER_ID, "GET",
+                 endpoint_filter={"service_type": "compute"})
+
+    call, = stats.calls
+    assert call["operation"] == "koris"
+    assert call["method"] == "GET"
+    assert call["service"] == "compute"
+    assert call["template"] == "/servers/{id}"
+    assert call["status"] == 200
+    assert call["retries"] == 2
+    assert call["duration"] >= 0
+
+
+def test_install_records_errors(stats):
+    sess = stats.install(FakeSession(status=404))
+    with pytest.raises(FakeHttpError):
+        sess.request("https://neutron:9696/v2.0/ports/1", "DELETE")
+
+    call, = stats.calls
+    assert call["status"] == 404
+    assert call["service"] == "neutron:9696"
+    assert stats.summary()[0]["errors"] == 1
+
+
+def test_install_disabled():
+    stats = ApiStats()
+    sess = stats.install(FakeSession())
+    sess.request("/servers", "GET")
+    assert not stats.calls
+
+    # installing twice does not record calls twice
+    stats.enable()
+    stats.install(sess)
+    sess.request("/servers", "GET")
+    assert len(stats.calls) == 1
+
+
+def test_summary(stats):
+    for duration in (0.1, 0.3):
+        stats.record("GET", "compute", "/servers/1", 200, duration)
+    stats.record("POST", "network", "/v2.0/ports", 201, 1.0)
+
+    ports, servers = stats.summary()
+    assert ports["template"] == "/v2.0/ports"
+    assert servers["calls"] == 2
+    assert servers["max"] == 0.3
+    assert servers["mean"] == pytest.approx(0.2)
+    assert "3 API calls" in stats.format_summary()
+
+
+def test_repeated_gets(stats):
+    with operation("loadbalancer"):
+        for member in range(6):
+            stats.record("GET", "load-balancer", "/pools/1/members/%d" % member,
+                         200, 0.1)
+    with operation("masters"):
+        stats.record("GET", "compute", "/flavors/1", 200, 0.1)
+        stats.record("GET", "compute", "/flavors/1", 200, 0.1)
+    # the same request in different operations is not a repetition
+    stats.record("GET", "compute", "/flavors/1", 200, 0.1)
+
+    found = stats.repeated_gets()
+    assert {"operation": "loadbalancer", "kind": "template",
+            "url": "/pools/{id}/members/{id}", "count": 6} in found
+    assert {"operation": "masters", "kind": "identical",
+            "url": "/flavors/1", "count": 2} in found
+    assert len(found) == 2
+
+
+def test_task_graph_operations(stats):
+    sess = stats.install(FakeSession())
+    graph = TaskGraph()
+
+    @graph.task()
+    def network():
+        sess.request("/v2.0/networks", "POST")
+
+    @graph.task(requires=("network",))
+    async def masters(**_):
+        sess.request("/servers", "POST")
+
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    graph.run()
+    asyncio.set_event_loop(asyncio.new_event_loop())
+
+    assert [call["operation"] for call in stats.calls] == ["network",
+                                                           "masters"]
+
+
+def test_profile(stats):
+    with operation("nodes"):
+        stats.record("POST", "compute", "/servers", 202, 0.1)
+        stats.record("POST", "compute", "/servers", 202, 0.1)
+    stats.record("GET", "compute", "/servers/%s" % SERVER_ID, 200, 0.1)
+
+    assert stats.profile() == {"nodes": {"POST /servers": 2},
+                               "koris": {"GET /servers/{id}": 1}}
+
+
+def test_serial_round_trips(stats):
+    # two concurrent calls, followed by one which waited for both
+    stats.record("GET", "compute", "/servers", 200, 1.0, start=0.0)
+    stats.record("GET", "network", "/ports", 200, 2.0, start=0.5)
+    with operation("nodes"):
+        stats.record("POST", "compute", "/servers", 202, 1.0, start=2.5)
+
+    assert stats.serial_round_trips() == 2
+    assert stats.serial_round_trips("nodes") == 1
+    assert stats.serial_round_trips("masters") == 0
+
+
+def test_counting_after_disabled_calls():
+    stats = ApiStats()
+    sess = stats.install(FakeSession())
+    stats.enable()
+    sess.request("/servers", "GET")
+    stats.enabled = False
+    sess.request("/servers", "GET")
+    stats.enable()
+    sess.request("/servers", "GET")
+    assert len(stats.calls) == 2
+
+
+def test_write_json(stats, tmpdir):
+    stats.record("GET", "compute", "/servers", 200, 0.1)
+    path = str(tmpdir.join("stats.json"))
+    stats.write_json(path)
+
+    with open(path) as fh:
+        data = json.load(fh)
+    assert data["calls"][0]["template"] == "/servers"
+    assert data["summary"][0]["calls"] == 1
+    assert data["repeated_gets"] == []
@@ -0,0 +1,115 @@
+"""
+Micro benchmarks of the CPU bound code which runs on every build
+
+The benchmarks need pytest-benchmark and are skipped without it. Store a
+baseline in .benchmarks before a change, and compare with it afterwards::
+
+    make benchmark-save
+    make benchmark
+
+The comparison fails if the median time of a benchmark grew by more than
+25%.
+"""
+import json
+
+import pytest
+
+from koris.cloud.openstack import OSCloudConfig, distribute_host_zones
+from koris.deploy.k8s import parse_etcd_response
+from koris.provision.cloud_init import NodeInit, NthMasterInit
+from koris.ssl import CertBundle, b64_cert, b64_key, create_ca, create_key
+from koris.util.util import get_kubeconfig_yaml, host_names
+
+pytest.importorskip("pytest_benchmark")
+
+# short enough to run with the unit tests
+pytestmark = pytest.mark.benchmark(group="koris", max_time=0.2,
+                                   min_rounds=5)
+
+HOSTS = (1, 10, 100, 1000)
+
+ZONES = ("de-nbg6-1a", "de-nbg6-1b", "de-nbg6-1c")
+
+
+@pytest.fixture(scope="module")
+def ca_bundle():
+    key = create_key()
+    ca_cert = create_ca(key, key.public_key(), "DE", "BY", "NUE",
+                        "Kubernetes", "CDA-PI", "kubernetes")
+    return CertBundle(key, ca_cert)
+
+
+@pytest.fixture(scope="module")
+def cloud_config():
+    return OSCloudConfig("a348bc5b-808b-4119-a199-b65b83835d6b")
+
+
+def etcd_response(members):
+    """return the output of ``etcdctl member list -w json``"""
+    return json.dumps({
+        "header": {"cluster_id": 8827847562006938542,
+                   "member_id": 13982982772617700588, "raft_term": 14},
+        "members": [{"ID": 5521461231283543456 + idx,
+                     "name": "master-%d-bench" % idx,
+                     "peerURLs": ["https://10.32.192.%d:2380" % idx],
+                     "clientURLs": ["https://10.32.192.%d:2379" % idx]}
+                    for idx in range(1, members + 1)]})
+
+
+@pytest.mark.parametrize("hosts", HOSTS)
+def test_host_names(benchmark, hosts):
+    # host_names caches its results, the first call of a build is measured
+    names = benchmark(host_names.__wrapped__, "node", hosts, "bench")
+    assert len(names) == hosts
+
+
+@pytest.mark.parametrize("hosts", HOSTS)
+def test_distribute_host_zones(benchmark, hosts):
+    names = host_names("node", hosts, "bench")
+    zones = benchmark(lambda: list(distribute_host_zones(names, ZONES)))
+    assert sum(len(group) for group, _ in zones) == hosts
+
+
+def test_create_key(benchmark):
+    key = benchmark(create_key)
+    assert key.key_size == 2048
+
+
+def test_create_signed(benchmark, ca_bundle):
+    names = host_names("master", 3, "bench")
+    ips = ["10.32.192.%d" % idx for idx in range(1, 4)]
+    bundle = benchmark(CertBundle.create_signed, ca_bundle, "DE", "BY",
+                       "NUE", "Kubernetes", "CDA-PI", "kubernetes",
+                       names, ips)
+    assert bundle.cert.issuer == ca_bundle.cert.subject
+
+
+def test_node_init(benchmark, ca_bundle, cloud_config):
+    userdata = benchmark(lambda: str(NodeInit(
+        ca_bundle.cert, cloud_config, "10.32.192.121", "6443",
+        "a73b8f597c04551a0fdc8e95544be8a", "discovery_hash")))
+    assert userdata.startswith("Content-Type: multipart/mixed")
+
+
+def test_nth_master_init(benchmark, ca_bundle, cloud_config):
+    key = create_key()
+    userdata = benchmark(lambda: str(NthMasterInit(
+        cloud_config, key, koris_env={"lb_ip": "10.32.192.121"})))
+    assert userdata.startswith("Content-Type: multipart/mixed")
+
+
+@pytest.mark.parametrize("members", (3, 5, 7))
+def test_parse_etcd_response(benchmark, members):
+    resp = etcd_response(members)
+    parsed = benchmark(parse_etcd_response, resp)
+    assert len(parsed) == members
+
+
+def test_get_kubeconfig_yaml(benchmark, ca_bundle):
+    client = CertBundle.create_signed(ca_bundle, "", "", "", "system:masters",
+                                      "", "admin", [], [])
+    kubeconfig = benchmark(
+        get_kubeconfig_yaml, "https://10.32.192.121:6443",
+        b64_cert(ca_bundle.cert), "admin", b64_cert(client.cert),
+        b64_key(client.key))
+    assert "admin-context" in kubeconfig
@@ -2,7 +2,11 @@
 Test koris.cloud.builder
 """
 #  pylint: disable=redefined-outer-name
+import asyncio
 import copy
+import functools
+import inspect
+import time
 from unittest import mock
 from unittest.mock import MagicMock
 import pytest
@@ -12,8 +16,9 @@ from munch import Munch
 
 import koris.cloud.openstack
 
-from koris.cloud.openstack import OSClusterInfo, OSSubnet
-from koris.cloud.builder import NodeBuilder, ControlPlaneBuilder
+from koris.cloud.openstack import (BuilderError, Instance, LoadBalancer,
+                                   OSClusterInfo, OSSubnet)
+from koris.cloud.builder import NodeBuilder, ControlPlaneBuilder, ClusterBuilder
 from koris.ssl import (create_certs, CertBundle, create_key, create_ca)
 
 from .testdata import CONFIG
@@ -107,8 +112,16 @@ NOVA.keypairs.get = mock.MagicMock(return_value='otiram')
 NOVA.glance.find_image = mock.MagicMock(return_value='Ubuntu')
 NOVA.flavors.find = mock.MagicMock(return_value=Flavor('ECS.C1.4-8'))
 NEUTRON.find_resource = mock.MagicMock(return_value={'id': 'acedfr3c4223ee21'})
-NEUTRON.create_port = mock.MagicMock(
-    return_value=DUMMYPORT)
+
+
+def create_port(body):
+    """answer single and bulk port requests like neutron"""
+    if "ports" in body:
+        return {"ports": [DUMMYPORT["port"] for _ in body["ports"]]}
+    return DUMMYPORT
+
+
+NEUTRON.create_port = mock.MagicMock(side_effect=create_port)
 
 
 NEUTRON.create_security_group = mock.MagicMock(
@@ -313,3 +326,126 @@ def test_instance_naming_creation(os_info):
     instance_names = os_info.nodes_names
     for i in range(len(instance_names)):
         assert instance_names[i] == 'test-node-{}'.format(i + 1)
+
+
+@mock.patch('koris.cloud.OpenStackAPI')
+def test_create_nodes_bulk_ports(patch, os_info):  # pylint disable=redefined-outer-name
+    """ports of new nodes are created with one bulk request"""
+    NOVA.servers.list = mock.MagicMock(
+        return_value=[DummyServer("test-node-1", "10.32.192.101",
+                                  Flavor('ECS.C1.4-8'))])
+    NEUTRON.create_port.reset_mock()
+    nb = NodeBuilder(CONFIG, os_info)
+    nodes = nb.create_new_nodes('node', "ECS.C1.2-4", "az-west-1", amount=3)
+    assert NEUTRON.create_port.call_count == 1
+    body = NEUTRON.create_port.call_args[0][0]
+    assert [port['name'] for port in body['ports']] == [
+        node.name for node in nodes]
+    assert all(node.ip_address == "192.168.1.101" for node in nodes)
+
+
+def test_cluster_build_graph(os_info):  # pylint disable=redefined-outer-name
+    """the build is a valid graph and creates the SSH keypair once"""
+    builder = ClusterBuilder(CONFIG, os_info, NOVA, NEUTRON, CINDER, CONN)
+    graph = builder.build_graph(dict(CONFIG, pod_network="CALICO"))
+    order = [task.name for task in graph.order()]
+    assert order.count("ssh_key") == 1
+    assert "dex_listeners" not in order
+    # the LoadBalancer does not wait for the keys
+    assert not {"ssh_key", "ca_bundle"} & set(graph.tasks["loadbalancer"].requires)
+    assert order.index("loadbalancer") < order.index("masters")
+    assert set(graph.tasks["masters"].requires) >= {"ssh_key", "loadbalancer"}
+
+
+def test_cluster_build_graph_wiring(os_info):  # pylint disable=redefined-outer-name
+    """every task accepts the results of the tasks it requires"""
+    def stub(func, **kwargs):
+        inspect.signature(func).bind(**kwargs)
+        return mock.MagicMock()
+
+    builder = ClusterBuilder(CONFIG, os_info, NOVA, NEUTRON, CINDER, CONN)
+    graph = builder.build_graph(dict(CONFIG, pod_network="CALICO"))
+    for task in graph.tasks.values():
+        task.func = functools.partial(stub, task.func)
+
+    loop = asyncio.new_event_loop()
+    try:
+        results = graph.run(loop)
+    finally:
+        loop.close()
+    assert set(results) == set(graph.tasks)
+
+
+def test_cluster_build_lb_members_timeout(os_info):  # pylint disable=redefined-outer-name
+    """the build fails, if not all masters join the LoadBalancer"""
+    builder = ClusterBuilder(CONFIG, os_info, NOVA, NEUTRON, CINDER, CONN)
+    graph = builder.build_graph(dict(CONFIG, pod_network="CALICO"))
+    masters = []
+    for idx in range(3):
+        master = mock.MagicMock(spec=Instance)
+        master.name, master.ip_address = "master-%d" % idx, "10.0.0.%d" % idx
+        masters.append(master)
+    k8s = mock.MagicMock()
+    k8s.add_all_masters_to_loadbalancer.return_value = False
+    listener = {'pool': {'members': [{'address': '10.0.0.0'}]}}
+
+    with mock.patch.object(LoadBalancer, "bulk_update_members",
+                           return_value=False), \
+            mock.patch.object(LoadBalancer, "master_listener", listener):
+        with pytest.raises(BuilderError, match="master-1, master-2$"):
+            graph.tasks["lb_members"].func(k8s=k8s, masters=masters, nodes=[])
+
+        k8s.add_all_masters_to_loadbalancer.return_value = True
+        assert len(graph.tasks["lb_members"].func(
+            k8s=k8s, masters=masters, nodes=[])) == 3
+
+
+def test_cluster_info_is_lazy():
+    """no requests are done before a resource is used"""
+    nova, conn = mock.MagicMock(), mock.MagicMock()
+    info = OSClusterInfo(nova, NEUTRON, CINDER, CONFIG, conn)
+    nova.keypairs.get.assert_not_called()
+    nova.flavors.find.assert_not_called()
+    conn.network.networks.assert_not_called()
+
+    info.prefetch(("keypair", "node_flavor"))
+    nova.keypairs.get.assert_called_once_with(CONFIG['keypair'])
+    nova.flavors.find.assert_called_once_with(name=CONFIG['node_flavor'])
+    assert info.keypair is nova.keypairs.get.return_value
+    nova.keypairs.get.assert_called_once_with(CONFIG['keypair'])
+
+
+def test_get_instances_skips_image():
+    """existing instances are found without looking up the image"""
+    nova, conn = mock.MagicMock(), mock.MagicMock()
+    nova.servers.find.return_value.interface_list.return_value = [
+        Munch(fixed_ips=[{'ip_address': '10.0.0.1'}])]
+    info = OSClusterInfo(nova, NEUTRON, CINDER, CONFIG, conn)
+    with mock.patch.object(OSClusterInfo, "_find_image") as find_image:
+        instances = list(info.get_instances("master"))
+    assert instances and all(inst.exists for inst in instances)
+    find_image.assert_not_called()
+
+
+def test_cluster_info_serializes_nova():
+    """the image lookup switches the nova client to glance, thus the nova
+    lookups of prefetch never overlap"""
+    active, overlaps = [], []
+
+    def lookup(*args, **kwargs):
+        active.append(args or kwargs)
+        if len(active) > 1:
+            overlaps.append(list(active))
+        time.sleep(0.01)
+        active.pop()
+        return mock.MagicMock()
+
+    nova = mock.MagicMock()
+    nova.keypairs.get.side_effect = lookup
+    nova.flavors.find.side_effect = lookup
+    nova.glance.find_image.side_effect = lookup
+    info = OSClusterInfo(nova, NEUTRON, CINDER, CONFIG, mock.MagicMock())
+    info.prefetch(("keypair", "node_flavor", "master_flavor", "image",
+                   "image"))
+    assert not overlaps
+    nova.glance.find_image.assert_called_once_with(CONFIG['image'])
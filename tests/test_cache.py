@@ -0,0 +1,122 @@
+import os
+import time
+
+from unittest import mock
+
+from keystoneauth1 import identity
+
+from koris.util.cache import DiskCache, TokenCache, get_cache
+from koris.cloud.openstack import OSClusterInfo
+
+from .testdata import CONFIG
+
+
+def test_disk_cache(tmpdir):
+    """values expire and are separated by namespace"""
+    path = str(tmpdir.join("koris", "openstack.json"))
+    cache = DiskCache(path, namespace="cloud-a", ttls={"flavor": 60})
+    other = DiskCache(path, namespace="cloud-b")
+
+    func = mock.Mock(return_value={"id": "1"})
+    assert cache.get_or_set("flavor", "small", func) == {"id": "1"}
+    assert cache.get_or_set("flavor", "small", func) == {"id": "1"}
+    func.assert_called_once_with()
+    assert other.get("flavor", "small") is None
+
+    # empty results are not cached
+    assert cache.get_or_set("image", "none", lambda: None) is None
+    assert cache.get("image", "none") is None
+
+    with mock.patch('koris.util.cache.time.time',
+                    return_value=time.time() + 61):
+        assert cache.get("flavor", "small") is None
+
+    other.set("flavor", "small", {"id": "2"})
+    cache.invalidate()
+    assert cache.get("flavor", "small") is None
+    assert other.get("flavor", "small") == {"id": "2"}
+
+
+def test_disk_cache_unwritable(tmpdir, monkeypatch):
+    """a cache directory which can't be written is an empty cache"""
+    tmpdir.join("file").write("")
+    monkeypatch.setenv("KORIS_CACHE_DIR", str(tmpdir.join("file", "koris")))
+    monkeypatch.setenv("OS_AUTH_URL", "https://keystone/")
+    monkeypatch.setenv("OS_PROJECT_NAME", "koris")
+    cache = get_cache()
+
+    func = mock.Mock(return_value={"id": "1"})
+    assert cache.get_or_set("flavor", "small", func) == {"id": "1"}
+    assert cache.get_or_set("flavor", "small", func) == {"id": "1"}
+    assert func.call_count == 2
+    cache.set("flavor", "small", {"id": "1"})
+    assert cache.get("flavor", "small") is None
+    cache.invalidate()
+
+
+def test_get_cache(tmpdir):
+    with mock.patch.dict(os.environ, {"OS_AUTH_URL": "https://keystone/",
+                                      "OS_PROJECT_NAME": "koris"},
+                         clear=True):
+        cache = get_cache(str(tmpdir.join("openstack.json")))
+        assert cache.namespace == "https://keystone|koris"
+
+    with mock.patch.dict(os.environ, {}, clear=True):
+        assert get_cache() is None
+
+
+def test_cluster_info_uses_cache(tmpdir):
+    """flavors are only looked up once for all koris calls"""
+    cache = DiskCache(str(tmpdir.join("openstack.json")))
+    nova = mock.MagicMock()
+    nova.flavors.find.return_value.to_dict.return_value = {
+        "id": "42", "name": CONFIG['node_flavor']}
+
+    for _ in range(2):
+        info = OSClusterInfo(nova, mock.Mock(), mock.Mock(), CONFIG,
+                             mock.Mock(), cache=cache)
+        assert info.node_flavor.id == "42"
+
+    nova.flavors.find.assert_called_once_with(name=CONFIG['node_flavor'])
+
+
+def test_token_cache(tmpdir):
+    """the token is stored encrypted and only usable with the password"""
+    def plugin():
+        return identity.Password(auth_url="https://keystone/v3",
+                                 username="koris", password="secret",
+                                 project_id="p", user_domain_name="d")
+
+    auth = plugin()
+    cache = TokenCache(auth, "secret", directory=str(tmpdir))
+    assert not cache.load()
+
+    state = '{"auth_token": "gAAAA-token", "body": {"token": {}}}'
+    with mock.patch.object(auth, 'get_auth_state', return_value=state):
+        cache.save()
+    with open(cache.path, "rb") as fh:
+        assert b"gAAAA-token" not in fh.read()
+
+    auth = plugin()
+    with mock.patch.object(auth, 'set_auth_state') as set_state:
+        assert TokenCache(auth, "secret", directory=str(tmpdir)).load()
+    set_state.assert_called_once_with(state)
+
+    with mock.patch.object(auth, 'set_auth_state') as set_state:
+        assert not TokenCache(auth, "wrong", directory=str(tmpdir)).load()
+    set_state.assert_not_called()
+
+
+def test_token_cache_save_never_fails(tmpdir):
+    """the token is not cached, if the directory can't be written"""
+    tmpdir.join("file").write("")
+    auth = identity.Password(auth_url="https://keystone/v3",
+                             username="koris", password="secret",
+                             project_id="p", user_domain_name="d")
+    cache = TokenCache(auth, "secret", directory=str(tmpdir.join("file", "x")))
+    with mock.patch.object(auth, 'get_auth_state', return_value="{}"):
+        cache.save()
+    with mock.patch.object(auth, 'get_auth_state',
+                           side_effect=RuntimeError("no token")):
+        cache.save()
+    assert not cache.load()
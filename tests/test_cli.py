@@ -1,10 +1,17 @@
+import asyncio
 import os
 import subprocess
+import sys
+
+from unittest import mock
 
 import pytest
+from munch import Munch
 
 from .testdata import CONFIG
-from koris.koris import delete_node
+from koris.cli import remove_cluster
+from koris.cloud.discovery import CLUSTER_METADATA_KEY
+from koris.koris import Koris, delete_node
 
 
 def _get_clean_env():
@@ -19,6 +26,27 @@ def _get_clean_env():
     return env
 
 
+# modules which must only be imported by the commands which need them
+HEAVY_MODULES = {"novaclient", "cinderclient", "neutronclient",
+                 "octaviaclient", "openstack", "kubernetes", "cryptography",
+                 "pkg_resources"}
+
+# seconds koris.koris may take to import, before the cloud clients were
+# imported lazily it took more than one second
+IMPORT_BUDGET = 0.8
+
+
+def test_import_budget():
+    """importing the CLI is quick, since the clients are imported lazily"""
+    code = ("import sys, time; start = time.monotonic(); import koris.koris; "
+            "print(time.monotonic() - start); print(' '.join(sys.modules))")
+    out = subprocess.check_output([sys.executable, "-c", code],
+                                  env=_get_clean_env())
+    duration, modules = out.decode().splitlines()
+    assert not HEAVY_MODULES & {mod.split(".")[0] for mod in modules.split()}
+    assert float(duration) < IMPORT_BUDGET
+
+
 def test_help():
     """
     It should be possible to call koris --help without sourcing an
@@ -49,9 +77,90 @@ def test_need_rc_file():
         pass
 
 
+def test_only_operations_are_recorded(tmpdir, monkeypatch):
+    """the performance history is only recorded for operations"""
+    monkeypatch.setenv("KORIS_PERF_DB", str(tmpdir.join("perf.sqlite")))
+    with mock.patch("koris.koris.check_version"):
+        cli = Koris()
+    with mock.patch("koris.koris.PERF_RECORDER") as recorder:
+        cli.perf("runs")
+        recorder.start.assert_not_called()
+
+        with pytest.raises(FileNotFoundError):
+            cli.destroy(str(tmpdir.join("missing.yml")), force=True)
+        recorder.start.assert_called_once()
+
+        recorder.reset_mock()
+        cli._set_no_perf_store(True)
+        with pytest.raises(FileNotFoundError):
+            cli.apply(str(tmpdir.join("missing.yml")))
+        recorder.start.assert_not_called()
+
+
 def test_delete_node():
     invalid_names = ["", None]
 
     for name in invalid_names:
         with pytest.raises(ValueError):
             delete_node(CONFIG, name)
+
+
+def test_remove_cluster():
+    """only the resources of the cluster are deleted"""
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    nova, neutron, cinder, conn = (mock.MagicMock() for _ in range(4))
+
+    servers = [mock.MagicMock() for _ in range(3)]
+    for server, name in zip(servers, ["test-master-1", "test-node-1",
+                                      "test-node-1-backup"]):
+        server.name = name
+        server.interface_list.return_value = [Munch(id="port-%s" % name)]
+    nova.servers.list.return_value = servers
+
+    volumes = [mock.MagicMock(status="available") for _ in range(3)]
+    for vol, name in zip(volumes, ["test-node-2", "test-node-1-old", None]):
+        vol.name = name
+    cinder.volumes.list.return_value = volumes
+
+    conn.list_security_groups.return_value = [Munch(id="sg")]
+    conn.network.ports.return_value = [Munch(id="stray")]
+
+    # the cluster was created before koris tagged its servers
+    tagged = mock.MagicMock()
+    tagged.servers.list.return_value = []
+
+    with mock.patch('koris.cli.LoadBalancer') as lb, \
+            mock.patch('koris.cloud.inventory.get_nova_microversion',
+                       return_value=tagged), \
+            mock.patch('koris.cloud.inventory.get_cinder_microversion',
+                       return_value=cinder):
+        remove_cluster(CONFIG, nova, neutron, cinder, conn)
+
+    tagged.servers.list.assert_called_once_with(
+        search_opts={'tags': 'koris-cluster=test'}, limit=100, marker=None)
+    nova.servers.list.assert_called_once_with(
+        search_opts={'name': '^test-(master|node)-[0-9]+$'},
+        limit=100, marker=None)
+    servers[0].delete.assert_called_once_with()
+    servers[1].delete.assert_called_once_with()
+    servers[2].delete.assert_not_called()
+    assert sorted(c[0][0] for c in neutron.delete_port.call_args_list) == \
+        ["port-test-master-1", "port-test-node-1"]
+
+    lb.return_value.delete.assert_called_once_with()
+    conn.delete_keypair.assert_called_once_with("test")
+
+    conn.network.ports.assert_called_once_with(security_group_ids=["sg"])
+    conn.network.delete_port.assert_called_once_with(Munch(id="stray"),
+                                                     ignore_missing=True)
+    conn.delete_security_group.assert_called_once_with("sg")
+
+    assert cinder.volumes.list.call_args_list == [
+        mock.call(search_opts={'metadata': {CLUSTER_METADATA_KEY: "test"}},
+                  limit=100, marker=None),
+        mock.call(search_opts={'name~': "test-"}, limit=100, marker=None)]
+    volumes[0].delete.assert_called_once_with()
+    volumes[1].delete.assert_not_called()
+    volumes[2].delete.assert_not_called()
+
+    asyncio.set_event_loop(asyncio.new_event_loop())
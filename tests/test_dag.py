@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from koris.util.dag import TaskGraph, TaskGraphError
+from koris.util.util import MAX_CONCURRENCY, run_blocking, set_concurrency
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    yield loop
+    loop.close()
+    asyncio.set_event_loop(asyncio.new_event_loop())
+
+
+def test_results_are_passed_to_dependent_tasks(loop):
+    graph = TaskGraph()
+    graph.add("a", lambda: 1)
+    graph.add("b", lambda: 2)
+    graph.add("c", lambda a, b: a + b, requires=("a", "b"))
+
+    async def double(c):
+        return c * 2
+
+    graph.add("d", double, requires=("c",))
+    results = graph.run(loop)
+    assert results == {"a": 1, "b": 2, "c": 3, "d": 6}
+
+
+def test_independent_tasks_overlap(loop):
+    graph = TaskGraph()
+    graph.add("slow", lambda: time.sleep(0.3))
+    graph.add("fast", lambda: time.sleep(0.1))
+    graph.add("after_fast", lambda fast: time.sleep(0.1), requires=("fast",))
+
+    start = time.monotonic()
+    graph.run(loop)
+    assert time.monotonic() - start < 0.45
+    assert graph.tasks["after_fast"].started >= graph.tasks["fast"].finished
+    assert [task.name for task in graph.critical_path()] == ["slow"]
+
+
+def test_blocking_tasks_leave_the_thread_pool_free(loop):
+    """blocking tasks which wait for calls in the pool don't starve them"""
+    ready = threading.Event()
+
+    async def create():
+        await run_blocking(time.sleep, 0.05)
+        ready.set()
+
+    graph = TaskGraph()
+    graph.add("wait_a", lambda: ready.wait(5))
+    graph.add("wait_b", lambda: ready.wait(5))
+    graph.add("create", create)
+
+    set_concurrency(1)
+    try:
+        assert graph.run(loop) == {"wait_a": True, "wait_b": True,
+                                   "create": None}
+    finally:
+        set_concurrency(MAX_CONCURRENCY)
+
+
+def test_critical_path_follows_last_finished_requirement(loop):
+    graph = TaskGraph()
+    graph.add("lb", lambda: time.sleep(0.2))
+    graph.add("ca", lambda: None)
+    graph.add("masters", lambda lb, ca: time.sleep(0.05),
+              requires=("lb", "ca"))
+    graph.run(loop)
+    assert [task.name for task in graph.critical_path()] == ["lb", "masters"]
+
+
+def test_failure_cancels_pending_tasks(loop):
+    ran = []
+
+    def fail():
+        raise ValueError("boom")
+
+    graph = TaskGraph()
+    graph.add("fail", fail)
+    graph.add("after", lambda fail: ran.append(1), requires=("fail",))
+    with pytest.raises(ValueError):
+        graph.run(loop)
+    assert not ran
+
+
+def test_invalid_graphs():
+    graph = TaskGraph()
+    graph.add("a", lambda b: None, requires=("b",))
+    with pytest.raises(TaskGraphError):
+        graph.order()
+
+    graph.add("b", lambda a: None, requires=("a",))
+    with pytest.raises(TaskGraphError):
+        graph.order()
+
+    with pytest.raises(TaskGraphError):
+        graph.add("a", lambda: None)
+
+
+def test_subgraph(loop):
+    graph = TaskGraph()
+    graph.add("network", lambda: "net")
+    graph.add("ca", lambda: "ca")
+    graph.add("masters", lambda network: network, requires=("network",))
+    graph.add("addons", lambda masters, ca: ca, requires=("masters", "ca"))
+
+    sub = graph.subgraph("masters")
+    assert list(sub.tasks) == ["network", "masters"]
+    assert sub.run(loop) == {"network": "net", "masters": "net"}
+
+    with pytest.raises(TaskGraphError):
+        graph.subgraph("nodes")
@@ -0,0 +1,58 @@
+from unittest import mock
+
+from munch import Munch
+
+from koris.cloud.builder import get_server_range
+from koris.cloud.discovery import (paginate, first, find_servers, find_image,
+                                   find_external_network)
+
+
+def test_paginate():
+    """pages are only fetched as far as they are consumed"""
+    servers = [Munch(id=i) for i in range(5)]
+
+    def list_servers(limit, marker, **kwargs):
+        start = 0 if marker is None else marker + 1
+        return servers[start:start + limit]
+
+    list_func = mock.Mock(side_effect=list_servers)
+    assert list(paginate(list_func, page_size=2)) == servers
+    assert list_func.call_count == 3
+
+    list_func.reset_mock()
+    assert first(paginate(list_func, page_size=2), lambda s: s.id == 1).id == 1
+    list_func.assert_called_once_with(limit=2, marker=None)
+
+
+def test_find_servers():
+    """servers of other clusters are never returned"""
+    nova = mock.Mock()
+    nova.servers.list.return_value = [Munch(id=1, name="test-node-9"),
+                                      Munch(id=2, name="test-node-10"),
+                                      Munch(id=3, name="test-2-node-11"),
+                                      Munch(id=4, name="mytest-node-12")]
+    servers = list(find_servers(nova, "test", "node"))
+    assert [s.name for s in servers] == ["test-node-9", "test-node-10"]
+    nova.servers.list.assert_called_once_with(
+        limit=100, marker=None, search_opts={'name': '^test-(node)-[0-9]+$'})
+    assert list(get_server_range(servers, "test", "node", 2)) == [11, 12]
+
+
+def test_find_image():
+    conn = mock.Mock()
+    conn.image.images.return_value = iter([Munch(id="a"), Munch(id="b")])
+    assert find_image(conn, "koris-image").id == "a"
+    conn.image.images.assert_called_once_with(name="koris-image")
+
+
+def test_find_external_network():
+    """the networks are tried in order and only one is fetched"""
+    conn = mock.Mock()
+    conn.network.networks.side_effect = lambda **kw: iter(
+        [Munch(name=kw.get("name", "any"))]
+        if kw.get("name") in (None, "second") else [])
+    assert find_external_network(conn, "first", "second").name == "second"
+    assert find_external_network(conn, "first", None).name == "any"
+    assert conn.network.networks.call_args == mock.call(
+        is_router_external=True, limit=1)
+    assert find_external_network(conn, "first", autodetect=False) is None
@@ -0,0 +1,114 @@
+from unittest import mock
+
+from munch import Munch
+from cinderclient.exceptions import NotAcceptable
+
+from koris.cloud.inventory import ClusterInventory
+from koris.cloud.openstack import attach_ports, neutron_extensions
+
+
+def test_collect():
+    """every kind of resource is listed with a tag filtered request"""
+    nova, cinder, conn = (mock.MagicMock() for _ in range(3))
+    tagged = mock.MagicMock()
+    tagged.servers.list.return_value = [Munch(id=1, name="test-node-1")]
+    cinder.volumes.list.return_value = [Munch(id=2, name="test-node-1")]
+    conn.network.ports.return_value = iter([Munch(id=3)])
+
+    with mock.patch('koris.cloud.inventory.get_nova_microversion',
+                    return_value=tagged), \
+            mock.patch('koris.cloud.inventory.get_cinder_microversion',
+                       return_value=cinder):
+        inventory = ClusterInventory("test", nova, cinder, conn)
+        resources = inventory.collect()
+
+    assert set(resources) == set(ClusterInventory.kinds)
+    assert [s.id for s in resources["servers"]] == [1]
+    assert [v.id for v in resources["volumes"]] == [2]
+    assert [p.id for p in resources["ports"]] == [3]
+    tagged.servers.list.assert_called_once_with(
+        limit=100, marker=None, search_opts={'tags': 'koris-cluster=test'})
+    assert cinder.volumes.list.call_args_list == [
+        mock.call(limit=100, marker=None,
+                  search_opts={'metadata': {'koris-cluster': 'test'}}),
+        mock.call(limit=100, marker=None, search_opts={'name~': 'test-'})]
+    for kind in ("ports", "networks", "subnets", "routers",
+                 "security_groups"):
+        getattr(conn.network, kind).assert_called_once_with(
+            tags='koris-cluster=test')
+    conn.load_balancer.load_balancers.assert_called_once_with(
+        tags='koris-cluster=test')
+
+
+def test_untagged_resources():
+    """untagged servers and volumes of a cluster are found by name"""
+    nova, cinder = mock.MagicMock(), mock.MagicMock()
+    tagged = mock.MagicMock()
+    tagged.servers.list.return_value = [Munch(id=1, name="test-node-2")]
+    nova.servers.list.return_value = [Munch(id=0, name="test-master-1"),
+                                      Munch(id=1, name="test-node-2"),
+                                      Munch(id=9, name="other-node-1")]
+
+    cinder.volumes.list.return_value = [Munch(id=3, name="test-node-2")]
+    # cinder matches a part of the name
+    named = mock.MagicMock()
+    named.volumes.list.return_value = [Munch(id=2, name="test-master-1"),
+                                       Munch(id=3, name="test-node-2"),
+                                       Munch(id=5, name="mytest-node-1")]
+
+    with mock.patch('koris.cloud.inventory.get_nova_microversion',
+                    return_value=tagged), \
+            mock.patch('koris.cloud.inventory.get_cinder_microversion',
+                       return_value=named):
+        inventory = ClusterInventory("test", nova, cinder, mock.MagicMock())
+        resources = inventory.collect(("servers", "volumes"))
+
+    assert sorted(s.id for s in resources["servers"]) == [0, 1]
+    assert sorted(v.id for v in resources["volumes"]) == [2, 3]
+    cinder.volumes.list.assert_called_once()
+
+
+def test_volumes_without_name_filter():
+    """all volumes are listed only for clusters without volume metadata"""
+    cinder, named = mock.MagicMock(), mock.MagicMock()
+    named.volumes.list.side_effect = NotAcceptable(406)
+
+    def volumes(search_opts=None, **_):
+        if search_opts:
+            return []
+        return [Munch(id=2, name="test-master-1"), Munch(id=4, name=None),
+                Munch(id=5, name="mytest-node-1")]
+    cinder.volumes.list.side_effect = volumes
+
+    inventory = ClusterInventory("test", mock.MagicMock(), cinder,
+                                 mock.MagicMock())
+    with mock.patch('koris.cloud.inventory.get_cinder_microversion',
+                    return_value=named):
+        assert [v.id for v in inventory.volumes()] == [2]
+        assert cinder.volumes.list.call_count == 2
+
+        cinder.reset_mock()
+        cinder.volumes.list.side_effect = None
+        cinder.volumes.list.return_value = [Munch(id=3, name="test-node-2")]
+        assert [v.id for v in inventory.volumes()] == [3]
+        cinder.volumes.list.assert_called_once()
+
+
+def test_attach_ports_tags():
+    """ports are tagged in the bulk request if neutron supports it"""
+    def instances():
+        return [mock.Mock(exists=False, ports=[]) for _ in range(2)]
+
+    for aliases, replaced in ((['tag-ports-during-bulk-creation'], 0),
+                              ([], 2)):
+        neutron = mock.MagicMock()
+        neutron.list_extensions.return_value = {
+            'extensions': [{'alias': alias} for alias in aliases]}
+        neutron.create_port.side_effect = lambda body: {
+            'ports': [{'id': str(i)} for i, _ in enumerate(body['ports'])]}
+        attach_ports(neutron, instances(), "net", ["sg"], tags=["t"])
+
+        specs = neutron.create_port.call_args[0][0]['ports']
+        assert all(('tags' in spec) == (not replaced) for spec in specs)
+        assert neutron.replace_tag.call_count == replaced
+        neutron_extensions.cache_clear()
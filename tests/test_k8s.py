@@ -1,8 +1,14 @@
+from unittest import mock
+
 import pytest
+import urllib3
+from munch import Munch
+from kubernetes.client.rest import ApiException
 
 from .testdata import ETCD_RESPONSE
 
-from koris.deploy.k8s import parse_etcd_response
+from koris.deploy.k8s import (parse_etcd_response, K8S, MASTER_ROLE_LABEL,
+                              ReadinessProber)
 
 ETCD_PARSED_EXPECTED = {
     'master-1-ajk-test': {
@@ -46,3 +52,104 @@ def test_parse_etcd_response():
 #     for ip in INVALID_IPV4:
 #         with pytest.raises(RuntimeError):
 #             k8s.etcd_members("test", ip)
+
+
+def master_node(name, address, ready):
+    return Munch(metadata=Munch(name=name),
+                 status=Munch(
+                     addresses=[Munch(type="Hostname", address=name),
+                                Munch(type="InternalIP", address=address)],
+                     conditions=[Munch(type="Ready",
+                                       status="True" if ready else "False")]))
+
+
+def test_add_all_masters_to_loadbalancer():
+    """masters are added once, when they become ready"""
+    k8s = K8S.__new__(K8S)
+    k8s.api = mock.MagicMock()
+    lb = mock.MagicMock()
+    lb.master_listener = {'name': 'master-listener-test',
+                          'pool': {'id': 'pool-id',
+                                   'members': [{'address': '10.0.0.1'}]}}
+    events = [{'type': 'ADDED', 'object': master_node("m1", "10.0.0.1", True)},
+              {'type': 'ADDED', 'object': master_node("m2", "10.0.0.2", False)},
+              {'type': 'MODIFIED', 'object': master_node("m2", "10.0.0.2", True)},
+              {'type': 'MODIFIED', 'object': master_node("m2", "10.0.0.2", True)},
+              {'type': 'MODIFIED', 'object': master_node("m3", "10.0.0.3", True)}]
+
+    with mock.patch('koris.deploy.k8s.watch.Watch') as watch:
+        watch.return_value.stream.return_value = iter(events)
+        assert k8s.add_all_masters_to_loadbalancer("test", 3, lb)
+
+    assert watch.return_value.stream.call_args[1]['label_selector'] == \
+        MASTER_ROLE_LABEL
+    assert lb.add_member.call_args_list == [mock.call('pool-id', '10.0.0.2'),
+                                            mock.call('pool-id', '10.0.0.3')]
+    watch.return_value.stop.assert_called_once()
+
+    with mock.patch('koris.deploy.k8s.watch.Watch') as watch:
+        watch.return_value.stream.side_effect = lambda *a, **kw: iter([])
+        assert not k8s.add_all_masters_to_loadbalancer("test", 3, lb,
+                                                       timeout=0.01)
+
+
+def test_add_all_masters_watch_breaks():
+    """the masters are listed, when the watch breaks"""
+    k8s = K8S.__new__(K8S)
+    k8s.api = mock.MagicMock()
+    k8s.api.list_node.return_value.items = [
+        master_node("m1", "10.0.0.1", True),
+        master_node("m2", "10.0.0.2", True)]
+    lb = mock.MagicMock()
+    lb.master_listener = {'name': 'master-listener-test',
+                          'pool': {'id': 'pool-id', 'members': []}}
+
+    with mock.patch('koris.deploy.k8s.watch.Watch') as watch, \
+            mock.patch('koris.deploy.k8s.time.sleep') as sleep:
+        watch.return_value.stream.side_effect = ApiException(status=410)
+        assert k8s.add_all_masters_to_loadbalancer("test", 2, lb)
+
+    assert lb.add_member.call_args_list == [mock.call('pool-id', '10.0.0.1'),
+                                            mock.call('pool-id', '10.0.0.2')]
+    sleep.assert_not_called()
+
+
+def test_readiness_prober():
+    """endpoints are probed until the required ones are ready"""
+    prober = ReadinessProber({"loadbalancer": "https://10.0.0.5:6443",
+                              "master-1": "https://10.0.0.1:6443",
+                              "master-2": "https://10.0.0.2:6443"})
+    answers = {"https://10.0.0.5:6443/readyz": [500, 200],
+               "https://10.0.0.1:6443/readyz": [404],
+               "https://10.0.0.1:6443/healthz": [200],
+               "https://10.0.0.2:6443/readyz": [None, None]}
+    requests = []
+
+    def request(method, url, **kwargs):
+        requests.append(url)
+        assert kwargs['retries'] is False
+        status = answers[url].pop(0)
+        if status is None:
+            raise urllib3.exceptions.ConnectTimeoutError()
+        return Munch(status=status)
+
+    with mock.patch.object(prober.http, 'request', side_effect=request):
+        with mock.patch('koris.deploy.k8s.time.sleep') as sleep:
+            ready_at = prober.wait(require=["loadbalancer"], interval=1,
+                                   backoff=2)
+
+    assert ready_at["loadbalancer"] is not None
+    assert ready_at["master-1"] is not None
+    assert ready_at["master-2"] is None
+    # the ready master is not probed again
+    assert requests.count("https://10.0.0.1:6443/healthz") == 1
+    sleep.assert_called_once_with(1)
+
+
+def test_readiness_prober_timeout():
+    """TimeoutError is raised if the required endpoints are never ready"""
+    prober = ReadinessProber({"loadbalancer": "https://10.0.0.5:6443"})
+    with mock.patch.object(prober.http, 'request',
+                           return_value=Munch(status=503)):
+        with pytest.raises(TimeoutError):
+            prober.wait(timeout=0, interval=0)
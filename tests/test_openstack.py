@@ -1,11 +1,18 @@
+import asyncio
 import copy
 
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock, Mock, patch
 
 import pytest
+from munch import Munch
+from novaclient.exceptions import NotAcceptable as NovaNotAcceptable
+from openstack.exceptions import HttpException
 
 from koris.cloud.openstack import (OSNetwork, get_connection, LoadBalancer,
-                                   distribute_host_zones, get_clients)
+                                   distribute_host_zones, get_clients,
+                                   get_session,
+                                   StatusPoller, BuilderError, Instance,
+                                   SecurityGroup, LAUNCH_INDEX, launch_order)
 from koris.cloud import OpenStackAPI
 from .testdata import (CONFIG, default_data, mock_listener,
                        mock_pool, mock_member, mock_pool_info)
@@ -18,24 +25,25 @@ class Network:
         self.id = id
 
 
-def both_valid_networks(*args, **kwargs):
-    return [Network("ext01", "alskdqw1"), Network("ext02", "asodkaklsd22")]
+def networks(*nets):
+    """mock conn.network.networks, which filters by name"""
+    def list_networks(name=None, **kwargs):
+        return iter([net for net in nets if name in (None, net.name)])
+    return list_networks
 
 
-def no_networks(*args, **kwargs):
-    return []
+both_valid_networks = networks(Network("ext01", "alskdqw1"),
+                               Network("ext02", "asodkaklsd22"))
 
+no_networks = networks()
 
-def other_networks(*args, **kwargs):
-    return [Network("hello", "bgp-noris")]
+other_networks = networks(Network("hello", "bgp-noris"))
 
+valid_plus_other = networks(Network("hello", "ajsdlk"),
+                            Network("ext02", "asodkaklsd22"))
 
-def valid_plus_other(*args, **kwargs):
-    return [Network("hello", "ajsdlk"), Network("ext02", "asodkaklsd22")]
-
-
-def valid_fallback(*args, **kwargs):
-    return [Network("hello", "ajsdlk"), Network("ext01", "asodkaklsd22")]
+valid_fallback = networks(Network("hello", "ajsdlk"),
+                          Network("ext01", "asodkaklsd22"))
 
 
 def test_find_external_network():
@@ -80,17 +88,21 @@ def test_get_connection():
     conn = get_connection()
     assert conn
 
+    # the connection and the clients share one session
+    assert conn.session is get_session()
+    assert get_clients()[0].client.session is get_session()
+
     # RC file not sourced
-    with patch.object(OpenStackAPI,
-                      'connect',
+    with patch.object(OpenStackAPI.connection,
+                      'Connection',
                       side_effect=OpenStackAPI.exceptions.ConfigException):
 
         with pytest.raises(SystemExit):
             conn = get_connection()
 
     # Other error
-    with patch.object(OpenStackAPI,
-                      'connect',
+    with patch.object(OpenStackAPI.connection,
+                      'Connection',
                       return_value=None):
 
         with pytest.raises(SystemExit):
@@ -130,48 +142,12 @@ def test_master_listener_unitialized_lb(get_os):
     assert lb._get_master_listener() is None
 
 
-def test_get_master_listener_lb_not_found(get_os):
-    """
-    lb._get_master_listener should return None if an exception is thrown
-    while trying to locate the LB
-    """
+def test_get_master_listener_no_listeners(get_os):
+    """If a LB has no listeners, return None"""
 
     conn, lb = get_os
-
-    conn.load_balancer.find_load_balancer.return_value = None
-    assert lb._get_master_listener() is None
-
-
-def test_get_master_listener_no_listener_ids(get_os):
-    """If a returned LB has no listeners, return None"""
-
-    conn, lb = get_os
-
-    mock_lb = default_data()
-    mock_lb.listeners = []
-    conn.load_balancer.find_load_balancer.return_value = mock_lb
-    assert lb._get_master_listener() is None
-
-    mock_lb.listeners = None
-    assert lb._get_master_listener() is None
-
-
-def test_get_master_listener_invalid_listeners(get_os):
-    """If the structure of the lb.listeners dict changes, return None"""
-
-    conn, lb = get_os
-    mock_lb = default_data()
-    mock_lb.listeners = ["a", "b", "c"]
-    conn.load_balancer.find_load_balancer.return_value = mock_lb
-    assert lb._get_master_listener() is None
-
-    mock_lb.listeners = "test"
-    assert lb._get_master_listener() is None
-
-    mock_lb.listeners = {}
-    assert lb._get_master_listener() is None
-
-    mock_lb.listeners = None
+    conn.load_balancer.listeners.return_value = []
+    conn.load_balancer.pools.return_value = []
     assert lb._get_master_listener() is None
 
 
@@ -179,8 +155,9 @@ def test_get_master_listener_no_master_listener(get_os):
     """If there are no Listeners with name master-listener, return None"""
 
     conn, lb = get_os
-    conn.load_balancer.find_load_balancer.return_value = default_data()
-    conn.load_balancer.find_listener.return_value = None
+    l1 = mock_listener()
+    l1.name = "dex-listener"
+    conn.load_balancer.listeners.return_value = [l1]
     assert lb._get_master_listener() is None
 
 
@@ -191,10 +168,11 @@ def test_get_master_listener_multiple_master_listeners(get_os):
     """
 
     conn, lb = get_os
-    conn.load_balancer.find_load_balancer.return_value = default_data()
-    conn.load_balancer.find_listener.side_effect = [mock_listener(),
-                                                    mock_listener(),
-                                                    mock_listener()]
+    listeners = [mock_listener(), mock_listener(), mock_listener()]
+    for i, listener in enumerate(listeners):
+        listener.id = str(i)
+        listener.name = MASTER_LISTENER_NAME + '-test'
+    conn.load_balancer.listeners.return_value = listeners
     assert lb._get_master_listener() is None
 
 
@@ -204,32 +182,33 @@ def test_get_master_listener_found_master_listener(get_os):
     conn, lb = get_os
 
     l1, l2, l3 = mock_listener(), mock_listener(), mock_listener()
-    l2.name, l3.name = "dex-listener", "oauth-listener"
+    l1.name = MASTER_LISTENER_NAME + '-test'
+    l2.id, l2.name = "l2", "dex-listener"
+    l3.id, l3.name = "l3", "oauth-listener"
 
-    conn.load_balancer.find_load_balancer.return_value = default_data()
-    conn.load_balancer.find_listener.side_effect = [l1, l2, l3]
-    assert lb._get_master_listener() is not None
-    assert l1.default_pool_id is not None
-    assert l2.default_pool_id is not None
-    assert l3.default_pool_id is not None
+    conn.load_balancer.listeners.return_value = [l1, l2, l3]
+    assert lb._get_master_listener() is l1
+    conn.load_balancer.listeners.assert_called_once_with(
+        load_balancer_id=lb._id)
+    conn.load_balancer.find_listener.assert_not_called()
 
 
 def test_pool_info_no_pool(get_os):
     """OpenStack can't find the pool"""
 
     conn, lb = get_os
-    conn.load_balancer.find_pool.return_value = None
+    conn.load_balancer.pools.return_value = []
     assert lb._pool_info("test") is None
 
 
 def test_pool_info_no_member(get_os):
-    """A Pool has members assigned but they can't be retrieved."""
+    """A Pool has no members."""
 
     conn, lb = get_os
     mp = mock_pool()
 
-    conn.load_balancer.find_pool.return_value = mock_pool()
-    conn.load_balancer.find_member.side_effect = [None, None, None]
+    conn.load_balancer.pools.return_value = [mp]
+    conn.load_balancer.members.return_value = []
 
     pool = lb._pool_info(mp.id)
     assert pool['name'] == mp.name
@@ -242,10 +221,10 @@ def test_pool_info_pool_unhappy_names(get_os):
 
     conn, lb = get_os
     mp = mock_pool()
-    conn.load_balancer.find_pool.return_value = mp
+    conn.load_balancer.pools.return_value = [mp]
+    conn.load_balancer.members.return_value = []
 
     for name in ['', None, '-1', 'False', 'True', 'ヽ༼ຈل͜ຈ༽ﾉ ヽ༼ຈل͜ຈ༽ﾉ', '🐵 🙈']:
-        conn.load_balancer.find_member.side_effect = [None, None, None]
         mp.name = name
         pool = lb._pool_info(mp.id)
         assert pool['name'] == mp.name
@@ -257,8 +236,8 @@ def test_pool_info_single_member(get_os):
     conn, lb = get_os
     mp = mock_pool()
     mem = mock_member(1)
-    conn.load_balancer.find_pool.return_value = mock_pool()
-    conn.load_balancer.find_member.side_effect = [mem, None, None]
+    conn.load_balancer.pools.return_value = [mp]
+    conn.load_balancer.members.return_value = [mem]
 
     pool = lb._pool_info(mp.id)
     assert pool['name'] == mp.name
@@ -276,8 +255,8 @@ def test_pool_all_members(get_os):
     conn, lb = get_os
     mp = mock_pool()
     mem = [mock_member(1), mock_member(2), mock_member(3)]
-    conn.load_balancer.find_pool.return_value = mock_pool()
-    conn.load_balancer.find_member.side_effect = mem
+    conn.load_balancer.pools.return_value = [mp]
+    conn.load_balancer.members.return_value = mem
 
     pool = lb._pool_info(mp.id)
     assert pool['name'] == mp.name
@@ -289,6 +268,35 @@ def test_pool_all_members(get_os):
         assert pool['members'][i]['address'] == mem[i].address
 
 
+def test_master_listener_constant_api_calls(get_os):
+    """The master listener costs the same calls, regardless of the pool size,
+    and is fetched again after a change of the LB"""
+
+    conn, lb = get_os
+    listener = mock_listener()
+    listener.name = MASTER_LISTENER_NAME + '-test'
+    mp = mock_pool()
+    listener.default_pool_id = mp.id
+    conn.load_balancer.listeners.return_value = [listener]
+    conn.load_balancer.pools.return_value = [mp]
+    conn.load_balancer.members.return_value = [mock_member(i)
+                                               for i in range(1, 4)] * 10
+    conn.load_balancer.get_load_balancer.return_value = Munch(
+        provisioning_status="ACTIVE")
+
+    for _ in range(3):
+        assert len(lb.master_listener['pool']['members']) == 30
+    assert conn.load_balancer.listeners.call_count == 1
+    assert conn.load_balancer.pools.call_count == 1
+    assert conn.load_balancer.members.call_count == 1
+    conn.load_balancer.find_member.assert_not_called()
+
+    lb.add_member(mp.id, "10.0.0.4")
+    lb.master_listener
+    assert conn.load_balancer.listeners.call_count == 2
+    assert conn.load_balancer.members.call_count == 2
+
+
 def test_master_listener_no_listener(get_os):
     _, lb = get_os
     lb._get_master_listener = MagicMock(return_value=None)
@@ -404,3 +412,330 @@ def test_create_loadbalancer_with_floating():
     lb = LoadBalancer(config, MagicMock())
     assert lb
     assert lb.floatingip == fip
+
+
+def test_status_poller_batches_requests():
+    """All pending volumes are resolved with one list request per tick"""
+    cinder = MagicMock()
+    cinder.volumes.list.side_effect = [
+        [Munch(id="a", status="creating"), Munch(id="b", status="creating")],
+        [Munch(id="a", status="available"), Munch(id="b", status="creating")],
+        [Munch(id="a", status="available"), Munch(id="b", status="available")],
+    ]
+    poller = StatusPoller(MagicMock(), cinder, cluster_name="test",
+                          interval=0.01, max_interval=0.02)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        vol_a, vol_b = loop.run_until_complete(asyncio.gather(
+            poller.wait_for_volume("a"), poller.wait_for_volume("b")))
+    finally:
+        loop.close()
+        asyncio.set_event_loop(asyncio.new_event_loop())
+
+    assert vol_a.id == "a" and vol_b.id == "b"
+    assert cinder.volumes.list.call_count == 3
+    cinder.volumes.list.assert_called_with(
+        search_opts={'metadata': {'koris-cluster': 'test'}})
+    assert poller.pending == 0
+
+
+def test_status_poller_server_error():
+    """A server in ERROR state raises a BuilderError in the waiter"""
+    nova = MagicMock()
+    nova.servers.list.return_value = [Munch(id="a", status="ERROR")]
+    poller = StatusPoller(nova, MagicMock(), cluster_name="test",
+                          interval=0.01)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        with pytest.raises(BuilderError):
+            loop.run_until_complete(poller.wait_for_server("a"))
+    finally:
+        loop.close()
+        asyncio.set_event_loop(asyncio.new_event_loop())
+
+    nova.servers.list.assert_called_with(search_opts={'name': '^test-'})
+
+
+def test_status_poller_missing_server():
+    """A server which is not listed any more fails its waiter"""
+    nova = MagicMock()
+    nova.servers.list.side_effect = [
+        [], [], [Munch(id="a", status="BUILD")], [], [],
+        [Munch(id="a", status="ACTIVE")]]
+    poller = StatusPoller(nova, MagicMock(), cluster_name="test",
+                          interval=0.01, max_interval=0.01, max_missing=3)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        found, missing = loop.run_until_complete(asyncio.gather(
+            poller.wait_for_server("a"), poller.wait_for_server("b"),
+            return_exceptions=True))
+    finally:
+        loop.close()
+        asyncio.set_event_loop(asyncio.new_event_loop())
+
+    assert found.status == "ACTIVE"
+    assert isinstance(missing, BuilderError)
+    assert "not found in 3 polls" in str(missing)
+    assert poller.pending == 0
+
+
+def test_create_batch():
+    """A batch of instances is booted with a single request"""
+    def server(num):
+        srv = MagicMock(id="id-%d" % num, status="ACTIVE")
+        srv.name = "test-node-%d" % num if num == 1 else "test-node-1-%d" % num
+        setattr(srv, LAUNCH_INDEX, num - 1)
+        srv.interface_list.return_value = [
+            Mock(fixed_ips=[{'ip_address': '10.0.0.%d' % num}])]
+        return srv
+
+    servers = [server(2), server(1)]
+    nova = MagicMock()
+    nova.servers.list.return_value = servers
+    poller = StatusPoller(nova, MagicMock(), cluster_name="test",
+                          interval=0.01)
+    volume_config = {'image': Munch(id="image-id"), 'class': 'Fast',
+                     'size': 10}
+    instances = [Instance(MagicMock(), nova, "test-node-%d" % i,
+                          {'id': 'net-id'}, 'zone', 'node', volume_config,
+                          'flavor', poller=poller) for i in (1, 2)]
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        with patch('koris.cloud.openstack.nvclient.Client') as client:
+            client.return_value = nova
+            nova.servers.create.return_value = "r-1"
+            result = loop.run_until_complete(Instance.create_batch(
+                instances, 'flavor', ['sg'], Munch(name='key'), 'userdata'))
+    finally:
+        loop.close()
+        asyncio.set_event_loop(asyncio.new_event_loop())
+
+    assert nova.servers.create.call_count == 1
+    kwargs = nova.servers.create.call_args[1]
+    assert kwargs['min_count'] == kwargs['max_count'] == 2
+    assert kwargs['block_device_mapping_v2'][0]['uuid'] == "image-id"
+    assert [inst.ip_address for inst in result] == ['10.0.0.1', '10.0.0.2']
+    servers[1].update.assert_not_called()
+    servers[0].update.assert_called_once_with(name="test-node-2")
+    assert all(inst.exists for inst in result)
+
+
+def test_create_without_tags():
+    """servers are created untagged if nova does not support tags"""
+    server = MagicMock(id="id-1", status="ACTIVE")
+    server.name = "test-node-1"
+    server.interface_list.return_value = [
+        Mock(fixed_ips=[{'ip_address': '10.0.0.1'}])]
+    nova, tagged = MagicMock(), MagicMock()
+    nova.servers.list.return_value = [server]
+    nova.servers.create.return_value = server
+    tagged.servers.create.side_effect = NovaNotAcceptable(406)
+    poller = StatusPoller(nova, MagicMock(), cluster_name="test",
+                          interval=0.01)
+    inst = Instance(MagicMock(), nova, "test-node-1", {'id': 'net-id'},
+                    'zone', 'node', {}, 'flavor', poller=poller)
+    inst.ports.append({'port': {'id': 'port-id',
+                                'fixed_ips': [{'ip_address': '10.0.0.1'}]}})
+
+    async def create_volume():
+        return {'uuid': 'vol-id'}
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        with patch('koris.cloud.openstack.nvclient.Client',
+                   return_value=tagged), \
+                patch.object(inst, '_create_volume', create_volume):
+            loop.run_until_complete(inst.create(
+                'flavor', ['sg'], Munch(name='key'), 'userdata'))
+    finally:
+        loop.close()
+        asyncio.set_event_loop(asyncio.new_event_loop())
+
+    assert tagged.servers.create.call_args[1]['tags'] == ['koris-cluster=test']
+    assert 'tags' not in nova.servers.create.call_args[1]
+    assert inst.exists and inst.ip_address == '10.0.0.1'
+
+
+def test_launch_order():
+    """servers of a reservation are ordered without parsing their names"""
+    def server(sid, index=None, created=None):
+        srv = Munch(id=sid, name="custom-name", created=created)
+        if index is not None:
+            srv[LAUNCH_INDEX] = index
+        return srv
+
+    servers = [server("a", 2), server("b", 0), server("c", 1)]
+    assert [srv.id for srv in sorted(servers, key=launch_order)] == [
+        "b", "c", "a"]
+    servers = [server("a", created="2019-03-01T10:00:02Z"),
+               server("b", created="2019-03-01T10:00:01Z")]
+    assert [srv.id for srv in sorted(servers, key=launch_order)] == [
+        "b", "a"]
+
+
+def test_create_batch_deletes_unmatched_servers():
+    """servers are deleted if the reservation has not one per instance"""
+    server = MagicMock(id="id-1", status="ACTIVE")
+    nova = MagicMock()
+    nova.servers.list.return_value = [server]
+    volume_config = {'image': Munch(id="image-id"), 'class': 'Fast'}
+    instances = [Instance(MagicMock(), nova, "test-node-%d" % i,
+                          {'id': 'net-id'}, 'zone', 'node', volume_config,
+                          'flavor', poller=MagicMock()) for i in (1, 2)]
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        with patch('koris.cloud.openstack.nvclient.Client') as client:
+            client.return_value = nova
+            with pytest.raises(BuilderError):
+                loop.run_until_complete(Instance.create_batch(
+                    instances, 'flavor', ['sg'], Munch(name='key'),
+                    'userdata'))
+    finally:
+        loop.close()
+        asyncio.set_event_loop(asyncio.new_event_loop())
+
+    server.delete.assert_called_once_with()
+    server.update.assert_not_called()
+
+
+def test_security_group_configure_only_missing_rules():
+    """existing rules are not created again and the rest in one request"""
+    conn = MagicMock()
+    conn.network.security_group_rules.return_value = [
+        Munch(direction='ingress', ethertype='IPv4', protocol='tcp',
+              port_range_min=22, port_range_max=22, remote_ip_prefix=None,
+              remote_group_id=None),
+        Munch(direction='egress', ethertype='IPv4', protocol='4',
+              port_range_min=None, port_range_max=None,
+              remote_ip_prefix='10.0.0.0/24', remote_group_id=None)]
+    conn.network.post.return_value = Mock(status_code=201)
+
+    sg = SecurityGroup("test", conn, {'cidr': '10.0.0.0/24'})
+    sg.id = "sg-id"
+    sg.configure()
+
+    conn.network.security_group_rules.assert_called_once_with(
+        security_group_id="sg-id")
+    assert conn.network.post.call_count == 1
+    rules = conn.network.post.call_args[1]['json']['security_group_rules']
+    assert len(rules) == len(SecurityGroup.rules) - 2
+    assert all(rule['security_group_id'] == "sg-id" for rule in rules)
+    assert dict(direction='ingress', protocol='TCP', port_range_max=22,
+                port_range_min=22, security_group_id="sg-id") not in rules
+    assert dict(direction='ingress', protocol='TCP', port_range_max=80,
+                port_range_min=80, remote_ip_prefix='10.0.0.0/24',
+                security_group_id="sg-id") in rules
+    conn.network.create_security_group_rule.assert_not_called()
+
+    conn.network.post.reset_mock()
+    conn.network.security_group_rules.return_value = [
+        Munch(rule, ethertype='IPv4') for rule in sg.desired_rules()]
+    sg.configure()
+    conn.network.post.assert_not_called()
+
+
+def test_create_fully_populated_loadbalancer():
+    """the LoadBalancer is created with its listeners in one request"""
+    conn = MagicMock()
+    conn.get_subnet.return_value = Munch(id="subnet-id")
+    conn.load_balancer.post.return_value = Mock(
+        status_code=201, json=lambda: {'loadbalancer': {'id': 'lb-id'}})
+    conn.load_balancer.get_load_balancer.return_value = Munch(id="lb-id")
+
+    lb = LoadBalancer(CONFIG, conn)
+    lb.create(listeners=[lb.master_listener_spec(["10.0.0.4"])])
+
+    assert lb.populated
+    assert lb._id == "lb-id"
+    conn.load_balancer.create_load_balancer.assert_not_called()
+    conn.network.create_listener.assert_not_called()
+    path, = conn.load_balancer.post.call_args[0]
+    assert path == '/lbaas/loadbalancers'
+    body = conn.load_balancer.post.call_args[1]['json']['loadbalancer']
+    pool = body['listeners'][0]['default_pool']
+    assert body['listeners'][0]['name'].startswith(MASTER_LISTENER_NAME)
+    assert pool['name'].startswith(MASTER_POOL_NAME)
+    assert pool['members'] == [{'address': '10.0.0.4', 'protocol_port': 6443,
+                                'subnet_id': 'subnet-id'}]
+    assert pool['healthmonitor']['type'] == 'TCP'
+
+
+def test_create_loadbalancer_incremental_fallback():
+    """without support for fully populated LoadBalancers, the listeners are
+    created one resource at a time"""
+    conn = MagicMock()
+    conn.get_subnet.return_value = Munch(id="subnet-id")
+    conn.load_balancer.post.side_effect = HttpException(
+        message="not supported", http_status=404)
+    conn.load_balancer.create_load_balancer.return_value = Munch(id="lb-id")
+    conn.load_balancer.get_load_balancer.return_value = Munch(
+        id="lb-id", provisioning_status="ACTIVE")
+
+    lb = LoadBalancer(CONFIG, conn)
+    lb.create(listeners=[lb.master_listener_spec(["10.0.0.4", "10.0.0.5"])])
+
+    assert lb.populated
+    assert conn.load_balancer.post.call_count == 2
+    conn.load_balancer.create_load_balancer.assert_called_once()
+    conn.network.create_listener.assert_called_once()
+    conn.network.create_pool.assert_called_once()
+    assert conn.network.create_pool_member.call_count == 2
+    conn.network.create_health_monitor.assert_called_once()
+
+
+def test_create_populated_loadbalancer_bad_request():
+    """only bad requests for the nested resources fall back"""
+    conn = MagicMock()
+    conn.get_subnet.return_value = Munch(id="subnet-id")
+    conn.load_balancer.post.side_effect = HttpException(
+        message="Bad Request", details="Invalid input for field/attribute "
+        "vip_subnet_id", http_status=400)
+
+    lb = LoadBalancer(CONFIG, conn)
+    with pytest.raises(HttpException):
+        lb.create(listeners=[lb.master_listener_spec(["10.0.0.4"])])
+    conn.load_balancer.create_load_balancer.assert_not_called()
+
+    conn.load_balancer.post.side_effect = HttpException(
+        message="Bad Request", details="Unrecognized attribute(s) "
+        "'listeners'", http_status=400)
+    conn.load_balancer.create_load_balancer.return_value = Munch(id="lb-id")
+    conn.load_balancer.get_load_balancer.return_value = Munch(
+        id="lb-id", provisioning_status="ACTIVE")
+    lb = LoadBalancer(CONFIG, conn)
+    with patch.object(LoadBalancer, "add_listeners") as add_listeners:
+        lb.create(listeners=[lb.master_listener_spec(["10.0.0.4"])])
+    conn.load_balancer.create_load_balancer.assert_called_once()
+    add_listeners.assert_called_once()
+
+
+def test_wait_for_active(get_os):
+    """mutations wait until the LoadBalancer is ACTIVE"""
+    conn, lb = get_os
+    conn.load_balancer.get_load_balancer.side_effect = [
+        Munch(provisioning_status="PENDING_UPDATE"),
+        Munch(provisioning_status="PENDING_UPDATE"),
+        Munch(provisioning_status="ACTIVE"),
+        Munch(provisioning_status="ACTIVE")]
+
+    lb.add_member("pool-id", "10.0.0.4")
+    lb.wait_for_active()
+    assert len(lb.wait_times["add_member"]) == 1
+    assert lb.wait_times["add_member"][0] > 0
+    assert lb.wait_times["wait"][0] < 0.5
+    conn.network.create_pool_member.assert_called_once()
+
+    conn.load_balancer.get_load_balancer.side_effect = None
+    conn.load_balancer.get_load_balancer.return_value = Munch(
+        provisioning_status="ERROR")
+    with pytest.raises(BuilderError):
+        lb.wait_for_active()
+    lb.wait_for_active(accept_error=True)
@@ -0,0 +1,276 @@
+import json
+import time
+
+from unittest import mock
+
+import pytest
+
+from koris import bench
+from koris.cloud.simulator import LatencyModel, Simulator
+from koris.util.apistats import API_STATS, ApiStats
+from koris.util.perfstore import (PerfRecorder, PerfStore, compare,
+                                  extract_runs, percentile, sparkline,
+                                  store_path)
+from koris.util.tracing import TRACER, Tracer
+
+
+def traced_apply(tracer, boot_time=0.02, zone="de-nbg6-1a", fail=False):
+    """trace an apply of a cluster with one master and two nodes
+
+    The spans are timed with a clock which only advances by the boot time
+    of the instances, thus their durations are exact.
+    """
+    attrs = {"cluster": "test", "masters": 1, "nodes": 2,
+             "master_flavor": "ECS.GP1.2-8", "node_flavor": "ECS.C1.4-8",
+             "zones": zone, "k8s_version": "1.13.4"}
+    clock = [time.time()]
+    with mock.patch("koris.util.tracing.time",
+                    mock.Mock(time=lambda: clock[0])):
+        try:
+            with tracer.span("apply", **attrs):
+                with tracer.span("nodes"):
+                    for idx, role in enumerate(("master", "node", "node")):
+                        with tracer.span("instance",
+                                         host="%s-%d" % (role, idx),
+                                         role=role, zone=zone):
+                            clock[0] += boot_time
+                if fail:
+                    raise RuntimeError("quota exceeded")
+        except RuntimeError:
+            pass
+
+
+def api_calls(count, duration=0.01):
+    stats = ApiStats()
+    for idx in range(count):
+        stats.record("GET", "compute", "https://nova/v2.1/servers/%d" % idx,
+                     200 if idx else 404, duration, retries=idx % 2)
+    return stats.calls
+
+
+@pytest.fixture
+def store(tmpdir):
+    store = PerfStore(str(tmpdir.join("perf", "perf.sqlite")))
+    yield store
+    store.close()
+
+
+def test_store_path(monkeypatch):
+    monkeypatch.setenv("KORIS_PERF_DB", "/tmp/perf.sqlite")
+    assert store_path() == "/tmp/perf.sqlite"
+    monkeypatch.delenv("KORIS_PERF_DB")
+    monkeypatch.setenv("XDG_DATA_HOME", "/data")
+    assert store_path() == "/data/koris/perf.sqlite"
+
+
+def test_percentile():
+    assert percentile([], 50) is None
+    assert percentile([3], 90) == 3
+    assert percentile([4, 1, 3, 2], 50) == 2.5
+    assert percentile(range(11), 90) == 9
+
+
+def test_compare():
+    assert compare([10]) == (None, None, False)
+    baseline, change, regression = compare([10, 12, 11, 10, 15])
+    assert baseline == 10.5
+    assert change == pytest.approx(15 / 10.5 - 1)
+    assert regression
+    # too few runs to tell
+    assert not compare([10, 15])[2]
+    # only the window before the last run counts
+    assert not compare([1, 1, 1, 10, 10, 10, 11], window=3)[2]
+
+
+def test_sparkline():
+    assert sparkline([]) == ""
+    assert sparkline([2, 2]) == "▁▁"
+    assert sparkline([1, 2, 3]) == "▁▄█"
+
+
+def test_extract_runs():
+    tracer = Tracer()
+    tracer.enable()
+    with tracer.span("lb_configure"):
+        pass
+    traced_apply(tracer)
+    runs = extract_runs(tracer.spans, api_calls(4), "1.1.0")
+
+    assert len(runs) == 1
+    run = runs[0]
+    assert run["operation"] == "apply"
+    assert (run["masters"], run["nodes"]) == (1, 2)
+    assert run["koris_version"] == "1.1.0"
+    assert run["error"] is None
+    assert [item["name"] for item in run["phases"]] == ["nodes"]
+    assert sorted((item["role"], item["flavor"])
+                  for item in run["instances"]) == [
+                      ("master", "ECS.GP1.2-8"), ("node", "ECS.C1.4-8"),
+                      ("node", "ECS.C1.4-8")]
+    assert [item["boot_time"] for item in run["instances"]] == \
+        pytest.approx([0.02] * 3)
+    assert (run["api_calls"], run["api_errors"], run["api_retries"]) == \
+        (4, 1, 2)
+    assert run["api"][0]["template"] == "/v2.1/servers/{id}"
+    assert run["api"][0]["p50"] == pytest.approx(0.01)
+
+
+def test_extract_runs_flavor_of_role():
+    tracer = Tracer()
+    tracer.enable()
+    with tracer.span("add_node", cluster="test", role="node", amount=1,
+                     flavor="ECS.C1.8-16", zone="de-nbg6-1b"):
+        with tracer.span("instance", host="node-4", role="node",
+                         zone="de-nbg6-1b"):
+            pass
+    run, = extract_runs(tracer.spans)
+    assert run["node_flavor"] == "ECS.C1.8-16"
+    assert run["zones"] == "de-nbg6-1b"
+    assert run["instances"][0]["flavor"] == "ECS.C1.8-16"
+
+
+def test_record_and_keep(tmpdir):
+    store = PerfStore(str(tmpdir.join("perf.sqlite")), keep=3)
+    for _ in range(5):
+        tracer = Tracer()
+        tracer.enable()
+        traced_apply(tracer, boot_time=0)
+        assert len(store.record(tracer.spans, api_calls(2))) == 1
+
+    runs = store.runs()
+    assert len(runs) == 3
+    assert runs == sorted(runs, key=lambda run: run["started"])
+    count, = store.conn.execute("SELECT COUNT(*) FROM instances").fetchone()
+    assert count == 9
+    assert len(store.runs(operation="destroy")) == 0
+    assert len(store.runs(cluster="test", last=2)) == 2
+    store.close()
+
+
+def test_report_regressions(store):
+    # the boot times in one zone grew, the cloud is slower
+    for boot_time, zone in [(0.01, "de-nbg6-1a")] * 4 + \
+            [(0.01, "de-nbg6-1b")] * 4 + [(0.06, "de-nbg6-1b")]:
+        tracer = Tracer()
+        tracer.enable()
+        traced_apply(tracer, boot_time, zone)
+        store.record(tracer.spans, api_calls(3))
+
+    report = store.report()
+    assert report["runs"] == 9
+    assert len(report["operations"]) == 1
+    assert report["operations"][0]["key"] == ("apply", "1+2")
+    assert len(report["operations"][0]["series"]) == 9
+    assert {item["key"] for item in report["boot_times"]} == {
+        ("de-nbg6-1a", "ECS.GP1.2-8", "master"),
+        ("de-nbg6-1a", "ECS.C1.4-8", "node"),
+        ("de-nbg6-1b", "ECS.GP1.2-8", "master"),
+        ("de-nbg6-1b", "ECS.C1.4-8", "node")}
+    assert report["api"][0]["service"] == "compute"
+    assert report["api"][0]["calls"]["last"] == 3
+    assert not report["api"][0]["calls"]["regression"]
+
+    regressions = {(item["kind"], item["key"])
+                   for item in report["regressions"]}
+    assert ("operation", ("apply", "1+2")) in regressions
+    assert ("boot_time", ("de-nbg6-1b", "ECS.C1.4-8", "node")) in regressions
+    assert all(item["source"] != "koris" for item in report["regressions"])
+
+    text = store.format_report()
+    assert "Regressions:" in text
+    assert "[cloud] boot time de-nbg6-1b / ECS.C1.4-8 / node" in text
+    json.dumps(report)
+
+
+def test_report_more_api_calls(store):
+    for count in (3, 3, 3, 8):
+        tracer = Tracer()
+        tracer.enable()
+        traced_apply(tracer, boot_time=0)
+        store.record(tracer.spans, api_calls(count))
+
+    # the durations of runs without boot times are too short to compare
+    regressions = store.report(threshold=0.5)["regressions"]
+    assert [(item["kind"], item["key"]) for item in regressions
+            if item["source"]] == [("api_calls", ("compute",))]
+
+
+def test_report_leaves_out_failed_runs(store):
+    tracer = Tracer()
+    tracer.enable()
+    traced_apply(tracer, boot_time=0, fail=True)
+    store.record(tracer.spans)
+
+    assert store.runs()[0]["error"] == "RuntimeError: quota exceeded"
+    report = store.report()
+    assert report["runs"] == 1
+    assert not report["operations"]
+    assert "apply" in store.format_runs()
+
+
+def test_report_empty(store):
+    assert store.format_report().startswith("No runs recorded")
+
+
+def test_recorder(tmpdir, monkeypatch):
+    path = str(tmpdir.join("perf.sqlite"))
+    monkeypatch.setenv("KORIS_PERF_DB", path)
+    tracer = Tracer()
+    tracer.enable()
+    traced_apply(tracer, boot_time=0)
+    recorder = PerfRecorder()
+
+    with mock.patch("koris.util.perfstore.atexit") as atexit, \
+            mock.patch("koris.util.perfstore.TRACER", tracer), \
+            mock.patch("koris.util.perfstore.API_STATS", ApiStats()):
+        recorder.start("1.1.0")
+        atexit.register.assert_called_once_with(recorder.record)
+        recorder.stop()
+        recorder.record()
+        assert not tmpdir.join("perf.sqlite").exists()
+
+        recorder.start("1.1.0")
+        recorder.record()
+
+    store = PerfStore(path)
+    assert [run["koris_version"] for run in store.runs()] == ["1.1.0"]
+    store.close()
+
+
+def test_recorder_never_fails(tmpdir, monkeypatch):
+    tmpdir.join("file").write("")
+    monkeypatch.setenv("KORIS_PERF_DB", str(tmpdir.join("file", "perf.db")))
+    recorder = PerfRecorder()
+    recorder.enabled = True
+    recorder.record()
+
+
+def test_record_simulated_destroy(store):
+    """the spans and API calls of an operation are recorded"""
+    sim = Simulator(latency=LatencyModel(median=0.001, sigma=0),
+                    time_scale=0, seed=1)
+    sim.add("keypairs", id=bench.KEYPAIR, name=bench.KEYPAIR,
+            public_key="ssh-rsa AAAA")
+    config = bench.bench_config(2, masters=1)
+    enabled = TRACER.enabled, API_STATS.enabled
+    TRACER.enable()
+    API_STATS.enable()
+    try:
+        with sim.installed():
+            bench.apply_cluster(config)
+            TRACER.reset()
+            API_STATS.reset()
+            bench.destroy_cluster(config)
+        store.record(TRACER.spans, API_STATS.calls)
+    finally:
+        TRACER.enabled, API_STATS.enabled = enabled
+        TRACER.reset()
+        API_STATS.reset()
+
+    run, = store.runs()
+    assert run["operation"] == "destroy"
+    assert (run["cluster"], run["masters"], run["nodes"]) == ("bench", 1, 2)
+    assert run["api_calls"] > 0
+    report = store.report()
+    assert {item["key"][1] for item in report["phases"]} >= {
+        "delete_servers", "secgroup"}
@@ -0,0 +1,89 @@
+import time
+
+import pytest
+
+from openstack.exceptions import ConflictException
+from novaclient.exceptions import ClientException
+
+from koris import bench
+from koris.cloud import openstack
+from koris.cloud.simulator import LatencyModel, Simulator
+from koris.util.apistats import API_STATS
+
+
+@pytest.fixture
+def clients():
+    sim = Simulator(time_scale=0.001, seed=1)
+    with sim.installed():
+        nova, neutron, cinder = openstack.get_clients()
+        yield sim, nova, neutron, cinder, openstack.get_connection()
+
+
+def test_installed_restores_clients():
+    session = openstack.SESSION
+    with Simulator().installed():
+        assert openstack.SESSION is not session
+    assert openstack.SESSION is session
+
+
+def test_volume_becomes_available(clients):
+    sim, _, _, cinder, _ = clients
+    volume = cinder.volumes.create(size=25, name="bench-master-1-volume")
+    assert volume.status == "creating"
+    time.sleep(sim.delays["volume"] * sim.time_scale + 0.01)
+    assert cinder.volumes.get(volume.id).status == "available"
+
+
+def test_loadbalancer_conflicts_while_pending(clients):
+    sim, _, neutron, _, conn = clients
+    net = neutron.create_network({"network": {"name": "bench-net"}})
+    subnet = neutron.create_subnet({"subnet": {
+        "network_id": net["network"]["id"], "cidr": "10.0.0.0/24",
+        "ip_version": 4}})["subnet"]
+
+    lb = conn.load_balancer.create_load_balancer(
+        name="bench-lb", vip_subnet_id=subnet["id"])
+    assert lb.provisioning_status == "PENDING_CREATE"
+    with pytest.raises(ConflictException):
+        conn.load_balancer.create_listener(
+            loadbalancer_id=lb.id, protocol="TCP", protocol_port=6443)
+
+    time.sleep(sim.delays["loadbalancer"] * sim.time_scale + 0.01)
+    sim.delays["loadbalancer_update"] = 1000
+    conn.load_balancer.create_listener(
+        loadbalancer_id=lb.id, protocol="TCP", protocol_port=6443)
+    lb = conn.load_balancer.get_load_balancer(lb.id)
+    assert lb.provisioning_status == "PENDING_UPDATE"
+
+
+def test_failure_injection():
+    sim = Simulator(time_scale=0, failures={
+        "GET /compute/v2.1/flavors/detail": (1.0, 503)})
+    with sim.installed():
+        nova, _, _ = openstack.get_clients()
+        with pytest.raises(ClientException):
+            nova.flavors.list()
+        assert nova.availability_zones.list()
+
+
+def test_latency_model():
+    sim = Simulator(latency=LatencyModel(median=0.01, sigma=0), seed=1)
+    with sim.installed():
+        nova, _, _ = openstack.get_clients()
+        start = time.monotonic()
+        nova.flavors.list()
+        assert time.monotonic() - start >= 0.01
+
+
+def test_run_scenario_rejects_unknown_scenario():
+    with pytest.raises(ValueError):
+        bench.run_scenario("resize", 10)
+    assert not API_STATS.enabled
+
+
+def test_format_results():
+    table = bench.format_results([{
+        "scenario": "apply", "nodes": 10, "wall": 1.5, "calls": 120,
+        "retries": 2, "peak_memory": 3 * 2 ** 20}])
+    assert table.splitlines()[1].split() == [
+        "apply", "10", "1.50", "120", "2", "3.0"]
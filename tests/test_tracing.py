@@ -0,0 +1,150 @@
+import asyncio
+import json
+
+import pytest
+
+from koris.util.dag import TaskGraph
+from koris.util.tracing import Tracer, TRACER
+from koris.util.util import run_blocking
+
+
+@pytest.fixture
+def tracer():
+    tracer = Tracer()
+    tracer.enable()
+    return tracer
+
+
+def by_name(tracer):
+    return {item.name: item for item in tracer.spans}
+
+
+def test_nested_spans(tracer):
+    with tracer.span("apply", cluster="koris") as root:
+        with tracer.span("network") as child:
+            child.set(subnet="10.0.0.0/24")
+
+    spans = by_name(tracer)
+    assert spans["network"].parent_id == root.span_id
+    assert spans["apply"].parent_id is None
+    assert spans["network"].attributes == {"subnet": "10.0.0.0/24"}
+    assert spans["apply"].attributes == {"cluster": "koris"}
+    assert spans["apply"].duration >= spans["network"].duration
+
+
+def test_span_error(tracer):
+    with pytest.raises(ValueError):
+        with tracer.span("boot"):
+            raise ValueError("no quota")
+
+    assert tracer.spans[0].error == "ValueError: no quota"
+    assert tracer.otlp()["resourceSpans"][0]["scopeSpans"][0]["spans"][0][
+        "status"] == {"code": 2, "message": "ValueError: no quota"}
+
+
+def test_disabled():
+    tracer = Tracer()
+    with tracer.span("apply"):
+        pass
+    assert not tracer.spans
+
+
+def test_traced(tracer):
+    @tracer.traced()
+    def network():
+        return 1
+
+    @tracer.traced("boot", role="master")
+    async def boot():
+        return await run_blocking(network)
+
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    assert asyncio.get_event_loop().run_until_complete(boot()) == 1
+    asyncio.set_event_loop(asyncio.new_event_loop())
+
+    spans = by_name(tracer)
+    # the span is inherited by the thread of run_blocking
+    assert spans["network"].parent_id == spans["boot"].span_id
+    assert spans["boot"].attributes == {"role": "master"}
+
+
+def test_task_graph_spans():
+    graph = TaskGraph()
+
+    @graph.task()
+    async def network():
+        await asyncio.sleep(0.01)
+
+    @graph.task()
+    async def ca_bundle():
+        await asyncio.sleep(0.01)
+
+    @graph.task(requires=("network", "ca_bundle"))
+    def masters(**_):
+        pass
+
+    TRACER.reset()
+    TRACER.enable()
+    try:
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        with TRACER.span("apply"):
+            graph.run()
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        spans = by_name(TRACER)
+        lanes = TRACER._lanes()
+    finally:
+        TRACER.enabled = False
+        TRACER.reset()
+
+    root = spans["apply"].span_id
+    assert all(spans[name].parent_id == root
+               for name in ("network", "ca_bundle", "masters"))
+    assert spans["masters"].attributes == {"requires": "network,ca_bundle"}
+    # concurrent tasks are shown in different rows
+    assert lanes[spans["network"].span_id] != lanes[spans["ca_bundle"].span_id]
+    # the tasks after them reuse a row
+    assert lanes[spans["masters"].span_id] in (
+        lanes[spans["network"].span_id], lanes[spans["ca_bundle"].span_id])
+
+
+def test_chrome_trace(tracer, tmpdir):
+    with tracer.span("apply"):
+        with tracer.span("instance", host="koris-node-1"):
+            pass
+
+    path = str(tmpdir.join("trace.json"))
+    tracer.write_chrome_trace(path)
+    with open(path) as fh:
+        events = json.load(fh)["traceEvents"]
+
+    complete = {event["name"]: event for event in events
+                if event["ph"] == "X"}
+    assert complete["instance"]["args"] == {"host": "koris-node-1"}
+    assert complete["apply"]["ts"] == 0
+    assert complete["instance"]["tid"] == complete["apply"]["tid"]
+    assert complete["instance"]["dur"] <= complete["apply"]["dur"]
+    assert any(event["ph"] == "M" for event in events)
+
+
+def test_otlp(tracer, tmpdir):
+    with tracer.span("apply", masters=3, ratio=0.5, batch=True):
+        with tracer.span("network"):
+            pass
+
+    path = str(tmpdir.join("trace.otlp.json"))
+    tracer.write_otlp(path)
+    with open(path) as fh:
+        data = json.load(fh)
+
+    spans = {item["name"]: item for item in
+             data["resourceSpans"][0]["scopeSpans"][0]["spans"]}
+    assert spans["network"]["parentSpanId"] == spans["apply"]["spanId"]
+    assert "parentSpanId" not in spans["apply"]
+    assert len(spans["apply"]["traceId"]) == 32
+    assert len(spans["apply"]["spanId"]) == 16
+    assert int(spans["apply"]["endTimeUnixNano"]) >= \
+        int(spans["apply"]["startTimeUnixNano"])
+    assert {"key": "masters", "value": {"intValue": "3"}} in \
+        spans["apply"]["attributes"]
+    assert {"key": "batch", "value": {"boolValue": True}} in \
+        spans["apply"]["attributes"]
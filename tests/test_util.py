@@ -1,8 +1,17 @@
+import asyncio
 import io
+import threading
+import time
 import unittest.mock
 
+import pytest
+
 from koris.util.util import (KorisVersionCheck, name_validation,
-                             k8s_version_validation)
+                             k8s_version_validation, run_blocking,
+                             set_concurrency, retry, RetryBudget,
+                             RETRY_STATS, LazyAttribute, prefetch,
+                             check_version)
+from koris.util.cache import DiskCache
 from koris.util.hue import red
 
 phtml = """
@@ -82,3 +91,171 @@ def test_k8s_version_validation():
     for vers in INVALID_VERSIONS:
         print(f"NOK: {vers}")
         assert k8s_version_validation(vers) is False
+
+
+def test_run_blocking_concurrent():
+    """blocking calls are executed in parallel, up to the concurrency limit"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    def block():
+        time.sleep(0.2)
+        return threading.current_thread().name
+
+    try:
+        set_concurrency(4)
+        start = time.monotonic()
+        names = loop.run_until_complete(
+            asyncio.gather(*[run_blocking(block) for _ in range(4)]))
+        assert time.monotonic() - start < 0.6
+        assert all(name.startswith("koris") for name in names)
+
+        set_concurrency(1)
+        start = time.monotonic()
+        loop.run_until_complete(
+            asyncio.gather(*[run_blocking(block) for _ in range(3)]))
+        assert time.monotonic() - start >= 0.6
+    finally:
+        set_concurrency(20)
+        loop.close()
+        asyncio.set_event_loop(asyncio.new_event_loop())
+
+    with pytest.raises(ValueError):
+        set_concurrency(0)
+
+
+def test_retry_coroutine_does_not_block_loop():
+    """retrying a coroutine lets other coroutines run meanwhile"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    calls = []
+    ticks = []
+
+    @retry(ValueError, tries=3, delay=0.1, backoff=1)
+    async def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ValueError("not yet")
+        return "done"
+
+    async def ticker():
+        for _ in range(5):
+            ticks.append(1)
+            await asyncio.sleep(0.02)
+
+    RETRY_STATS.reset()
+    try:
+        result, _ = loop.run_until_complete(asyncio.gather(flaky(), ticker()))
+    finally:
+        loop.close()
+        asyncio.set_event_loop(asyncio.new_event_loop())
+
+    assert result == "done"
+    assert len(ticks) == 5
+    name = flaky.__qualname__
+    assert RETRY_STATS.as_dict()[name] == {'retries': 2, 'failures': 0}
+
+
+def test_retry_deadline_and_budget():
+    """retrying stops at the deadline or when the budget is spent"""
+    calls = []
+
+    @retry(ValueError, tries=10, delay=0.05, backoff=1, deadline=0.12)
+    def fail():
+        calls.append(1)
+        raise ValueError("fail")
+
+    with pytest.raises(ValueError):
+        fail()
+    assert len(calls) == 3
+
+    # the deadline counts from the first try, not from the first failure
+    calls.clear()
+
+    @retry(ValueError, tries=10, delay=0.05, backoff=1, deadline=0.12)
+    def fail_slowly():
+        calls.append(1)
+        time.sleep(0.1)
+        raise ValueError("fail")
+
+    with pytest.raises(ValueError):
+        fail_slowly()
+    assert len(calls) == 1
+
+    budget = RetryBudget(3)
+    calls.clear()
+
+    @retry(ValueError, tries=10, delay=0, budget=budget)
+    def fail_budget():
+        calls.append(1)
+        raise ValueError("fail")
+
+    with pytest.raises(ValueError):
+        fail_budget()
+    with pytest.raises(ValueError):
+        fail_budget()
+    assert len(calls) == 5
+    assert RETRY_STATS.as_dict()[fail_budget.__qualname__]['failures'] == 2
+
+
+def test_lazy_attribute_prefetch():
+    """lazy attributes are resolved once, also when prefetched concurrently"""
+    calls = []
+
+    class Info:
+        @LazyAttribute
+        def net(self):
+            calls.append("net")
+            time.sleep(0.1)
+            return "net"
+
+        @LazyAttribute
+        def subnet(self):
+            calls.append("subnet")
+            return self.net + "-subnet"
+
+        @LazyAttribute
+        def flavor(self):
+            calls.append("flavor")
+            time.sleep(0.1)
+            return "flavor"
+
+    info = Info()
+    assert not calls
+
+    start = time.monotonic()
+    assert prefetch(info, ("net", "subnet", "flavor")) is info
+    assert time.monotonic() - start < 0.2
+    assert sorted(calls) == ["flavor", "net", "subnet"]
+    assert info.subnet == "net-subnet"
+
+    info.net = "other"
+    assert info.net == "other"
+    assert len(calls) == 3
+
+
+def test_check_version_cached(tmpdir, capsys):
+    """the published version is fetched in the background and cached"""
+    cache = DiskCache(str(tmpdir.join("version.json")))
+    html = b"<html><title>koris v9.9.9 documentation</title></html>"
+    with unittest.mock.patch('koris.util.util.urlopen') as urlopen:
+        urlopen.return_value.read.return_value = html
+        thread = check_version("1.0.0", "https://docs", cache=cache)
+        thread.join()
+        assert "upgrade" not in capsys.readouterr().out
+
+        assert check_version("1.0.0", "https://docs", cache=cache) is None
+        assert "9.9.9" in capsys.readouterr().out
+        urlopen.assert_called_once()
+
+
+def test_check_version_unwritable_cache(tmpdir, monkeypatch):
+    """the version check never fails because of the cache"""
+    tmpdir.join("file").write("")
+    monkeypatch.setenv("KORIS_CACHE_DIR", str(tmpdir.join("file", "koris")))
+    html = b"<html><title>koris v9.9.9 documentation</title></html>"
+    with unittest.mock.patch('koris.util.util.urlopen') as urlopen:
+        urlopen.return_value.read.return_value = html
+        thread = check_version("1.0.0", "https://docs")
+        thread.join()
+        urlopen.assert_called_once()